@@ -0,0 +1,293 @@
+"""
+Admission control of the API.
+Expensive routes get a concurrency limit with a short, bounded wait queue;
+requests beyond it are rejected at once with 503 and Retry-After instead of
+piling up. An optional token bucket in Redis limits the request rate of every
+client across all replicas, answering 429 once it is exhausted.
+Rejections happen before the request body is read.
+"""
+
+import asyncio
+import json
+import logging
+import math
+from typing import Dict, Optional, Tuple
+
+from redis import RedisError, StrictRedis
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.middleware import route_template
+from internal.metrics.registry import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+
+REJECTED = Counter(
+    "countries_http_requests_rejected_total",
+    "Requests rejected by admission control, by route and reason.",
+    ["method", "route", "reason"],
+)
+QUEUED = Gauge(
+    "countries_http_requests_queued",
+    "Requests waiting for a concurrency slot, by route.",
+    ["route"],
+)
+
+# Refills the bucket for the time elapsed since the last request and takes a
+# token if there is one. The time comes from the Redis server, so every
+# replica sees the same clock. Returns {allowed, seconds until a token}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'timestamp')
+local tokens = tonumber(state[1]) or burst
+local timestamp = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - timestamp, 0) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'timestamp', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class Rejected(Exception):
+    """
+    Raised when a request is not admitted.
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Admits at most 'limit' concurrent requests. Up to 'max_queue' more wait
+    at most 'max_wait' seconds for a slot; any others are rejected at once.
+    """
+
+    def __init__(self, limit: int, max_queue: int = 0, max_wait: float = 1.0):
+        """
+        Initialize the ConcurrencyLimiter.
+
+        Args:
+            limit (int): The maximum number of concurrent requests.
+            max_queue (int): The maximum number of waiting requests.
+            max_wait (float): The maximum wait for a slot, in seconds.
+
+        Raises:
+            ValueError: If the limit is not positive.
+        """
+        if limit < 1:
+            raise ValueError("The concurrency limit must be a positive integer.")
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = None
+
+    async def acquire(self, route: str = ""):
+        """
+        Take a slot, waiting for one if the queue has room.
+
+        Args:
+            route (str): The route template, to label the queue gauge.
+
+        Raises:
+            Rejected: If no slot is free and the queue is full, or the wait timed out.
+        """
+        # Created on first use, inside the event loop that serves the requests
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise Rejected("concurrency", self.max_wait)
+            self.waiting += 1
+            QUEUED.inc(route=route)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                raise Rejected("queue_timeout", self.max_wait)
+            finally:
+                self.waiting -= 1
+                QUEUED.dec(route=route)
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+
+    def release(self):
+        """
+        Free a slot.
+        """
+        self.active -= 1
+        self._semaphore.release()
+
+
+class RedisTokenBucket:
+    """
+    A token bucket per client, stored in Redis and shared by all replicas.
+    """
+
+    def __init__(
+        self, client: StrictRedis, rate: float, burst: int, prefix: str = "ratelimit"
+    ):
+        """
+        Initialize the RedisTokenBucket.
+
+        Args:
+            client (StrictRedis): The Redis client.
+            rate (float): Tokens added per second.
+            burst (int): The size of the bucket.
+            prefix (str): The prefix of the Redis keys.
+
+        Raises:
+            ValueError: If the rate or the burst are not positive.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("The rate and the burst must be positive.")
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, client_id: str) -> Tuple[bool, float]:
+        """
+        Take a token from the client's bucket.
+        If Redis is unavailable the request is allowed: the limiter must not
+        take the API down with it.
+
+        Args:
+            client_id (str): Identifies the client, e.g. its IP address.
+
+        Returns:
+            Tuple[bool, float]: Whether a token was taken, and the seconds
+                until one is available if not.
+        """
+        try:
+            allowed, wait = self.script(
+                keys=[f"{self.prefix}:{client_id}"], args=[self.rate, self.burst]
+            )
+        except RedisError as e:
+            logger.warning(f"Rate limiter unavailable, allowing the request: {e}")
+            return True, 0.0
+        return bool(int(allowed)), float(wait)
+
+
+class AdmissionMiddleware:
+    """
+    Applies the rate limiter and the per-route concurrency limiters.
+    """
+
+    EXEMPT_ROUTES = ("/health", "/ready", "/metrics")
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        routes_app: ASGIApp,
+        limiters: Dict[Tuple[str, str], ConcurrencyLimiter] = None,
+        rate_limiter: Optional[RedisTokenBucket] = None,
+        trust_forwarded_for: bool = False,
+        rate_limit_timeout: float = 0.25,
+    ):
+        """
+        Initialize the AdmissionMiddleware.
+
+        Args:
+            app (ASGIApp): The wrapped application.
+            routes_app (ASGIApp): The application whose routes select the limiter.
+            limiters (Dict[Tuple[str, str], ConcurrencyLimiter]): The limiter of
+                every (method, route template).
+            rate_limiter (RedisTokenBucket): The per-client rate limiter, if any.
+            trust_forwarded_for (bool): Identify clients by the X-Forwarded-For
+                header; only safe behind a proxy that sets it.
+            rate_limit_timeout (float): Seconds to wait for the rate limiter
+                before letting the request through.
+        """
+        self.app = app
+        self.routes_app = routes_app
+        self.limiters = limiters or {}
+        self.rate_limiter = rate_limiter
+        self.trust_forwarded_for = trust_forwarded_for
+        self.rate_limit_timeout = rate_limit_timeout
+
+    def _client_id(self, scope: Scope) -> str:
+        if self.trust_forwarded_for:
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    async def _reject(send: Send, status: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(math.ceil(retry_after), 1)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def _take(self, client_id: str) -> Tuple[bool, float]:
+        # The script is a blocking round trip, run off the event loop; a slow
+        # Redis lets the request through, like an unavailable one
+        try:
+            return await asyncio.wait_for(
+                run_in_threadpool(self.rate_limiter.take, client_id),
+                self.rate_limit_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Rate limiter timed out, allowing the request")
+            return True, 0.0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.routes_app, scope)
+        if route in self.EXEMPT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        if self.rate_limiter:
+            allowed, wait = await self._take(self._client_id(scope))
+            if not allowed:
+                REJECTED.inc(method=method, route=route, reason="rate")
+                await self._reject(send, 429, "Too many requests.", wait)
+                return
+
+        limiter = self.limiters.get((method, route))
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire(route)
+        except Rejected as e:
+            REJECTED.inc(method=method, route=route, reason=e.reason)
+            await self._reject(send, 503, "Server busy, retry later.", e.retry_after)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
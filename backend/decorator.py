@@ -7,6 +7,8 @@ from functools import wraps
 from fastapi import HTTPException
 from fastapi import status as s
 
+from internal.db.model import SORT_FIELDS
+
 
 def handle_exception(f):
     """
@@ -31,14 +33,7 @@ def handle_exception(f):
                 detail="Limit must be a positive integer.",
             )
 
-        # TODO : Check if value is available
-        if sort_by and sort_by not in [
-            "country_name",
-            "population_density",
-            "area",
-            "population",
-            "region",
-        ]:
+        if sort_by and sort_by not in SORT_FIELDS:
             raise HTTPException(
                 status_code=s.HTTP_400_BAD_REQUEST, detail="Invalid sort field."
             )
@@ -51,6 +46,9 @@ def handle_exception(f):
         try:
             return await f(*args, **kwargs)
 
+        except HTTPException:
+            raise
+
         except ValueError as error:
             raise HTTPException(status_code=s.HTTP_400_BAD_REQUEST, detail=str(error))
 
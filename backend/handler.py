@@ -5,11 +5,92 @@ This module handles the request processing and data retrieval from the database
 
 import os
 import base64
+import hashlib
 import json
-from typing import List
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Union
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import PyMongoError
 
 from internal.db.manager import NoSQLDatabaseManager
+from internal.db.model import (
+    BORDER_GRAPH,
+    COUNTRY_FIELDS,
+    EXPORT_BATCH_SIZE,
+    EXPORT_FORMATS,
+    HISTORY_METRICS,
+    IMAGES_PAGE_SIZE,
+    SELECTABLE_COUNTRY_FIELDS,
+    SORT_ORDERS,
+    TREND_POINTS,
+)
 from internal.cache.cache import CacheManager
+from internal.geo.index import GeoIndex
+from internal.graph.borders import BorderGraph
+from internal.history.series import downsample, flatten, growth_rates
+from internal.cache.keys import (
+    countries_key,
+    countries_records_key,
+    countries_view_key,
+    country_key,
+    images_generation_key,
+    images_page_key,
+)
+from internal.cache.views import VIEW_FIELDS, member_name, view_range
+from internal.dataset.snapshot import FORMAT_VERSION, DatasetSnapshot
+from internal.storage.base import ObjectStorage, as_chunks
+from internal.storage.keys import dataset_key, image_key
+from internal.storage.local import LocalStorage
+from internal.metrics.registry import Counter, Histogram
+from backend.preloaded import SHARED, Preloaded
+from backend.tracing import span
+
+
+FILESYSTEM_LATENCY = Histogram(
+    "countries_filesystem_operation_duration_seconds",
+    "Latency of the image reads and writes in the object storage, by operation.",
+    ["operation"],
+)
+
+DATASET_READS = Counter(
+    "countries_dataset_reads_total",
+    "Country reads served from the dataset snapshot, by reason (starting or "
+    "database_error).",
+    ["reason"],
+)
+
+
+def accepts_encoding(accept_encoding: Optional[str], coding: str) -> bool:
+    """
+    Check whether an Accept-Encoding header allows a content coding, i.e.
+    gives it, or else '*', a quality above 0.
+
+    Args:
+        accept_encoding (Optional[str]): The header, None if it wasn't sent.
+        coding (str): The content coding, e.g. 'gzip'.
+
+    Returns:
+        bool: True if the coding is acceptable.
+    """
+    qualities = {}
+    for item in (accept_encoding or "").split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name.lower()] = quality
+    return qualities.get(coding, qualities.get("*", 0.0)) > 0
 
 
 class RequestHandler:
@@ -19,27 +100,68 @@ class RequestHandler:
     and managing the cache.
     """
 
-    def __init__(self, db_manager: NoSQLDatabaseManager, cache_manager: CacheManager):
+    def __init__(
+        self,
+        db_manager: NoSQLDatabaseManager,
+        cache_manager: CacheManager,
+        assets_dir: str = "/assets",
+        preload_max_age: float = 300.0,
+        storage: ObjectStorage = None,
+        dataset_dir: str = None,
+    ):
         self.db_manager = db_manager
         self.cache_manager = cache_manager
+        self.assets_dir = assets_dir
+        self.storage = storage or LocalStorage(assets_dir)
+        self.dataset_dir = dataset_dir or tempfile.gettempdir()
+        self.geo_index = Preloaded(
+            self._load_geo_index, preload_max_age, SHARED.get("geo_index")
+        )
+        self.border_graph = Preloaded(
+            self._load_border_graph, preload_max_age, SHARED.get("border_graph")
+        )
+        self.dataset = Preloaded(
+            self._load_dataset, preload_max_age, SHARED.get("dataset")
+        )
 
-    def _extract_country_data(self, country: dict) -> dict:
+    def _extract_country_data(
+        self, country: dict, fields: List[str] = COUNTRY_FIELDS
+    ) -> dict:
         """
         Extracts relevant data from the country object.
 
         Args:
             country (dict): The country object.
+            fields (List[str]): The fields to extract; missing ones are null.
 
         Returns:
             dict: A dictionary containing the extracted data.
         """
-        return {
-            "country_name": country["country_name"],
-            "population_density": country["population_density"],
-            "area": country["area"],
-            "population": country["population"],
-            "region": country["region"],
-        }
+        return {field: country.get(field) for field in fields}
+
+    def _parse_fields(self, fields: str) -> List[str]:
+        """
+        Parse a field selection into a normalized list: without duplicates and
+        in whitelist order, so equivalent selections share a cache entry.
+
+        Args:
+            fields (str): Comma-separated field names, or None for the default.
+
+        Returns:
+            List[str]: The selected fields.
+
+        Raises:
+            ValueError: If a field is not selectable.
+        """
+        if not fields:
+            return COUNTRY_FIELDS
+        selected = {field.strip() for field in fields.split(",") if field.strip()}
+        invalid = selected.difference(SELECTABLE_COUNTRY_FIELDS)
+        if invalid:
+            raise ValueError(f"Invalid fields: {', '.join(sorted(invalid))}.")
+        if not selected:
+            return COUNTRY_FIELDS
+        return [field for field in SELECTABLE_COUNTRY_FIELDS if field in selected]
 
     def _extract_image_data(self, image: dict) -> dict:
         """
@@ -57,18 +179,18 @@ class RequestHandler:
             "description": image["description"],
         }
 
-    def _get_file_path(self, country_name: str, image_id: str) -> str:
+    def _get_image_key(self, country_name: str, image_id: str) -> str:
         """
-        Get the file path for the image.
+        Get the storage key of the image.
 
         Args:
             country_name (str): The name of the country.
             image_id (str): The ID of the image.
 
         Returns:
-            str: The file path for the image.
+            str: The key of the image in the object storage.
         """
-        return f"/assets/{country_name}/images/{image_id}.jpg"
+        return image_key(country_name, image_id)
 
     def _create_random_image_id(self) -> str:
         """
@@ -79,155 +201,686 @@ class RequestHandler:
         """
         return os.urandom(16).hex()
 
-    def get_countries(self, limit: int, sort_by: str, order_by: int) -> List[dict]:
+    def get_countries(
+        self,
+        limit: int,
+        sort_by: str,
+        order_by: int,
+        fields: str = None,
+        offset: int = 0,
+    ) -> List[dict]:
         """
-        Get a list of countries from the database or cache.
+        Get a list of countries from the sorted views in the cache, or from
+        the database if the views are not published.
 
         Args:
             limit (Optional[int]): The maximum number of countries to return.
             sort_by (str): The field to sort by.
             order_by (str): The sort order, either 'asc' or 'desc'.
+            fields (str): Comma-separated fields to return, None for the default.
+            offset (int): The number of countries to skip.
 
         Returns:
             List[Country]: A list of Country objects.
+
+        Raises:
+            ValueError: If a field is not selectable.
         """
-        cache_key = f"countries:limit={limit}:sort_by={sort_by}:order_by={order_by}"
+        fields = self._parse_fields(fields)
+
+        # Any page of a view is one range of a sorted set plus its records
+        if sort_by in VIEW_FIELDS and order_by in SORT_ORDERS and limit >= 0:
+            start, stop = view_range(offset, limit)
+            with span("cache"):
+                records = self.cache_manager.get_sorted_page(
+                    countries_view_key(sort_by),
+                    countries_records_key(),
+                    start,
+                    stop,
+                    desc=order_by == -1,
+                    record_of=member_name,
+                )
+            if records is not None:
+                return [
+                    self._extract_country_data(record, fields) for record in records
+                ]
+
+        cache_key = countries_key(limit, sort_by, order_by, fields, offset)
 
         # Check if the data is in the cache
-        cached_data = self.cache_manager.get_data(cache_key)
+        with span("cache"):
+            cached_data = self.cache_manager.get_data(cache_key)
         if cached_data:
-            return json.loads(cached_data)
+            with span("serialize"):
+                return json.loads(cached_data)
 
         # If not in cache, fetch from the database
-        countries = self.db_manager.get_countries(limit, sort_by, order_by)
-        countries = [self._extract_country_data(country) for country in countries]
+        try:
+            with span("db"):
+                countries = self.db_manager.get_countries(
+                    limit, sort_by, order_by, fields, offset
+                )
+        except PyMongoError:
+            if self.dataset.value is None:
+                raise
+            DATASET_READS.inc(reason="database_error")
+            return self._countries_from_snapshot(
+                limit, sort_by, order_by, fields, offset
+            )
+        countries = [
+            self._extract_country_data(country, fields) for country in countries
+        ]
 
         # Serialize the result and store it in the cache
-        self.cache_manager.set_data(cache_key, json.dumps(countries))
+        with span("serialize"):
+            serialized = json.dumps(countries)
+        with span("cache"):
+            self.cache_manager.set_data(cache_key, serialized)
 
         return countries
 
-    def get_country(self, country_name: str) -> dict:
+    def get_country(self, country_name: str, fields: str = None) -> Optional[dict]:
         """
         Get a country by name from the database or cache.
 
         Args:
             country_name (str): The name of the country to retrieve.
+            fields (str): Comma-separated fields to return, None for the default.
 
         Returns:
-            Country: A Country object.
+            Optional[dict]: The country, or None if it is unknown.
+
+        Raises:
+            ValueError: If a field is not selectable.
         """
-        cache_key = f"country:{country_name}"
+        fields = self._parse_fields(fields)
+        cache_key = country_key(country_name, fields)
 
         # Check if the data is in the cache
-        cached_data = self.cache_manager.get_dict_data(cache_key)
+        with span("cache"):
+            cached_data = self.cache_manager.get_dict_data(cache_key)
         if cached_data:
             return cached_data
 
         # If not in cache, fetch from the database
-        country = self.db_manager.get_country(country_name)
-        country = self._extract_country_data(country)
+        try:
+            with span("db"):
+                country = self.db_manager.get_country(country_name, fields)
+        except PyMongoError:
+            if self.dataset.value is None:
+                raise
+            DATASET_READS.inc(reason="database_error")
+            return self._country_from_snapshot(country_name, fields)
+        if country is None:
+            return None
+        country = self._extract_country_data(country, fields)
 
         # Serialize the result and store it in the cache
-        self.cache_manager.set_dict_data(cache_key, country)
+        with span("cache"):
+            self.cache_manager.set_dict_data(cache_key, country)
 
         return country
 
-    def upload_image(
-        self, country_name: str, file: bytes, title: str, description: str
+    def _snapshot(self) -> DatasetSnapshot:
+        snapshot = self.dataset.current()
+        if snapshot is None:
+            raise RuntimeError("No dataset snapshot is loaded.")
+        return snapshot
+
+    def _countries_from_snapshot(
+        self, limit: int, sort_by: str, order_by: int, fields: List[str], offset: int
+    ) -> List[dict]:
+        with span("snapshot"):
+            countries = self._snapshot().get_countries(limit, sort_by, order_by, offset)
+        return [self._extract_country_data(country, fields) for country in countries]
+
+    def _country_from_snapshot(
+        self, country_name: str, fields: List[str]
+    ) -> Optional[dict]:
+        with span("snapshot"):
+            country = self._snapshot().get_country(country_name)
+        if country is None:
+            return None
+        return self._extract_country_data(country, fields)
+
+    def get_countries_from_snapshot(
+        self,
+        limit: int,
+        sort_by: str,
+        order_by: int,
+        fields: str = None,
+        offset: int = 0,
+    ) -> List[dict]:
+        """
+        Get a list of countries from the dataset snapshot, without the
+        database or the cache, e.g. while they are not connected yet.
+
+        Args:
+            limit (int): The maximum number of countries to return.
+            sort_by (str): The field to sort by.
+            order_by (int): The sort order, 1 for asc or -1 for desc.
+            fields (str): Comma-separated fields to return, None for the default.
+            offset (int): The number of countries to skip.
+
+        Returns:
+            List[dict]: The countries.
+
+        Raises:
+            ValueError: If a field is not selectable.
+            RuntimeError: If no snapshot is loaded.
+        """
+        fields = self._parse_fields(fields)
+        DATASET_READS.inc(reason="starting")
+        return self._countries_from_snapshot(limit, sort_by, order_by, fields, offset)
+
+    def get_country_from_snapshot(
+        self, country_name: str, fields: str = None
+    ) -> Optional[dict]:
+        """
+        Get a country by name from the dataset snapshot, without the database
+        or the cache.
+
+        Args:
+            country_name (str): The name of the country to retrieve.
+            fields (str): Comma-separated fields to return, None for the default.
+
+        Returns:
+            Optional[dict]: The country, or None if it is unknown.
+
+        Raises:
+            ValueError: If a field is not selectable.
+            RuntimeError: If no snapshot is loaded.
+        """
+        fields = self._parse_fields(fields)
+        DATASET_READS.inc(reason="starting")
+        return self._country_from_snapshot(country_name, fields)
+
+    def store_image(
+        self, country_name: str, file: Union[bytes, Iterable[bytes]]
     ) -> str:
         """
-        Upload an image for a country.
-        This method handles the image upload process, including saving the file
-        to the file system and saving the meta data to the database.
+        Save an uploaded image file to the object storage.
 
         Args:
             country_name (str): The name of the country.
-            file (UploadFile): The image file to upload.
-            title (str): The title of the image.
-            description (str): The description of the image.
+            file (Union[bytes, Iterable[bytes]]): The image file, whole or in chunks.
 
         Returns:
-            str: The ID of the uploaded image.
+            str: The ID of the image.
         """
         image_id = self._create_random_image_id()
+        key = self._get_image_key(country_name, image_id)
 
-        file_path = self._get_file_path(country_name, image_id)
+        with span("fs"), FILESYSTEM_LATENCY.time(operation="write"):
+            self.storage.write(key, file)
 
-        image = {
+        return image_id
+
+    def remove_image_file(self, country_name: str, image_id: str):
+        """
+        Remove a stored image file that will not be processed.
+
+        Args:
+            country_name (str): The name of the country.
+            image_id (str): The ID of the image.
+        """
+        self.storage.delete(self._get_image_key(country_name, image_id))
+
+    def image_url(self, country_name: str, image_id: str) -> str:
+        """
+        Get a time-limited URL that downloads an image straight from the storage.
+
+        Args:
+            country_name (str): The name of the country.
+            image_id (str): The ID of the image.
+
+        Returns:
+            str: The signed URL.
+        """
+        return self.storage.signed_url(self._get_image_key(country_name, image_id))
+
+    def _image_document(
+        self,
+        country_name: str,
+        image_id: str,
+        title: str,
+        description: str,
+        size: int,
+        sha256: str,
+    ) -> dict:
+        """
+        Build the meta data of a stored image.
+
+        Args:
+            country_name (str): The name of the country.
+            image_id (str): The ID of the image.
+            title (str): The title of the image.
+            description (str): The description of the image.
+            size (int): The size of the file in bytes.
+            sha256 (str): The SHA-256 checksum of the file.
+
+        Returns:
+            dict: The image document.
+        """
+        return {
             "image_id": image_id,
             "country_name": country_name,
             "title": title,
             "description": description,
-            "file_path": file_path,
+            "file_path": self._get_image_key(country_name, image_id),
+            "size": size,
+            "sha256": sha256,
         }
 
+    def process_image(self, payload: dict) -> dict:
+        """
+        Post-process a stored image: compute its size and checksum, save its
+        meta data to the database and retire the cached gallery pages.
+        It runs as a background job and is safe to retry.
+
+        Args:
+            payload (dict): The image_id, country_name, title and description.
+
+        Returns:
+            dict: The ID, the size and the SHA-256 checksum of the image.
+        """
+        country_name = payload["country_name"]
+        image_id = payload["image_id"]
+        key = self._get_image_key(country_name, image_id)
+
+        # Streamed, so large images are never held in memory whole
+        size, sha256 = 0, hashlib.sha256()
+        with span("fs"), FILESYSTEM_LATENCY.time(operation="read"):
+            for chunk in self.storage.read(key):
+                size += len(chunk)
+                sha256.update(chunk)
+
+        image = self._image_document(
+            country_name,
+            image_id,
+            payload["title"],
+            payload["description"],
+            size,
+            sha256.hexdigest(),
+        )
+
         # Save image metadata to the database
-        self.db_manager.add_image(image_id, image)
-
-        # Save the image file to the file system
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "wb") as f:
-            f.write(file)
-
-        # Update the cache for the country's images
-        cache_key = f"images:{country_name}"
-        cached_images = self.cache_manager.get_data(cache_key)
-        if cached_images:
-            cached_images = json.loads(cached_images)
-        else:
-            cached_images = []
-
-        # Add the new image metadata to the cache
-        cached_images.append(
+        with span("db"):
+            self.db_manager.add_image(image_id, image)
+
+        # Retire the cached pages of the gallery; a single atomic command,
+        # so concurrent uploads never lose each other's images
+        with span("cache"):
+            self.cache_manager.incr(images_generation_key(country_name))
+
+        return {"image_id": image_id, "size": image["size"], "sha256": image["sha256"]}
+
+    def discard_image(self, payload: dict):
+        """
+        Delete the stored file of an image whose processing failed for good,
+        so it doesn't linger without its meta data.
+
+        Args:
+            payload (dict): The payload of the process_image job.
+        """
+        key = self._get_image_key(payload["country_name"], payload["image_id"])
+        with span("fs"):
+            self.storage.delete(key)
+
+    def upload_images(
+        self, country_name: str, uploads: List[dict], concurrency: int = 4
+    ) -> List[dict]:
+        """
+        Upload many images for a country at once. The files are streamed to
+        the storage by a bounded pool of threads, hashing them on the way; the
+        meta data of the stored images is then saved with one insert and the
+        cached gallery pages are retired once.
+
+        Args:
+            country_name (str): The name of the country.
+            uploads (List[dict]): The images, each with its 'file' (bytes or
+                chunks), 'title', 'description' and an optional 'filename'.
+            concurrency (int): The number of files written at once.
+
+        Returns:
+            List[dict]: A result per upload, in order: the image ID, size and
+                SHA-256 checksum of a stored image, or the error of a failed one.
+        """
+
+        def store(upload: dict) -> dict:
+            size, sha256 = 0, hashlib.sha256()
+
+            def hashed(chunks):
+                nonlocal size
+                for chunk in chunks:
+                    size += len(chunk)
+                    sha256.update(chunk)
+                    yield chunk
+
+            result = {"filename": upload.get("filename")}
+            try:
+                image_id = self.store_image(
+                    country_name, hashed(as_chunks(upload["file"]))
+                )
+            except Exception as e:
+                return {**result, "status": "failed", "error": str(e)}
+            return {
+                **result,
+                "status": "stored",
+                "image_id": image_id,
+                "size": size,
+                "sha256": sha256.hexdigest(),
+            }
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(store, uploads))
+
+        images = [
+            self._image_document(
+                country_name,
+                result["image_id"],
+                upload["title"],
+                upload["description"],
+                result["size"],
+                result["sha256"],
+            )
+            for upload, result in zip(uploads, results)
+            if result["status"] == "stored"
+        ]
+        if not images:
+            return results
+
+        # Save the meta data of all images in one round trip
+        try:
+            with span("db"):
+                self.db_manager.add_images(images)
+        except Exception:
+            for image in images:
+                self.remove_image_file(country_name, image["image_id"])
+            raise
+
+        # Retire the cached pages of the gallery once for the whole batch
+        with span("cache"):
+            self.cache_manager.incr(images_generation_key(country_name))
+
+        return results
+
+    def export_countries(
+        self,
+        fields: str = None,
+        format: str = "ndjson",
+        compress: bool = False,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> Iterator[bytes]:
+        """
+        Export every stored country, streamed from a database cursor one batch
+        at a time, so memory stays constant however many countries there are.
+        The arguments are checked before the first batch is read.
+
+        'ndjson' writes one JSON document per line. 'columnar' writes one JSON
+        line per batch, {"count": n, "columns": {field: [values]}}, with null
+        for the fields a country doesn't have.
+
+        Args:
+            fields (str): Comma-separated fields to export, None for the whole documents.
+            format (str): 'ndjson' or 'columnar'.
+            compress (bool): Compress the output with gzip.
+            batch_size (int): The number of countries per batch.
+
+        Returns:
+            Iterator[bytes]: The chunks of the export, one per batch.
+
+        Raises:
+            ValueError: If the format is unknown or a field is not selectable.
+        """
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid format: {format}.")
+        selected = self._parse_fields(fields) if fields else None
+        cursor = self.db_manager.iter_countries(selected, batch_size)
+        chunks = self._export_batches(cursor, selected, format, batch_size)
+        return self._gzip(chunks) if compress else chunks
+
+    def _export_batches(
+        self, cursor, fields: List[str], format: str, batch_size: int
+    ) -> Iterator[bytes]:
+        batch = []
+        for country in cursor:
+            batch.append(country)
+            if len(batch) == batch_size:
+                yield self._encode_batch(batch, fields, format)
+                batch = []
+        if batch:
+            yield self._encode_batch(batch, fields, format)
+
+    def _encode_batch(self, batch: List[dict], fields: List[str], format: str) -> bytes:
+        if format == "ndjson":
+            lines = (json.dumps(country, default=str) for country in batch)
+            return ("\n".join(lines) + "\n").encode("utf-8")
+        if fields is None:
+            fields = list(dict.fromkeys(key for country in batch for key in country))
+        columns = {field: [country.get(field) for country in batch] for field in fields}
+        line = json.dumps({"count": len(batch), "columns": columns}, default=str)
+        return (line + "\n").encode("utf-8")
+
+    @staticmethod
+    def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+        # A sync flush after every batch lets the client decompress as it reads
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+    def get_trend(
+        self,
+        country_name: str,
+        metric: str = "population",
+        since: str = None,
+        points: int = TREND_POINTS,
+    ) -> dict:
+        """
+        Get the history of a metric of a country, downsampled, with its growth.
+
+        Args:
+            country_name (str): The name of the country.
+            metric (str): One of HISTORY_METRICS.
+            since (str): The first month of the history, as 'YYYY-MM'; all of it by default.
+            points (int): The maximum number of points of the series.
+
+        Returns:
+            dict: The series of {t, value} pairs, oldest first, with t in seconds
+                since the epoch; the number of recorded points; and the total
+                and compound annual growth over the whole range.
+
+        Raises:
+            ValueError: If the metric or the month is not valid.
+        """
+        if metric not in HISTORY_METRICS:
+            raise ValueError(f"Invalid metric: {metric}.")
+        if since:
+            try:
+                since = time.strftime("%Y-%m", time.strptime(since, "%Y-%m"))
+            except ValueError:
+                raise ValueError("Invalid since: expected a month as YYYY-MM.")
+
+        with span("db"):
+            buckets = self.db_manager.get_metrics_history(country_name, since)
+        recorded = flatten(buckets, metric)
+        series = downsample(recorded, points)
+
+        return {
+            "country_name": country_name,
+            "metric": metric,
+            "count": len(recorded),
+            "series": [{"t": t, "value": value} for t, value in series],
+            "growth": growth_rates(recorded),
+        }
+
+    def _load_dataset(self) -> DatasetSnapshot:
+        """
+        Open the dataset snapshot the data pipeline published last. It is
+        mapped in place from a local storage, and downloaded first otherwise.
+        The current snapshot is kept if the published one didn't change.
+
+        Returns:
+            DatasetSnapshot: The snapshot.
+
+        Raises:
+            FileNotFoundError: If no snapshot was published.
+            ValueError: If the snapshot is corrupt.
+        """
+        key = dataset_key(FORMAT_VERSION)
+        version = self.storage.version(key)
+        current = self.dataset.value
+        if current is not None and current.source_version == version:
+            return current
+        if isinstance(self.storage, LocalStorage):
+            return DatasetSnapshot(self.storage.path(key), version)
+
+        # A file of its own, as the workers and threads may download at once;
+        # it is removed once mapped, and freed when the map is
+        fd, path = tempfile.mkstemp(dir=self.dataset_dir, suffix=".snapshot")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in self.storage.read(key):
+                    f.write(chunk)
+            return DatasetSnapshot(path, version)
+        finally:
+            os.remove(path)
+
+    def _load_geo_index(self) -> GeoIndex:
+        """
+        Build the spatial index of the countries from the database.
+
+        Returns:
+            GeoIndex: The index.
+        """
+        with span("db"):
+            countries = self.db_manager.get_countries(
+                0, "country_name", 1, ["country_name", "latlng"]
+            )
+        return GeoIndex(countries)
+
+    def _load_border_graph(self) -> BorderGraph:
+        """
+        Load the land border graph built by the data pipeline.
+
+        Returns:
+            BorderGraph: The graph, empty if the pipeline didn't build it yet.
+        """
+        with span("db"):
+            document = self.db_manager.get_graph(BORDER_GRAPH)
+        if document is None:
+            return BorderGraph([], [0], [])
+        return BorderGraph.from_document(document)
+
+    def upload_image(
+        self, country_name: str, file: bytes, title: str, description: str
+    ) -> str:
+        """
+        Upload an image for a country and process it right away.
+        The API stores the file and queues the processing as a background job
+        instead; see store_image and process_image.
+
+        Args:
+            country_name (str): The name of the country.
+            file (bytes): The image file to upload.
+            title (str): The title of the image.
+            description (str): The description of the image.
+
+        Returns:
+            str: The ID of the uploaded image.
+        """
+        image_id = self.store_image(country_name, file)
+        self.process_image(
             {
                 "image_id": image_id,
+                "country_name": country_name,
                 "title": title,
                 "description": description,
-                "file": base64.b64encode(file).decode("utf-8"),
             }
         )
+        return image_id
 
-        # Serialize and update the cache
-        self.cache_manager.set_data(cache_key, json.dumps(cached_images))
+    def _parse_cursor(self, cursor: str) -> ObjectId:
+        """
+        Parse a gallery cursor.
 
-        return image_id
+        Args:
+            cursor (str): The cursor returned with the previous page, or None.
 
-    def get_images(self, country_name: str) -> List[dict]:
+        Returns:
+            ObjectId: The _id of the last image of the previous page, or None.
+
+        Raises:
+            ValueError: If the cursor is not valid.
+        """
+        if not cursor:
+            return None
+        try:
+            return ObjectId(cursor)
+        except (InvalidId, TypeError):
+            raise ValueError("Invalid cursor.")
+
+    def get_images(
+        self, country_name: str, limit: int = IMAGES_PAGE_SIZE, cursor: str = None
+    ) -> dict:
         """
-        Get images for a country from the database or cache.
+        Get a page of images for a country from the database or cache.
+        Pages are cached under the gallery's generation, which every upload
+        increments, so a page is never served stale.
 
         Args:
             country_name (str): The name of the country.
+            limit (int): The maximum number of images in the page.
+            cursor (str): The cursor returned with the previous page, or None.
 
         Returns:
-            List[bytes]: A list of image files.
+            dict: The images of the page, and the cursor of the next page or
+                None if this is the last page.
         """
-        cache_key = f"images:{country_name}"
-
-        # Check if the data is in the cache
-        cached_data = self.cache_manager.get_data(cache_key)
+        after = self._parse_cursor(cursor)
+
+        # Check if the page is in the cache
+        with span("cache"):
+            generation = self.cache_manager.get_data(
+                images_generation_key(country_name)
+            )
+            cache_key = images_page_key(country_name, generation or 0, limit, cursor)
+            cached_data = self.cache_manager.get_data(cache_key)
         if cached_data:
-            return json.loads(cached_data)
-
-        # Get images meta data from the database
-        images_meta_data = self.db_manager.get_images(country_name)
+            with span("serialize"):
+                return json.loads(cached_data)
+
+        # Get images meta data from the database, one more to detect a next page
+        with span("db"):
+            documents = self.db_manager.get_images(country_name, limit + 1, after)
+        next_cursor = (
+            str(documents[limit - 1]["_id"]) if len(documents) > limit else None
+        )
         images_meta_data = [
-            self._extract_image_data(image) for image in images_meta_data
+            self._extract_image_data(image) for image in documents[:limit]
         ]
 
         # Get images from the file system
         images = []
 
         for image in images_meta_data:
-            file_path = self._get_file_path(country_name, image["image_id"])
-            if os.path.exists(file_path):
-                with open(file_path, "rb") as f:
-                    file = f.read()
-                    image["file"] = base64.b64encode(file).decode("utf-8")
-                    images.append(image)
-
-        # Serialize the result and store it in the cache
-        self.cache_manager.set_data(cache_key, json.dumps(images))
-
-        return images
+            key = self._get_image_key(country_name, image["image_id"])
+            with span("fs"), FILESYSTEM_LATENCY.time(operation="read"):
+                try:
+                    file = self.storage.get(key)
+                except FileNotFoundError:
+                    continue
+            with span("serialize"):
+                image["file"] = base64.b64encode(file).decode("utf-8")
+            images.append(image)
+
+        page = {"images": images, "next_cursor": next_cursor}
+
+        # Serialize the page and store it in the cache
+        with span("serialize"):
+            serialized = json.dumps(page)
+        with span("cache"):
+            self.cache_manager.set_data(cache_key, serialized)
+
+        return page
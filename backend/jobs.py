@@ -0,0 +1,311 @@
+"""
+Background jobs of the backend.
+Work that doesn't have to happen before the response, such as post-processing
+an upload, is persisted as a job in MongoDB and run by a pool of asyncio
+workers. Failed jobs are retried with exponential backoff.
+
+A worker claims a job atomically and holds a lease on it while it runs, renewed
+periodically, so with several processes every job runs once at a time. Pending
+jobs are picked up again on startup, and running jobs whose lease expired,
+because their process died, are picked up by any process.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from pymongo.errors import DuplicateKeyError
+
+from internal.db.manager import NoSQLDatabaseManager
+from internal.metrics.registry import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+JOBS = Counter(
+    "countries_jobs_total",
+    "Background job attempts, by kind and outcome.",
+    ["kind", "outcome"],
+)
+JOBS_QUEUED = Gauge(
+    "countries_jobs_queued",
+    "Background jobs waiting for a worker.",
+)
+
+
+class JobQueue:
+    """
+    Persists jobs and runs them on a pool of asyncio workers. The handlers
+    are blocking functions and run in threads.
+    """
+
+    def __init__(
+        self,
+        db_manager: NoSQLDatabaseManager,
+        workers: int = 2,
+        max_attempts: int = 5,
+        retry_delay: float = 0.5,
+        max_retry_delay: float = 30.0,
+        lease: float = 60.0,
+    ):
+        """
+        Initialize the JobQueue.
+
+        Args:
+            db_manager (NoSQLDatabaseManager): Stores the job state.
+            workers (int): The number of jobs run at once.
+            max_attempts (int): Attempts before a job is marked as failed.
+            retry_delay (float): Seconds before the first retry; doubled every retry.
+            max_retry_delay (float): Upper bound of the retry delay.
+            lease (float): Seconds a running job stays claimed without a renewal.
+        """
+        self.db_manager = db_manager
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.lease = lease
+        self.owner = uuid.uuid4().hex
+        self.handlers: Dict[str, Callable[[dict], dict]] = {}
+        self.on_failure: Dict[str, Callable[[dict], None]] = {}
+        self._queue = None
+        self._tasks: List[asyncio.Task] = []
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+
+    def register(
+        self,
+        kind: str,
+        handler: Callable[[dict], dict],
+        on_failure: Callable[[dict], None] = None,
+    ):
+        """
+        Register the handler of a kind of job.
+
+        Args:
+            kind (str): The kind of job.
+            handler (Callable[[dict], dict]): Runs a job from its payload and
+                returns its result. It must be safe to run again after a failure.
+            on_failure (Callable[[dict], None]): Cleans up after a job that
+                failed for good, from its payload.
+        """
+        self.handlers[kind] = handler
+        if on_failure is not None:
+            self.on_failure[kind] = on_failure
+
+    async def start(self):
+        """
+        Start the workers, queue the pending jobs and those left running by a
+        process that died, and keep looking for the latter.
+        """
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        unfinished = await self._claimable([PENDING])
+        if unfinished:
+            logger.info(f"Resumed {len(unfinished)} unfinished jobs")
+        self._tasks.append(asyncio.create_task(self._recover()))
+
+    async def _claimable(self, states: List[str]) -> List[dict]:
+        jobs = await asyncio.to_thread(
+            self.db_manager.get_claimable_jobs, states, [RUNNING], time.time()
+        )
+        for job in jobs:
+            self._enqueue(job["job_id"])
+        return jobs
+
+    async def _recover(self):
+        while True:
+            await asyncio.sleep(self.lease)
+            try:
+                expired = await self._claimable([])
+            except Exception as e:
+                logger.error(f"Error recovering jobs: {e}")
+                continue
+            if expired:
+                logger.info(f"Recovered {len(expired)} jobs with an expired lease")
+
+    async def stop(self):
+        """
+        Stop the workers. Jobs that are interrupted stay pending or running,
+        and are resumed by the next start or once their lease expired.
+        """
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _enqueue(self, job_id: str):
+        self._queue.put_nowait(job_id)
+        JOBS_QUEUED.set(self._queue.qsize())
+
+    def _retry(self, job_id: str):
+        self._timers.pop(job_id, None)
+        self._enqueue(job_id)
+
+    async def submit(self, kind: str, payload: dict, idempotency_key: str = None):
+        """
+        Persist a job and queue it.
+        If a job was already submitted with the same idempotency key, that job
+        is returned and nothing is queued.
+
+        Args:
+            kind (str): The kind of job.
+            payload (dict): The arguments of the handler.
+            idempotency_key (str): A client-chosen key that identifies the request.
+
+        Returns:
+            dict: The job.
+
+        Raises:
+            ValueError: If the kind of job is unknown.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if idempotency_key:
+            existing = await self.get(idempotency_key=idempotency_key)
+            if existing:
+                return existing
+
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "payload": payload,
+            "state": PENDING,
+            "attempts": 0,
+            "error": None,
+            "result": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        if idempotency_key:
+            job["idempotency_key"] = idempotency_key
+
+        try:
+            await asyncio.to_thread(self.db_manager.add_job, job)
+        except DuplicateKeyError:
+            # A concurrent request with the same key won the race
+            return await self.get(idempotency_key=idempotency_key)
+
+        self._enqueue(job["job_id"])
+        return job
+
+    async def get(self, job_id: str = None, idempotency_key: str = None) -> dict:
+        """
+        Get a job by id or by idempotency key.
+
+        Args:
+            job_id (str): The id of the job.
+            idempotency_key (str): The idempotency key of the job.
+
+        Returns:
+            dict: The job, or None.
+        """
+        return await asyncio.to_thread(self.db_manager.get_job, job_id, idempotency_key)
+
+    async def list(self, states: List[str], limit: int = 100) -> List[dict]:
+        """
+        List the jobs in some states, oldest first.
+
+        Args:
+            states (List[str]): The states of the jobs.
+            limit (int): The maximum number of jobs.
+
+        Returns:
+            List[dict]: The jobs.
+        """
+        return await asyncio.to_thread(self.db_manager.get_jobs, states, limit)
+
+    async def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        await asyncio.to_thread(self.db_manager.update_job, job_id, fields)
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            JOBS_QUEUED.set(self._queue.qsize())
+            try:
+                await self.run(job_id)
+            except Exception as e:
+                # The job state couldn't be stored; it is resumed once its
+                # lease expires
+                logger.error(f"Error running job {job_id}: {e}")
+
+    async def _keep_lease(self, job_id: str):
+        # Renew at a third of the lease, so one missed renewal doesn't lose it
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self._update(job_id, lease_until=time.time() + self.lease)
+            except Exception as e:
+                logger.error(f"Error renewing the lease of job {job_id}: {e}")
+
+    async def run(self, job_id: str):
+        """
+        Claim a job and run it once, then mark it as succeeded, or schedule a
+        retry, or mark it as failed once it ran out of attempts.
+
+        Args:
+            job_id (str): The id of the job.
+        """
+        now = time.time()
+        job = await asyncio.to_thread(
+            self.db_manager.claim_job,
+            job_id,
+            [PENDING],
+            [RUNNING],
+            now,
+            {
+                "state": RUNNING,
+                "owner": self.owner,
+                "lease_until": now + self.lease,
+                "updated_at": now,
+            },
+        )
+        if job is None:
+            # Finished, or run by another worker
+            return
+
+        renewal = asyncio.create_task(self._keep_lease(job_id))
+        try:
+            result = await asyncio.to_thread(self.handlers[job["kind"]], job["payload"])
+            error = None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        finally:
+            renewal.cancel()
+
+        if error is None:
+            JOBS.inc(kind=job["kind"], outcome=SUCCEEDED)
+            await self._update(job_id, state=SUCCEEDED, result=result, error=None)
+            return
+
+        attempts = job["attempts"]
+        if attempts >= self.max_attempts:
+            JOBS.inc(kind=job["kind"], outcome=FAILED)
+            await self._update(job_id, state=FAILED, error=error)
+            await self._clean_up(job)
+            return
+        JOBS.inc(kind=job["kind"], outcome="retried")
+        await self._update(job_id, state=PENDING, error=error)
+        delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+        self._timers[job_id] = asyncio.get_running_loop().call_later(
+            delay, self._retry, job_id
+        )
+
+    async def _clean_up(self, job: dict):
+        on_failure = self.on_failure.get(job["kind"])
+        if on_failure is None:
+            return
+        try:
+            await asyncio.to_thread(on_failure, job["payload"])
+        except Exception as e:
+            logger.error(f"Error cleaning up after job {job['job_id']}: {e}")
@@ -4,16 +4,73 @@ It initializes the FastAPI app instance and the SQLDatabaseManager instance.
 It also sets up the routes for the API.
 """
 
-from typing import Optional
+import asyncio
+import contextlib
+import logging
+import os
+from typing import List, Optional
 
+from pymongo import MongoClient
 from redis import StrictRedis
-from fastapi import FastAPI, Query, File, Form, UploadFile
+from fastapi import (
+    Depends,
+    FastAPI,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    UploadFile,
+)
+from fastapi import status as s
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 
 from internal.db.manager import NoSQLDatabaseManager
+from backend.admission import AdmissionMiddleware, ConcurrencyLimiter, RedisTokenBucket
 from backend.decorator import handle_exception
-from backend.handler import RequestHandler
+from backend.handler import RequestHandler, accepts_encoding
+from backend.jobs import PENDING, JobQueue
+from backend.middleware import MetricsMiddleware, TracingMiddleware
+from backend.profiler import ProfilerTrigger
+from backend.startup import Startup
+from backend.tracing import logger as request_logger
 from internal.cache.cache import CacheManager
+from internal.db.model import (
+    DEFAULT_LIMIT,
+    EXPORT_FORMATS,
+    EXPORT_MEDIA_TYPES,
+    GEO_NEAREST_DEFAULT,
+    HISTORY_METRICS,
+    IMAGES_PAGE_SIZE,
+    MAX_BORDER_HOPS,
+    MAX_BULK_IMAGES,
+    MAX_GEO_NEAREST,
+    MAX_IMAGES_PAGE_SIZE,
+    MAX_TREND_POINTS,
+    SORT_FIELDS,
+    SORT_ORDERS,
+    TREND_POINTS,
+)
+from internal.metrics import multiprocess
+from internal.metrics.registry import REGISTRY
+from internal.storage.base import ObjectStorage
+from internal.storage.client import StorageClient
+from internal.storage.local import LocalStorage
+
+logger = logging.getLogger(__name__)
+
+# Size of the chunks uploads are copied to the storage in
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Seconds between two writes of a worker's metrics for the other workers
+METRICS_WRITE_INTERVAL = 5.0
 
 
 class APIBackend:
@@ -21,12 +78,28 @@ class APIBackend:
     Main entrypoint for the API backend
     """
 
-    def __init__(self, db_url: str, redis_client: StrictRedis):
+    def __init__(
+        self,
+        db_url: str,
+        redis_client: StrictRedis,
+        mongo_client: MongoClient = None,
+        assets_dir: str = "/assets",
+        storage: ObjectStorage = None,
+    ):
         self.app = FastAPI(
             title="Countries API",
             description="API for managing countries and their images",
             version="0.1.0",
             swagger_ui_parameters={"syntaxHighlight": False},
+            lifespan=self._lifespan,
+        )
+        self.app.add_middleware(
+            AdmissionMiddleware,
+            routes_app=self.app.router,
+            limiters=self._initialize_limiters(),
+            rate_limiter=self._initialize_rate_limiter(redis_client),
+            trust_forwarded_for=os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR") == "true",
+            rate_limit_timeout=float(os.getenv("RATE_LIMIT_TIMEOUT", "0.25")),
         )
         self.app.add_middleware(
             CORSMiddleware,
@@ -35,29 +108,250 @@ class APIBackend:
             allow_methods=["*"],
             allow_headers=["*"],
         )
-        self.db_manager = self._initialize_database_manager(db_url)
+        self.app.add_middleware(MetricsMiddleware, routes_app=self.app.router)
+        self.app.add_middleware(
+            TracingMiddleware,
+            routes_app=self.app.router,
+            profiler=self._initialize_profiler(),
+        )
+        self._initialize_logging()
+        self._initialize_request_logging()
+        self.db_manager = self._initialize_database_manager(db_url, mongo_client)
         self.cache_manager = self._initialize_cache_manager(redis_client)
-        self.request_handler = RequestHandler(self.db_manager, self.cache_manager)
+        self.request_handler = RequestHandler(
+            self.db_manager,
+            self.cache_manager,
+            assets_dir,
+            preload_max_age=float(os.getenv("PRELOAD_MAX_AGE", "300")),
+            storage=storage or StorageClient(assets_dir=assets_dir).get_storage(),
+            dataset_dir=os.getenv("DATASET_DIR"),
+        )
+        self.jobs = self._initialize_job_queue()
+        self.bulk_upload_concurrency = int(os.getenv("BULK_UPLOAD_CONCURRENCY", "4"))
+        self.startup = Startup(
+            self.db_manager,
+            self.cache_manager,
+            warmers=[
+                self._warm_countries,
+                # Built unless the prefork server shared them with the worker
+                self.request_handler.geo_index.current,
+                self.request_handler.border_graph.current,
+            ],
+            services=[self.jobs.start],
+        )
+        # Set by the prefork server, whose workers each keep their own metrics
+        self.metrics_dir = os.getenv(multiprocess.DIRECTORY_ENV)
         self._setup_routes()
 
-    def _initialize_database_manager(self, db_url: str) -> NoSQLDatabaseManager:
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """
+        Load the dataset snapshot, connect and warm up in the background while
+        the app starts serving, and stop the job workers and close the database
+        connections on shutdown.
+        """
+        # The country reads are served from the snapshot until the startup completes
+        await asyncio.to_thread(self.request_handler.dataset.current)
+        self.startup.start()
+        writer = (
+            asyncio.create_task(self._write_metrics()) if self.metrics_dir else None
+        )
+        yield
+        await self.startup.stop()
+        await self.jobs.stop()
+        self.db_manager.client.close()
+        if writer is not None:
+            writer.cancel()
+            multiprocess.write(self.metrics_dir)
+
+    async def _write_metrics(self):
+        """
+        Write this worker's metrics periodically, so the scrapes served by the
+        other workers include them.
+        """
+        while True:
+            await asyncio.sleep(METRICS_WRITE_INTERVAL)
+            try:
+                await asyncio.to_thread(multiprocess.write, self.metrics_dir)
+            except OSError as e:
+                logger.warning(f"Couldn't write the metrics: {e}")
+
+    def _warm_countries(self):
+        """
+        Fill the cache with the default list of countries for every sort field
+        and order, unless the data pipeline already did.
+        """
+        for sort_by in SORT_FIELDS:
+            for order_by in SORT_ORDERS:
+                self.request_handler.get_countries(DEFAULT_LIMIT, sort_by, order_by)
+
+    async def _require_ready(self):
+        """
+        Reject requests that need the database before the startup completed.
+
+        Raises:
+            HTTPException: 503 with a Retry-After header while starting up.
+        """
+        if not self.startup.ready:
+            raise HTTPException(
+                status_code=s.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"The backend is {self.startup.state}.",
+                headers={"Retry-After": "1"},
+            )
+
+    async def _require_readable(self):
+        """
+        Reject country reads before the startup completed, unless the dataset
+        snapshot can serve them.
+
+        Raises:
+            HTTPException: 503 with a Retry-After header while starting up
+                without a snapshot.
+        """
+        if self.request_handler.dataset.value is None:
+            await self._require_ready()
+
+    def _initialize_database_manager(
+        self, db_url: str, mongo_client: MongoClient = None
+    ) -> NoSQLDatabaseManager:
         """
         Initialize the database manager
 
         Args:
             db_url (str): The database URL
+            mongo_client (MongoClient): An existing client to use instead of connecting
 
         Raises:
             ValueError: If the DB_URL environment variable is not set
 
         Returns:
-            NoSQLDatabaseManager: The database manager instance
+            NoSQLDatabaseManager: The database manager instance, bootstrapped
+                by the startup
         """
         if not db_url:
             raise ValueError("DB_URL environment variable is not set.")
-        manager = NoSQLDatabaseManager(db_url)
-        manager.bootstrap()
-        return manager
+        return NoSQLDatabaseManager(db_url, mongo_client)
+
+    def _initialize_limiters(self) -> dict:
+        """
+        Initialize the concurrency limiters of the image and export routes
+        from the environment: IMAGES_MAX_CONCURRENCY, UPLOADS_MAX_CONCURRENCY,
+        BULK_UPLOADS_MAX_CONCURRENCY and EXPORT_MAX_CONCURRENCY requests run at
+        once, IMAGES_MAX_QUEUE, UPLOADS_MAX_QUEUE, BULK_UPLOADS_MAX_QUEUE and
+        EXPORT_MAX_QUEUE more wait at most ADMISSION_MAX_WAIT seconds.
+
+        Returns:
+            dict: The limiter of every (method, route).
+        """
+        max_wait = float(os.getenv("ADMISSION_MAX_WAIT", "1"))
+        route = "/countries/{countryName}/images"
+        return {
+            ("GET", route): ConcurrencyLimiter(
+                int(os.getenv("IMAGES_MAX_CONCURRENCY", "8")),
+                int(os.getenv("IMAGES_MAX_QUEUE", "16")),
+                max_wait,
+            ),
+            ("POST", route): ConcurrencyLimiter(
+                int(os.getenv("UPLOADS_MAX_CONCURRENCY", "4")),
+                int(os.getenv("UPLOADS_MAX_QUEUE", "8")),
+                max_wait,
+            ),
+            ("POST", f"{route}/bulk"): ConcurrencyLimiter(
+                int(os.getenv("BULK_UPLOADS_MAX_CONCURRENCY", "2")),
+                int(os.getenv("BULK_UPLOADS_MAX_QUEUE", "4")),
+                max_wait,
+            ),
+            ("GET", "/export/countries"): ConcurrencyLimiter(
+                int(os.getenv("EXPORT_MAX_CONCURRENCY", "2")),
+                int(os.getenv("EXPORT_MAX_QUEUE", "0")),
+                max_wait,
+            ),
+        }
+
+    def _initialize_rate_limiter(self, redis_client: StrictRedis) -> RedisTokenBucket:
+        """
+        Initialize the per-client rate limiter if RATE_LIMIT_RATE (requests per
+        second) is set; RATE_LIMIT_BURST is the size of the bucket.
+
+        Args:
+            redis_client (StrictRedis): The Redis client
+
+        Returns:
+            RedisTokenBucket: The rate limiter, or None
+        """
+        rate = float(os.getenv("RATE_LIMIT_RATE", "0"))
+        if rate <= 0:
+            return None
+        burst = int(os.getenv("RATE_LIMIT_BURST", str(max(int(rate), 1) * 2)))
+        return RedisTokenBucket(redis_client, rate, burst)
+
+    def _initialize_job_queue(self) -> JobQueue:
+        """
+        Initialize the background job queue from the environment: JOB_WORKERS
+        jobs run at once, a failing job is tried JOB_MAX_ATTEMPTS times, and a
+        running job is taken over by another process JOB_LEASE seconds after
+        its process stopped renewing it.
+
+        Returns:
+            JobQueue: The job queue, started by the startup
+        """
+        jobs = JobQueue(
+            self.db_manager,
+            workers=int(os.getenv("JOB_WORKERS", "2")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+            lease=float(os.getenv("JOB_LEASE", "60")),
+        )
+        jobs.register(
+            "process_image",
+            self.request_handler.process_image,
+            on_failure=self.request_handler.discard_image,
+        )
+        return jobs
+
+    def _initialize_profiler(self) -> ProfilerTrigger:
+        """
+        Initialize the on-demand profiler from the environment.
+        PROFILE_TOKEN enables profiling of requests with a matching X-Profile
+        header, PROFILE_SAMPLE_RATE profiles a random fraction of the requests.
+
+        Returns:
+            ProfilerTrigger: The profiler trigger
+        """
+        return ProfilerTrigger(
+            token=os.getenv("PROFILE_TOKEN"),
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+            output_dir=os.getenv("PROFILE_DIR", "profiles"),
+        )
+
+    def _initialize_logging(self):
+        """
+        Write the diagnostics of the backend and of the modules it shares with
+        the data pipeline to stderr, at LOG_LEVEL, unless the entry point
+        configured logging already
+        """
+        if logging.getLogger().handlers:
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+        for name in ("backend", "internal"):
+            package_logger = logging.getLogger(name)
+            if not package_logger.handlers:
+                package_logger.addHandler(handler)
+                package_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    def _initialize_request_logging(self):
+        """
+        Write the structured request logs to stderr, one JSON object per line
+        """
+        if request_logger.handlers:
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        request_logger.addHandler(handler)
+        request_logger.setLevel(os.getenv("REQUEST_LOG_LEVEL", "INFO"))
+        request_logger.propagate = False
 
     def _initialize_cache_manager(self, redis_client: StrictRedis) -> CacheManager:
         """
@@ -72,7 +366,15 @@ class APIBackend:
         return CacheManager(redis_client)
 
     def _setup_routes(self):
-        @self.app.get("/countries")
+        ready = Depends(self._require_ready)
+        readable = Depends(self._require_readable)
+
+        def unknown_country(name: str) -> HTTPException:
+            return HTTPException(
+                status_code=s.HTTP_404_NOT_FOUND, detail=f"Unknown country: {name}."
+            )
+
+        @self.app.get("/countries", dependencies=[readable])
         @handle_exception
         async def get_countries(
             limit: Optional[int] = Query(
@@ -84,6 +386,10 @@ class APIBackend:
             orderBy: Optional[str] = Query(
                 "1", description="Sort order: 1 for asc or -1 for desc"
             ),
+            fields: Optional[str] = Query(
+                None, description="Comma-separated fields to return"
+            ),
+            offset: int = Query(0, ge=0, description="Number of countries to skip"),
         ):
             """
             Get a list of countries
@@ -92,6 +398,8 @@ class APIBackend:
                 limit (Optional[int]): The maximum number of countries to return
                 sortBy (Optional[str]): The field to sort by
                 orderBy (Optional[int]): The sort order, either 1 'asc' or -1 'desc'
+                fields (Optional[str]): The fields to return, e.g. 'country_name,capital'
+                offset (int): The number of countries to skip
 
             Returns:
                 dict: A dictionary containing the list of countries
@@ -99,75 +407,526 @@ class APIBackend:
             Raises:
                 ValueError: If the field are not valid
             """
-            countries = self.request_handler.get_countries(limit, sortBy, int(orderBy))
+            if not self.startup.ready:
+                countries = await run_in_threadpool(
+                    self.request_handler.get_countries_from_snapshot,
+                    limit,
+                    sortBy,
+                    int(orderBy),
+                    fields,
+                    offset,
+                )
+                return {"countries": countries}
+            countries = await run_in_threadpool(
+                self.request_handler.get_countries,
+                limit,
+                sortBy,
+                int(orderBy),
+                fields,
+                offset,
+            )
             return {"countries": countries}
 
-        @self.app.get("/countries/{countryName}")
+        @self.app.get("/countries/{countryName}", dependencies=[readable])
         @handle_exception
-        async def get_country(countryName: str):
+        async def get_country(
+            countryName: str,
+            fields: Optional[str] = Query(
+                None, description="Comma-separated fields to return"
+            ),
+        ):
             """
             Get a country by name
 
             Args:
                 country_name (str): The name of the country to retrieve
+                fields (Optional[str]): The fields to return, e.g. 'flags,languages'
 
             Returns:
                 dict: A dictionary containing the country data
 
             Raises:
                 ValueError: If the field are not valid
+                HTTPException: 404 if the country is unknown
             """
-            country = self.request_handler.get_country(countryName)
+            if not self.startup.ready:
+                country = await run_in_threadpool(
+                    self.request_handler.get_country_from_snapshot, countryName, fields
+                )
+            else:
+                country = await run_in_threadpool(
+                    self.request_handler.get_country, countryName, fields
+                )
+            if country is None:
+                raise unknown_country(countryName)
             return {"country": country}
 
-        @self.app.post("/countries/{countryName}/images")
+        @self.app.post("/countries/{countryName}/images", dependencies=[ready])
         @handle_exception
         async def upload_image(
             countryName: str,
             file: UploadFile = File(...),
             title: str = Form(...),
             description: str = Form(...),
+            idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
         ):
             """
-            Upload an image for a country
+            Upload an image for a country.
+            The file is stored before the response; saving the meta data and
+            refreshing the gallery run as a background job.
 
             Args:
                 country_name (str): The name of the country
                 file (UploadFile): The image file to upload
                 title (str): The title of the image
                 description (str): The description of the image
+                idempotency_key (Optional[str]): Identifies the upload, so a
+                    retried request returns the first upload's job
+
+            Returns:
+                JSONResponse: 202 with the ID of the image and its job
+            """
+            job = None
+            if idempotency_key:
+                job = await self.jobs.get(idempotency_key=idempotency_key)
+            if job is None:
+                # The spooled upload is copied to the storage in chunks, in a
+                # thread, off the event loop
+                chunks = iter(lambda: file.file.read(UPLOAD_CHUNK_SIZE), b"")
+                image_id = await run_in_threadpool(
+                    self.request_handler.store_image, countryName, chunks
+                )
+                payload = {
+                    "image_id": image_id,
+                    "country_name": countryName,
+                    "title": title,
+                    "description": description,
+                }
+                job = await self.jobs.submit("process_image", payload, idempotency_key)
+                if job["payload"]["image_id"] != image_id:
+                    # A concurrent request with the same key was first
+                    await run_in_threadpool(
+                        self.request_handler.remove_image_file, countryName, image_id
+                    )
+            return JSONResponse(
+                {
+                    "result": job["payload"]["image_id"],
+                    "job_id": job["job_id"],
+                    "status": job["state"],
+                },
+                status_code=s.HTTP_202_ACCEPTED,
+            )
+
+        @self.app.get("/countries/{countryName}/images/{imageId}")
+        @handle_exception
+        async def get_image(countryName: str, imageId: str):
+            """
+            Download an image: redirects to a time-limited URL of the image in
+            the object storage, so the bytes don't go through the API
+
+            Args:
+                countryName (str): The name of the country
+                imageId (str): The ID of the image
 
             Returns:
-                dict: A dictionary containing the result of the upload
+                RedirectResponse: 307 to the signed URL
             """
-            file_content = await file.read()
-            result = self.request_handler.upload_image(
-                countryName, file_content, title, description
+            url = await run_in_threadpool(
+                self.request_handler.image_url, countryName, imageId
             )
-            return {"result": result}
+            return RedirectResponse(url, status_code=s.HTTP_307_TEMPORARY_REDIRECT)
 
-        @self.app.get("/countries/{countryName}/images")
+        @self.app.get("/storage/{key:path}")
         @handle_exception
-        async def get_images(countryName: str):
+        async def get_stored_object(key: str, expires: int, signature: str):
             """
-            Get images for a country
+            Serve a file of the local storage from a signed URL
+
+            Args:
+                key (str): The key of the file
+                expires (int): The expiry time of the URL
+                signature (str): The signature of the URL
+
+            Returns:
+                StreamingResponse: The file
+
+            Raises:
+                HTTPException: 403 if the URL is not valid or expired, 404 if
+                    there is no such file or the storage is not local
+            """
+            storage = self.request_handler.storage
+            if not isinstance(storage, LocalStorage):
+                raise HTTPException(status_code=s.HTTP_404_NOT_FOUND)
+            if not storage.verify(key, expires, signature):
+                raise HTTPException(
+                    status_code=s.HTTP_403_FORBIDDEN, detail="Invalid signature."
+                )
+            try:
+                chunks = await run_in_threadpool(storage.read, key)
+            except FileNotFoundError:
+                raise HTTPException(status_code=s.HTTP_404_NOT_FOUND)
+            return StreamingResponse(chunks, media_type="image/jpeg")
+
+        @self.app.post("/countries/{countryName}/images/bulk", dependencies=[ready])
+        @handle_exception
+        async def upload_images(
+            countryName: str,
+            files: List[UploadFile] = File(...),
+            titles: List[str] = Form(...),
+            descriptions: List[str] = Form(...),
+        ):
+            """
+            Upload many images for a country in one request.
+            The n-th title and description belong to the n-th file. The files
+            are stored, their meta data saved and the gallery refreshed before
+            the response.
 
             Args:
                 country_name (str): The name of the country
+                files (List[UploadFile]): The image files to upload
+                titles (List[str]): The titles of the images
+                descriptions (List[str]): The descriptions of the images
 
             Returns:
-                dict: A dictionary containing the list of images
+                dict: A result per file, in order, and the number of stored
+                    and failed files
+
+            Raises:
+                ValueError: If there are too many files, or not a title and a
+                    description per file
             """
-            images = self.request_handler.get_images(countryName)
-            return {"images": images}
+            if not len(files) == len(titles) == len(descriptions):
+                raise ValueError("Expected a title and a description per file.")
+            if len(files) > MAX_BULK_IMAGES:
+                raise ValueError(f"At most {MAX_BULK_IMAGES} files per upload.")
+            uploads = [
+                {
+                    # Each spooled upload is copied to the storage in chunks
+                    "file": iter(lambda f=f: f.file.read(UPLOAD_CHUNK_SIZE), b""),
+                    "filename": f.filename,
+                    "title": title,
+                    "description": description,
+                }
+                for f, title, description in zip(files, titles, descriptions)
+            ]
+            results = await run_in_threadpool(
+                self.request_handler.upload_images,
+                countryName,
+                uploads,
+                self.bulk_upload_concurrency,
+            )
+            stored = sum(result["status"] == "stored" for result in results)
+            return {
+                "results": results,
+                "stored": stored,
+                "failed": len(results) - stored,
+            }
+
+        @self.app.get("/countries/{countryName}/neighbors", dependencies=[ready])
+        @handle_exception
+        async def get_neighbors(
+            countryName: str,
+            hops: Optional[int] = Query(
+                1,
+                ge=1,
+                le=MAX_BORDER_HOPS,
+                description="Maximum number of land borders crossed",
+            ),
+        ):
+            """
+            Get the countries reachable over land from a country
+
+            Args:
+                country_name (str): The name of the country
+                hops (Optional[int]): The maximum number of land borders crossed
+
+            Returns:
+                dict: A dictionary containing the countries with their number
+                    of hops, nearest first
+
+            Raises:
+                HTTPException: 404 if the country is unknown
+            """
+            graph = await self.request_handler.border_graph.get()
+            if countryName not in graph:
+                raise unknown_country(countryName)
+            return {"neighbors": graph.within_hops(countryName, hops)}
+
+        @self.app.get("/countries/{countryName}/path", dependencies=[ready])
+        @handle_exception
+        async def get_land_path(
+            countryName: str,
+            to: str = Query(..., description="Name of the destination country"),
+        ):
+            """
+            Get a shortest land path between two countries
+
+            Args:
+                country_name (str): The name of the first country
+                to (str): The name of the destination country
+
+            Returns:
+                dict: A dictionary containing the countries along the path and
+                    the number of borders crossed, both null without a land path
+
+            Raises:
+                HTTPException: 404 if a country is unknown
+            """
+            graph = await self.request_handler.border_graph.get()
+            for name in (countryName, to):
+                if name not in graph:
+                    raise unknown_country(name)
+            path = graph.shortest_path(countryName, to)
+            return {"path": path, "hops": len(path) - 1 if path else None}
+
+        @self.app.get("/countries/{countryName}/trend", dependencies=[ready])
+        @handle_exception
+        async def get_trend(
+            countryName: str,
+            metric: str = Query(
+                "population", description=f"One of: {', '.join(HISTORY_METRICS)}"
+            ),
+            since: Optional[str] = Query(
+                None, description="First month of the history, as YYYY-MM"
+            ),
+            points: int = Query(
+                TREND_POINTS,
+                ge=2,
+                le=MAX_TREND_POINTS,
+                description="Maximum number of points of the series",
+            ),
+        ):
+            """
+            Get the history of a metric of a country, recorded by every
+            pipeline run, downsampled to at most 'points' points
+
+            Args:
+                countryName (str): The name of the country
+                metric (str): The metric, e.g. 'population'
+                since (Optional[str]): The first month of the history
+                points (int): The maximum number of points
+
+            Returns:
+                dict: The series, the number of recorded points and the growth rates
+
+            Raises:
+                ValueError: If the metric or the month is not valid
+            """
+            return await run_in_threadpool(
+                self.request_handler.get_trend, countryName, metric, since, points
+            )
+
+        @self.app.get("/countries/{countryName}/images", dependencies=[ready])
+        @handle_exception
+        async def get_images(
+            countryName: str,
+            limit: Optional[int] = Query(
+                IMAGES_PAGE_SIZE,
+                ge=1,
+                le=MAX_IMAGES_PAGE_SIZE,
+                description="Maximum number of images to return",
+            ),
+            cursor: Optional[str] = Query(
+                None, description="The next_cursor of the previous page"
+            ),
+        ):
+            """
+            Get a page of images for a country
+
+            Args:
+                country_name (str): The name of the country
+                limit (Optional[int]): The maximum number of images to return
+                cursor (Optional[str]): The next_cursor of the previous page
+
+            Returns:
+                dict: A dictionary containing the images of the page and the
+                    cursor of the next page, null on the last page
+            """
+            page = await run_in_threadpool(
+                self.request_handler.get_images, countryName, limit, cursor
+            )
+            return page
+
+        @self.app.get("/geo/nearest", dependencies=[ready])
+        @handle_exception
+        async def get_nearest_countries(
+            lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+            lng: float = Query(..., ge=-180, le=180, description="Longitude"),
+            k: Optional[int] = Query(
+                GEO_NEAREST_DEFAULT,
+                ge=1,
+                le=MAX_GEO_NEAREST,
+                description="Number of countries to return",
+            ),
+        ):
+            """
+            Get the countries nearest to a point
+
+            Args:
+                lat (float): The latitude of the point in degrees
+                lng (float): The longitude of the point in degrees
+                k (Optional[int]): The number of countries to return
+
+            Returns:
+                dict: A dictionary containing the countries with their
+                    distance in km, nearest first
+            """
+            index = await self.request_handler.geo_index.get()
+            return {"countries": index.nearest(lat, lng, k)}
+
+        @self.app.get("/geo/within", dependencies=[ready])
+        @handle_exception
+        async def get_countries_within(
+            south: float = Query(..., ge=-90, le=90, description="South latitude"),
+            west: float = Query(..., ge=-180, le=180, description="West longitude"),
+            north: float = Query(..., ge=-90, le=90, description="North latitude"),
+            east: float = Query(..., ge=-180, le=180, description="East longitude"),
+        ):
+            """
+            Get the countries inside a bounding box; a box with west > east
+            crosses the antimeridian
+
+            Args:
+                south (float): The southern latitude in degrees
+                west (float): The western longitude in degrees
+                north (float): The northern latitude in degrees
+                east (float): The eastern longitude in degrees
+
+            Returns:
+                dict: A dictionary containing the countries, by name
+
+            Raises:
+                ValueError: If south is greater than north
+            """
+            index = await self.request_handler.geo_index.get()
+            return {"countries": index.within(south, west, north, east)}
+
+        @self.app.get("/export/countries", dependencies=[ready])
+        @handle_exception
+        async def export_countries(
+            fields: Optional[str] = Query(
+                None, description="Comma-separated fields to export"
+            ),
+            format: str = Query(
+                "ndjson", description=f"One of: {', '.join(EXPORT_FORMATS)}"
+            ),
+            accept_encoding: Optional[str] = Header(None),
+        ):
+            """
+            Export every country as a chunked stream, compressed with gzip if
+            the client accepts it
+
+            Args:
+                fields (Optional[str]): The fields to export, all of them by default
+                format (str): 'ndjson', a document per line, or 'columnar', a
+                    line of columns per batch
+                accept_encoding (Optional[str]): The Accept-Encoding header
+
+            Returns:
+                StreamingResponse: The countries, as newline-delimited JSON,
+                    of a media type of its own for the columnar format
+
+            Raises:
+                ValueError: If the format or the fields are not valid
+            """
+            compress = accepts_encoding(accept_encoding, "gzip")
+            chunks = self.request_handler.export_countries(fields, format, compress)
+            headers = {"Vary": "Accept-Encoding"}
+            if compress:
+                headers["Content-Encoding"] = "gzip"
+            return StreamingResponse(
+                chunks, media_type=EXPORT_MEDIA_TYPES[format], headers=headers
+            )
+
+        @self.app.get("/jobs/{jobId}", dependencies=[ready])
+        @handle_exception
+        async def get_job(jobId: str):
+            """
+            Get the state of a background job
+
+            Args:
+                job_id (str): The ID of the job
+
+            Returns:
+                dict: A dictionary containing the job
+
+            Raises:
+                HTTPException: 404 if the job doesn't exist
+            """
+            job = await self.jobs.get(jobId)
+            if job is None:
+                raise HTTPException(
+                    status_code=s.HTTP_404_NOT_FOUND, detail="Job not found."
+                )
+            return {"job": job}
+
+        @self.app.get("/jobs", dependencies=[ready])
+        @handle_exception
+        async def get_jobs(
+            state: List[str] = Query([PENDING], description="States of the jobs"),
+            limit: Optional[int] = Query(
+                100, le=1000, description="Maximum number of jobs to return"
+            ),
+        ):
+            """
+            List the background jobs in some states, oldest first
+
+            Args:
+                state (List[str]): The states of the jobs
+                limit (Optional[int]): The maximum number of jobs to return
+
+            Returns:
+                dict: A dictionary containing the list of jobs
+            """
+            return {"jobs": await self.jobs.list(state, limit)}
 
         @self.app.get("/health")
         @handle_exception
         async def health_check():
             """
-            Health check endpoint
+            Liveness endpoint; it doesn't depend on the database or the cache
 
             Returns:
                 dict: A dictionary containing the health status
             """
             return {"status": "ok"}
+
+        @self.app.get("/ready")
+        async def readiness_check():
+            """
+            Readiness endpoint, 503 until the database and the cache are
+            connected and the caches are warm
+
+            Returns:
+                JSONResponse: The startup state, and the version of the dataset
+                    snapshot if one is loaded
+            """
+            status = self.startup.status()
+            snapshot = self.request_handler.dataset.value
+            if snapshot is not None:
+                status["dataset"] = {
+                    "version": snapshot.version,
+                    "created_at": snapshot.created_at,
+                    "countries": len(snapshot),
+                }
+            return JSONResponse(
+                status,
+                status_code=s.HTTP_200_OK
+                if self.startup.ready
+                else s.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        @self.app.get("/metrics", response_class=PlainTextResponse)
+        async def metrics():
+            """
+            Metrics endpoint in the Prometheus text exposition format, summed
+            over the workers when the prefork server runs several of them
+
+            Returns:
+                PlainTextResponse: The rendered metrics
+            """
+            if self.metrics_dir:
+                body = await run_in_threadpool(multiprocess.render, self.metrics_dir)
+            else:
+                body = REGISTRY.render()
+            return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
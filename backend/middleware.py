@@ -0,0 +1,157 @@
+"""
+ASGI middleware of the API.
+It is written against the raw ASGI interface rather than BaseHTTPMiddleware,
+so it adds no extra task or body buffering to a request.
+"""
+
+import time
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.profiler import ProfilerTrigger
+from backend.tracing import log_request, start_trace
+from internal.metrics.registry import Counter, Gauge, Histogram
+
+
+REQUESTS = Counter(
+    "countries_http_requests_total",
+    "HTTP requests handled, by route and status code.",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "countries_http_request_duration_seconds",
+    "Latency of the HTTP requests, by route.",
+    ["method", "route"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "countries_http_requests_in_flight",
+    "HTTP requests currently being handled, by route.",
+    ["method", "route"],
+)
+RESPONSE_SIZE = Histogram(
+    "countries_http_response_size_bytes",
+    "Size of the HTTP response bodies, by route.",
+    ["method", "route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+
+
+def route_template(app: ASGIApp, scope: Scope) -> str:
+    """
+    Find the path template of the route that will handle the request, so that
+    metrics are labeled with '/countries/{countryName}' rather than the raw path.
+
+    Args:
+        app (ASGIApp): The application with the routes.
+        scope (Scope): The request scope.
+
+    Returns:
+        str: The path template, or 'unmatched'.
+    """
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, in-flight count and response size of every request.
+    """
+
+    def __init__(self, app: ASGIApp, routes_app: ASGIApp):
+        """
+        Initialize the MetricsMiddleware.
+
+        Args:
+            app (ASGIApp): The wrapped application.
+            routes_app (ASGIApp): The application whose routes label the metrics.
+        """
+        self.app = app
+        self.routes_app = routes_app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.routes_app, scope)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start, method=method, route=route
+            )
+            REQUESTS_IN_FLIGHT.dec(method=method, route=route)
+            REQUESTS.inc(method=method, route=route, status=status)
+            RESPONSE_SIZE.observe(size, method=method, route=route)
+
+
+class TracingMiddleware:
+    """
+    Traces every request: the spans recorded while handling it are returned
+    in the Server-Timing header and logged as one structured line. Requests
+    picked by the profiler trigger are also profiled.
+    """
+
+    def __init__(
+        self, app: ASGIApp, routes_app: ASGIApp, profiler: ProfilerTrigger = None
+    ):
+        """
+        Initialize the TracingMiddleware.
+
+        Args:
+            app (ASGIApp): The wrapped application.
+            routes_app (ASGIApp): The application whose routes name the profiles.
+            profiler (ProfilerTrigger): Decides which requests are profiled.
+        """
+        self.app = app
+        self.routes_app = routes_app
+        self.profiler = profiler if profiler and profiler.enabled else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = start_trace()
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = None
+        if self.profiler and self.profiler.should_profile(scope["headers"]):
+            profiler = self.profiler.start()
+
+        extra = {}
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler:
+                extra["profile"] = self.profiler.finish(
+                    profiler, scope["method"], route_template(self.routes_app, scope)
+                )
+            log_request(trace, scope["method"], scope["path"], status, **extra)
@@ -0,0 +1,133 @@
+"""
+In-memory structures built from the database, such as the spatial index and
+the border graph. They are loaded during the warm-up and rebuilt once they are
+older than their maximum age, so they pick up the data pipeline's next run.
+
+The prefork server builds them once in the master, before the fork, and puts
+them in SHARED, so the workers start with a copy-on-write copy of them.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, Generic, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Structures built before the fork, by name
+SHARED: Dict[str, object] = {}
+
+
+class Preloaded(Generic[T]):
+    """
+    Holds a structure built by a blocking load function.
+    """
+
+    def __init__(
+        self, load: Callable[[], T], max_age: float = 300.0, initial: T = None
+    ):
+        """
+        Initialize the Preloaded.
+
+        Args:
+            load (Callable[[], T]): Builds the structure, e.g. from the database.
+            max_age (float): Seconds after which the structure is rebuilt.
+            initial (T): A structure already built, used until max_age.
+        """
+        self.load = load
+        self.max_age = max_age
+        self.value: T = initial
+        self.loaded_at = 0.0 if initial is None else time.monotonic()
+        self._rebuild: asyncio.Task = None
+        # Held by the thread rebuilding the structure
+        self._lock = threading.Lock()
+
+    def refresh(self) -> T:
+        """
+        Build the structure and replace the current one.
+
+        Returns:
+            T: The new structure.
+        """
+        self.value = self.load()
+        self.loaded_at = time.monotonic()
+        return self.value
+
+    def expired(self) -> bool:
+        """
+        Whether the structure must be (re)built.
+
+        Returns:
+            bool: True if it was never built or is older than its maximum age.
+        """
+        return self.value is None or time.monotonic() - self.loaded_at > self.max_age
+
+    def _refresh_expired(self, wait: bool = True):
+        """
+        Rebuild the structure unless another thread is rebuilding it or just
+        did.
+
+        Args:
+            wait (bool): Wait for the rebuild of another thread, rather than
+                return at once.
+        """
+        if not self._lock.acquire(blocking=wait):
+            return
+        try:
+            if self.expired():
+                self.refresh()
+        finally:
+            self._lock.release()
+
+    def current(self) -> T:
+        """
+        Get the structure, rebuilding it in this thread if it expired. Only
+        one thread rebuilds it at a time; the others serve the current
+        structure meanwhile, or wait if there is none. If the rebuild fails,
+        the current structure is kept for another max_age.
+
+        Returns:
+            T: The structure, or None if it was never built.
+        """
+        if self.expired():
+            try:
+                self._refresh_expired(wait=self.value is None)
+            except Exception as e:
+                logger.warning(f"Couldn't rebuild the preloaded structure: {e}")
+                self.loaded_at = time.monotonic()
+        return self.value
+
+    async def get(self) -> T:
+        """
+        Get the structure. Once it expired, a single background task rebuilds
+        it while the current one is still served, and the current one is kept
+        if the rebuild fails. Only the first build is waited for.
+
+        Returns:
+            T: The structure.
+
+        Raises:
+            Exception: If the structure was never built and building it failed.
+        """
+        if self.expired() and self._rebuild is None:
+            self._rebuild = asyncio.create_task(self._refresh())
+        if self.value is None:
+            # Shielded, so a cancelled request doesn't cancel the shared build
+            await asyncio.shield(self._rebuild)
+        return self.value
+
+    async def _refresh(self):
+        try:
+            await run_in_threadpool(self._refresh_expired)
+        except Exception as e:
+            if self.value is None:
+                raise
+            logger.warning(f"Couldn't rebuild the preloaded structure: {e}")
+            self.loaded_at = time.monotonic()
+        finally:
+            self._rebuild = None
@@ -0,0 +1,179 @@
+"""
+On-demand sampling profiler.
+While a profiled request runs, a background thread samples the stacks of the
+process' threads and aggregates them into the folded format read by
+flamegraph.pl, speedscope and similar tools.
+"""
+
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of all threads at a fixed interval.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Initialize the SamplingProfiler.
+
+        Args:
+            interval (float): Seconds between two samples.
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        """
+        Start sampling in a background thread.
+        """
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> Dict[str, int]:
+        """
+        Stop sampling.
+
+        Returns:
+            Dict[str, int]: The number of samples per folded stack.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return dict(self.stacks)
+
+    @staticmethod
+    def write_folded(stacks: Dict[str, int], path: str):
+        """
+        Write the stacks in the folded format, one 'frame;frame;frame count' per line.
+
+        Args:
+            stacks (Dict[str, int]): The number of samples per folded stack.
+            path (str): The output file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilerTrigger:
+    """
+    Decides which requests are profiled: those that carry the privileged
+    header token, and a random sample of the rest.
+    """
+
+    HEADER = b"x-profile"
+
+    def __init__(
+        self,
+        token: str = None,
+        sample_rate: float = 0.0,
+        output_dir: str = "profiles",
+        interval: float = 0.005,
+    ):
+        """
+        Initialize the ProfilerTrigger.
+
+        Args:
+            token (str): Value of the X-Profile header that turns on profiling.
+                Header triggering is disabled if it is not set.
+            sample_rate (float): Fraction of the requests that are profiled.
+            output_dir (str): Directory the folded stacks are written to.
+            interval (float): Seconds between two samples.
+        """
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.interval = interval
+        # One profile at a time: the sampler sees every thread of the process
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.token is not None or self.sample_rate > 0
+
+    def should_profile(self, headers: list) -> bool:
+        """
+        Check if a request should be profiled.
+
+        Args:
+            headers (list): The raw ASGI request headers.
+
+        Returns:
+            bool: True if the request should be profiled.
+        """
+        if self.token is not None:
+            for name, value in headers:
+                if name == self.HEADER and hmac.compare_digest(value, self.token):
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self) -> SamplingProfiler:
+        """
+        Start a profiler unless another request is being profiled.
+
+        Returns:
+            SamplingProfiler: The started profiler, or None.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        profiler = SamplingProfiler(self.interval)
+        profiler.start()
+        return profiler
+
+    def finish(self, profiler: SamplingProfiler, method: str, route: str) -> str:
+        """
+        Stop the profiler and write its stacks.
+
+        Args:
+            profiler (SamplingProfiler): The started profiler.
+            method (str): The HTTP method of the request.
+            route (str): The route template of the request.
+
+        Returns:
+            str: The path of the written profile.
+        """
+        try:
+            stacks = profiler.stop()
+        finally:
+            self._lock.release()
+        name = "".join(c if c.isalnum() else "_" for c in route).strip("_") or "root"
+        path = os.path.join(
+            self.output_dir, f"{time.time_ns()}-{method.lower()}-{name}.folded"
+        )
+        profiler.write_folded(stacks, path)
+        return path
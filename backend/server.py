@@ -0,0 +1,397 @@
+"""
+Production entry point of the API.
+
+    python -m backend.server                 # one worker per available CPU
+    python -m backend.server --workers 4
+    python -m backend.server --reload        # development: one process, auto-reload
+
+The master process imports the application code, builds the read-only data
+the workers serve (the dataset snapshot, the spatial index and the border
+graph), freezes the garbage collector and binds the listening socket, then
+forks the workers, so the code and data are shared copy-on-write and the
+kernel balances connections across the workers. The app itself, with its
+Mongo and Redis clients, is created in every worker after the fork, as those
+clients are not fork-safe; the master's own clients are closed before it.
+
+Signed URLs of the local storage are checked by whichever worker serves them,
+so without STORAGE_SIGNING_SECRET the master generates one for its workers;
+it is only valid on this instance, so set it explicitly on every replica.
+
+Every worker keeps its own metrics and writes them to METRICS_MULTIPROC_DIR,
+a fresh temporary directory by default, so a scrape served by any worker
+returns the sum over all of them.
+
+On SIGTERM or SIGINT the workers stop accepting connections and finish their
+in-flight requests; workers still running after the graceful timeout are killed.
+Workers that exit unexpectedly are replaced after an exponential backoff; if a
+worker keeps crashing right after it starts, the server shuts down with an
+error, so the orchestrator restarts it.
+"""
+
+import argparse
+import gc
+import importlib
+import importlib.util
+import logging
+import math
+import os
+import secrets
+import signal
+import sys
+import tempfile
+import time
+from typing import Dict, List, Sequence
+
+import uvicorn
+from pymongo import MongoClient
+
+from backend.handler import RequestHandler
+from backend.preloaded import SHARED
+from internal.db.manager import NoSQLDatabaseManager
+from internal.db.model import DATABASE_NAME
+from internal.metrics import multiprocess
+from internal.storage.client import StorageClient
+
+logger = logging.getLogger(__name__)
+
+APP = "backend.app:app"
+PRELOAD_MODULES = ("backend.main",)
+
+# Milliseconds the master waits for MongoDB while preloading the data
+PRELOAD_TIMEOUT_MS = 2000
+
+
+def available_cpus(cgroup_path: str = "/sys/fs/cgroup/cpu.max") -> int:
+    """
+    Count the CPUs the process may use, honouring the CPU affinity and a
+    cgroup v2 quota such as a Kubernetes CPU limit.
+
+    Args:
+        cgroup_path (str): The cgroup file with the CPU quota and period.
+
+    Returns:
+        int: The number of CPUs, at least 1.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open(cgroup_path, encoding="utf-8") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+
+    return max(cpus, 1)
+
+
+def worker_count(workers: int = None) -> int:
+    """
+    Pick the number of workers: the argument, else WEB_CONCURRENCY, else the
+    number of available CPUs.
+
+    Args:
+        workers (int): The requested number of workers.
+
+    Returns:
+        int: The number of workers.
+    """
+    if workers:
+        return workers
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    return available_cpus()
+
+
+def fastest(candidates: Sequence[str], fallback: str) -> str:
+    """
+    Pick the first installed module of the candidates.
+
+    Args:
+        candidates (Sequence[str]): Module names, fastest first.
+        fallback (str): The choice if none of them is installed.
+
+    Returns:
+        str: The module name, or the fallback.
+    """
+    for name in candidates:
+        if importlib.util.find_spec(name) is not None:
+            return name
+    return fallback
+
+
+def preload(modules: Sequence[str] = PRELOAD_MODULES):
+    """
+    Import modules in the master so the workers inherit them, then move
+    everything allocated so far out of the garbage collector's reach, so
+    collections in the workers don't touch, and copy, the shared pages.
+
+    Args:
+        modules (Sequence[str]): The modules to import.
+    """
+    for module in modules:
+        importlib.import_module(module)
+    gc.collect()
+    gc.freeze()
+
+
+def preload_data(db_url: str, assets_dir: str = "/assets") -> Dict[str, object]:
+    """
+    Build the read-only data the workers serve and share it with them through
+    SHARED. The workers build what couldn't be loaded themselves, e.g. while
+    MongoDB is down.
+
+    Args:
+        db_url (str): The database URL.
+        assets_dir (str): The directory of the local storage.
+
+    Returns:
+        Dict[str, object]: The structures that were loaded, by name.
+    """
+    db_manager = NoSQLDatabaseManager(
+        db_url, MongoClient(db_url, serverSelectionTimeoutMS=PRELOAD_TIMEOUT_MS)
+    )
+    db_manager.db = db_manager.client[DATABASE_NAME]
+    handler = RequestHandler(
+        db_manager,
+        None,
+        assets_dir,
+        storage=StorageClient(assets_dir=assets_dir).get_storage(),
+        dataset_dir=os.getenv("DATASET_DIR"),
+    )
+    try:
+        for name in ("dataset", "geo_index", "border_graph"):
+            try:
+                SHARED[name] = getattr(handler, name).refresh()
+            except Exception as e:
+                logger.warning(f"Couldn't preload the {name}, the workers will: {e}")
+    finally:
+        # Not fork-safe
+        db_manager.client.close()
+    return dict(SHARED)
+
+
+def share_signing_secret(workers: int):
+    """
+    Generate the secret of the local storage's signed URLs if it isn't set
+    and several workers serve them, as each would otherwise pick its own.
+
+    Args:
+        workers (int): The number of workers.
+    """
+    if workers > 1 and not os.getenv("STORAGE_SIGNING_SECRET"):
+        os.environ["STORAGE_SIGNING_SECRET"] = secrets.token_hex(32)
+        logger.warning(
+            "STORAGE_SIGNING_SECRET is not set: signed URLs are only valid "
+            "on this instance"
+        )
+
+
+class Master:
+    """
+    Forks the workers, replaces the ones that die and drains them on shutdown.
+    """
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        workers: int,
+        graceful_timeout: float,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_restarts: int = 5,
+        stable_after: float = 60.0,
+    ):
+        """
+        Initialize the Master.
+
+        Args:
+            config (uvicorn.Config): The configuration of the workers.
+            workers (int): The number of workers.
+            graceful_timeout (float): Seconds the workers get to drain on shutdown.
+            backoff (float): Seconds before the first restart of a worker,
+                doubled on every consecutive restart.
+            max_backoff (float): The maximum seconds before a restart.
+            max_restarts (int): Consecutive restarts of a worker after which
+                the server shuts down.
+            stable_after (float): Seconds a worker must run for its restarts
+                to stop counting as consecutive.
+        """
+        self.config = config
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_restarts = max_restarts
+        self.stable_after = stable_after
+        self.children: Dict[int, int] = {}
+        self.started: Dict[int, float] = {}
+        self.restarts: Dict[int, int] = {}
+        self.stopping = False
+        self.socket = None
+
+    def _spawn(self, index: int):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            self.started[index] = time.monotonic()
+            return
+        # Worker: uvicorn installs its own SIGTERM/SIGINT handlers
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            uvicorn.Server(self.config).run(sockets=[self.socket])
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _reap(self) -> List[int]:
+        exited = []
+        while self.children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                break
+            if pid == 0:
+                break
+            exited.append(self.children.pop(pid, None))
+        return [index for index in exited if index is not None]
+
+    def _restart_delay(self, index: int) -> float:
+        """
+        Count a restart of the worker and pick its delay.
+
+        Args:
+            index (int): The worker that exited.
+
+        Returns:
+            float: Seconds before the restart, or None if the worker is
+                crash-looping.
+        """
+        if time.monotonic() - self.started.get(index, 0.0) >= self.stable_after:
+            self.restarts[index] = 0
+        self.restarts[index] = self.restarts.get(index, 0) + 1
+        if self.restarts[index] > self.max_restarts:
+            return None
+        return min(self.backoff * 2 ** (self.restarts[index] - 1), self.max_backoff)
+
+    def _drain(self):
+        logger.info(f"Draining {len(self.children)} workers...")
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+        # uvicorn enforces the timeout itself; the margin covers its shutdown
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in self.children:
+            logger.warning(f"Worker {pid} did not drain in time, killing it")
+            os.kill(pid, signal.SIGKILL)
+        while self.children:
+            self._reap()
+            time.sleep(0.01)
+
+    def run(self) -> int:
+        """
+        Serve until SIGTERM or SIGINT.
+
+        Returns:
+            int: The exit code, 1 if a worker was crash-looping.
+        """
+        code = 0
+        restart_at: Dict[int, float] = {}
+        self.socket = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info(
+            f"Serving {self.config.app} on {self.config.host}:{self.config.port} "
+            f"with {self.workers} workers ({self.config.loop}, {self.config.http})"
+        )
+        try:
+            while not self.stopping:
+                for index in self._reap():
+                    delay = self._restart_delay(index)
+                    if delay is None:
+                        logger.warning(f"Worker {index} keeps crashing, shutting down")
+                        self.stopping = True
+                        code = 1
+                        break
+                    logger.info(f"Worker {index} exited, restarting it in {delay:.1f}s")
+                    restart_at[index] = time.monotonic() + delay
+                for index, at in list(restart_at.items()):
+                    if not self.stopping and at <= time.monotonic():
+                        del restart_at[index]
+                        self._spawn(index)
+                time.sleep(0.2)
+            self._drain()
+        finally:
+            self.socket.close()
+        return code
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve the Countries API.")
+    parser.add_argument("--app", default=APP, help="The ASGI app to serve")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")))
+    parser.add_argument("--workers", type=int, help="Defaults to the available CPUs")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    parser.add_argument("--graceful-timeout", type=float, default=25.0)
+    parser.add_argument("--reload", action="store_true", help="Development mode")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    if args.reload:
+        uvicorn.run(
+            args.app,
+            host=args.host,
+            port=args.port,
+            reload=True,
+            reload_dirs=[os.path.dirname(os.path.abspath(__file__))],
+            log_level=args.log_level,
+        )
+        return 0
+
+    if os.getenv("MONGO_DB_URL"):
+        preload_data(os.environ["MONGO_DB_URL"])
+    preload()
+    workers = worker_count(args.workers)
+    share_signing_secret(workers)
+    if workers > 1:
+        directory = os.environ.setdefault(
+            multiprocess.DIRECTORY_ENV, tempfile.mkdtemp(prefix="countries-metrics-")
+        )
+        multiprocess.clear(directory)
+    config = uvicorn.Config(
+        args.app,
+        host=args.host,
+        port=args.port,
+        loop=fastest(["uvloop"], "asyncio"),
+        http=fastest(["httptools"], "h11"),
+        log_level=args.log_level,
+        access_log=False,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    return Master(config, workers, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Background initialization of the backend.
+The app starts serving liveness probes right away, while Mongo and Redis are
+connected concurrently and the caches are warmed in the background; the
+readiness state tells the load balancer when the pod can take traffic.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List
+
+from internal.cache.cache import CacheManager
+from internal.db.manager import NoSQLDatabaseManager
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+WARMING = "warming"
+READY = "ready"
+
+
+class Startup:
+    """
+    Connects to the dependencies, retrying with backoff until they are
+    reachable, then runs the warm-up functions.
+    """
+
+    def __init__(
+        self,
+        db_manager: NoSQLDatabaseManager,
+        cache_manager: CacheManager,
+        warmers: List[Callable[[], object]] = None,
+        services: List[Callable[[], Awaitable[object]]] = None,
+        retry_delay: float = 0.5,
+        max_retry_delay: float = 10.0,
+    ):
+        """
+        Initialize the Startup.
+
+        Args:
+            db_manager (NoSQLDatabaseManager): Database manager instance.
+            cache_manager (CacheManager): Cache manager instance.
+            warmers (List[Callable[[], object]]): Blocking functions run once
+                connected, e.g. filling caches. They run in a thread.
+            services (List[Callable[[], Awaitable[object]]]): Coroutine functions
+                that start background services once connected, before the warm-up.
+            retry_delay (float): Seconds before the first retry; doubled every retry.
+            max_retry_delay (float): Upper bound of the retry delay.
+        """
+        self.db_manager = db_manager
+        self.cache_manager = cache_manager
+        self.warmers = list(warmers or [])
+        self.services = list(services or [])
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.state = STARTING
+        self.attempts = 0
+        self.error = None
+        self.started_at = time.monotonic()
+        self.ready_after = None
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    async def _connect(self):
+        # Both clients block, so each connects in its own thread
+        await asyncio.gather(
+            asyncio.to_thread(self.db_manager.bootstrap, 1),
+            asyncio.to_thread(self.cache_manager.client.ping),
+        )
+
+    async def run(self):
+        """
+        Connect, start the background services and warm up.
+        Connection errors are retried forever; a failing warm-up function is
+        recorded but doesn't keep the backend from becoming ready, since every
+        cache is also filled on a miss.
+        """
+        delay = self.retry_delay
+        while True:
+            self.attempts += 1
+            try:
+                await self._connect()
+                break
+            except Exception as e:
+                self.error = f"Couldn't connect: {e}"
+                logger.warning(f"{self.error}. Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+        self.state = WARMING
+        self.error = None
+        for service in self.services:
+            await service()
+        for warmer in self.warmers:
+            try:
+                await asyncio.to_thread(warmer)
+            except Exception as e:
+                self.error = f"Warm-up failed: {e}"
+                logger.warning(self.error)
+
+        self.state = READY
+        self.ready_after = time.monotonic() - self.started_at
+        logger.info(f"Backend ready after {self.ready_after:.2f} seconds")
+
+    def start(self):
+        """
+        Run the startup in a background task of the running event loop.
+        """
+        self.started_at = time.monotonic()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """
+        Cancel the startup if it is still running.
+        """
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self) -> dict:
+        """
+        Describe the readiness state.
+
+        Returns:
+            dict: The state, the connection attempts and the last error.
+        """
+        status = {"status": self.state, "attempts": self.attempts}
+        if self.error:
+            status["error"] = self.error
+        if self.ready_after is not None:
+            status["ready_after_seconds"] = round(self.ready_after, 3)
+        return status
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+from redis import RedisError
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from backend.admission import (
+    AdmissionMiddleware,
+    ConcurrencyLimiter,
+    RedisTokenBucket,
+    Rejected,
+)
+
+
+def build_app(release: asyncio.Event, **kwargs):
+    async def slow(request):
+        await release.wait()
+        return PlainTextResponse("slow")
+
+    async def fast(request):
+        return PlainTextResponse("fast")
+
+    app = Starlette(routes=[Route("/slow", slow), Route("/fast", fast)])
+    app.add_middleware(AdmissionMiddleware, routes_app=app.router, **kwargs)
+    return app
+
+
+def test_concurrency_limiter_rejects_beyond_the_queue():
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, max_queue=1, max_wait=0.05)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(Rejected) as rejected:
+            await limiter.acquire()
+        assert rejected.value.reason == "concurrency"
+
+        limiter.release()
+        await waiter
+        assert limiter.active == 1
+
+        with pytest.raises(Rejected) as rejected:
+            await limiter.acquire()
+        assert rejected.value.reason == "queue_timeout"
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_limiter_requires_a_positive_limit():
+    with pytest.raises(ValueError):
+        ConcurrencyLimiter(limit=0)
+
+
+def test_middleware_sheds_load_of_limited_routes_only():
+    async def scenario():
+        release = asyncio.Event()
+        app = build_app(
+            release, limiters={("GET", "/slow"): ConcurrencyLimiter(1, max_queue=0)}
+        )
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            first = asyncio.create_task(c.get("/slow"))
+            await asyncio.sleep(0.01)
+
+            rejected = await c.get("/slow")
+            fast = await c.get("/fast")
+
+            release.set()
+            return (await first), rejected, fast
+
+    first, rejected, fast = asyncio.run(scenario())
+
+    assert first.status_code == 200
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "1"
+    assert fast.status_code == 200
+
+
+def test_middleware_rate_limits_per_client():
+    async def scenario(rate_limiter):
+        app = build_app(asyncio.Event(), rate_limiter=rate_limiter)
+        transport = httpx.ASGITransport(app=app, client=("10.0.0.1", 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await c.get("/fast")
+
+    rate_limiter = MagicMock()
+    rate_limiter.take.return_value = (False, 2.5)
+
+    response = asyncio.run(scenario(rate_limiter))
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "3"
+    rate_limiter.take.assert_called_once_with("10.0.0.1")
+
+
+def test_middleware_allows_requests_if_the_rate_limiter_is_slow():
+    async def scenario(rate_limiter):
+        app = build_app(
+            asyncio.Event(), rate_limiter=rate_limiter, rate_limit_timeout=0.05
+        )
+        transport = httpx.ASGITransport(app=app, client=("10.0.0.1", 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await c.get("/fast")
+
+    release = threading.Event()
+    rate_limiter = MagicMock()
+    rate_limiter.take.side_effect = lambda client_id: release.wait(5) and (False, 1)
+
+    try:
+        response = asyncio.run(scenario(rate_limiter))
+    finally:
+        release.set()
+
+    assert response.status_code == 200
+
+
+def test_token_bucket_reads_the_script_result():
+    redis_client = MagicMock()
+    redis_client.register_script.return_value.return_value = [0, "0.25"]
+    bucket = RedisTokenBucket(redis_client, rate=4, burst=8)
+
+    assert bucket.take("10.0.0.1") == (False, 0.25)
+    redis_client.register_script.return_value.assert_called_once_with(
+        keys=["ratelimit:10.0.0.1"], args=[4, 8]
+    )
+
+
+def test_token_bucket_allows_requests_if_redis_fails():
+    redis_client = MagicMock()
+    redis_client.register_script.return_value.side_effect = RedisError("down")
+    bucket = RedisTokenBucket(redis_client, rate=4, burst=8)
+
+    assert bucket.take("10.0.0.1") == (True, 0.0)
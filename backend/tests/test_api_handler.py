@@ -1,8 +1,19 @@
+import gzip
+import hashlib
+import json
+
 import pytest
 from unittest.mock import MagicMock
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
 from internal.db.manager import NoSQLDatabaseManager
 from internal.cache.cache import CacheManager
-from backend.handler import RequestHandler
+from internal.db.model import COUNTRY_FIELDS
+from backend.handler import RequestHandler, accepts_encoding
+from internal.dataset.snapshot import FORMAT_VERSION, encode_dataset
+from internal.storage.keys import dataset_key
+from internal.storage.local import LocalStorage
 
 
 @pytest.fixture
@@ -12,7 +23,9 @@ def mock_db_manager():
 
 @pytest.fixture
 def mock_cache_manager():
-    return MagicMock(spec=CacheManager)
+    cache_manager = MagicMock(spec=CacheManager)
+    cache_manager.get_sorted_page.return_value = None
+    return cache_manager
 
 
 @pytest.fixture
@@ -50,15 +63,55 @@ def test_get_countries_from_db(request_handler, mock_db_manager, mock_cache_mana
             "region": "RegionA",
         }
     ]
-    mock_db_manager.get_countries.assert_called_once_with(10, "population", "asc")
+    mock_db_manager.get_countries.assert_called_once_with(
+        10, "population", "asc", COUNTRY_FIELDS, 0
+    )
     mock_cache_manager.set_data.assert_called_once()
 
 
+def test_get_countries_from_view(request_handler, mock_db_manager, mock_cache_manager):
+    # Arrange
+    mock_cache_manager.get_sorted_page.return_value = [
+        {"country_name": "CountryA", "region": "RegionA", "capital": ["CapitalA"]}
+    ]
+
+    # Act
+    result = request_handler.get_countries(10, "region", -1, "capital", offset=20)
+
+    # Assert
+    assert result == [{"capital": ["CapitalA"]}]
+    args, kwargs = mock_cache_manager.get_sorted_page.call_args
+    assert args == (
+        "countries:{countries}:view:region",
+        "countries:{countries}:records",
+        20,
+        29,
+    )
+    assert kwargs["desc"] is True
+    mock_db_manager.get_countries.assert_not_called()
+
+
+def test_get_countries_with_offset_from_db(
+    request_handler, mock_db_manager, mock_cache_manager
+):
+    mock_cache_manager.get_data.return_value = None
+    mock_db_manager.get_countries.return_value = []
+
+    request_handler.get_countries(10, "area", 1, offset=20)
+
+    mock_cache_manager.get_data.assert_called_once_with(
+        "countries:limit=10:sort_by=area:order_by=1:offset=20"
+    )
+    mock_db_manager.get_countries.assert_called_once_with(
+        10, "area", 1, COUNTRY_FIELDS, 20
+    )
+
+
 def test_get_country_from_cache(request_handler, mock_cache_manager):
     mock_cache_manager.get_dict_data.return_value = {"country_name": "CountryA"}
     result = request_handler.get_country("CountryA")
     assert result == {"country_name": "CountryA"}
-    mock_cache_manager.get_dict_data.assert_called_once_with("country:CountryA")
+    mock_cache_manager.get_dict_data.assert_called_once_with("country:{CountryA}")
 
 
 def test_get_country_from_db(request_handler, mock_db_manager, mock_cache_manager):
@@ -78,39 +131,197 @@ def test_get_country_from_db(request_handler, mock_db_manager, mock_cache_manage
         "population": 50000,
         "region": "RegionA",
     }
-    mock_db_manager.get_country.assert_called_once_with("CountryA")
+    mock_db_manager.get_country.assert_called_once_with("CountryA", COUNTRY_FIELDS)
     mock_cache_manager.set_dict_data.assert_called_once()
 
 
+def test_get_country_with_selected_fields(
+    request_handler, mock_db_manager, mock_cache_manager
+):
+    mock_cache_manager.get_dict_data.return_value = None
+    mock_db_manager.get_country.return_value = {
+        "capital": ["CapitalA"],
+        "country_name": "CountryA",
+    }
+
+    # Order and duplicates don't matter
+    result = request_handler.get_country("CountryA", " capital,country_name,capital")
+
+    assert result == {"country_name": "CountryA", "capital": ["CapitalA"]}
+    mock_db_manager.get_country.assert_called_once_with(
+        "CountryA", ["country_name", "capital"]
+    )
+    mock_cache_manager.set_dict_data.assert_called_once_with(
+        "country:{CountryA}:fields=country_name,capital", result
+    )
+
+
+def test_get_countries_default_fields_share_the_default_key(
+    request_handler, mock_cache_manager
+):
+    mock_cache_manager.get_data.return_value = "[]"
+
+    request_handler.get_countries(10, "area", 1, "region,population,area,")
+    request_handler.get_countries(
+        10, "area", 1, "area,population,population_density,region,country_name"
+    )
+
+    mock_cache_manager.get_data.assert_called_with(
+        "countries:limit=10:sort_by=area:order_by=1"
+    )
+
+
+def test_get_countries_with_invalid_field(request_handler, mock_db_manager):
+    with pytest.raises(ValueError, match="Invalid fields: _id, password."):
+        request_handler.get_countries(10, "area", 1, "capital,password,_id")
+    mock_db_manager.get_countries.assert_not_called()
+
+
+def test_export_countries_as_ndjson(request_handler, mock_db_manager):
+    # Arrange
+    countries = [{"country_name": f"Country{index}"} for index in range(5)]
+    mock_db_manager.iter_countries.return_value = iter(countries)
+
+    # Act
+    chunks = list(request_handler.export_countries(batch_size=2))
+
+    # Assert: a chunk per batch, a document per line
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line) for line in lines] == countries
+    mock_db_manager.iter_countries.assert_called_once_with(None, 2)
+
+
+def test_export_countries_as_gzipped_columns(request_handler, mock_db_manager):
+    # Arrange
+    mock_db_manager.iter_countries.return_value = iter(
+        [{"country_name": "CountryA", "capital": ["A"]}, {"country_name": "CountryB"}]
+    )
+
+    # Act
+    chunks = request_handler.export_countries(
+        "capital,country_name", "columnar", compress=True
+    )
+
+    # Assert
+    batch = json.loads(gzip.decompress(b"".join(chunks)))
+    assert batch == {
+        "count": 2,
+        "columns": {"country_name": ["CountryA", "CountryB"], "capital": [["A"], None]},
+    }
+    mock_db_manager.iter_countries.assert_called_once_with(
+        ["country_name", "capital"], 500
+    )
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, False),
+        ("gzip", True),
+        ("deflate, GZIP;q=0.5", True),
+        ("gzip;q=0", False),
+        ("identity, gzip;q=0", False),
+        ("*", True),
+        ("*;q=0", False),
+        ("br, *;q=0.1", True),
+        ("gzip;q=0, *", False),
+        ("gzip;q=bogus", False),
+    ],
+)
+def test_accepts_encoding(accept_encoding, expected):
+    assert accepts_encoding(accept_encoding, "gzip") is expected
+
+
+def test_export_countries_with_invalid_format(request_handler, mock_db_manager):
+    with pytest.raises(ValueError, match="Invalid format: xml."):
+        request_handler.export_countries(format="xml")
+    mock_db_manager.iter_countries.assert_not_called()
+
+
+def test_get_trend_with_invalid_arguments(request_handler, mock_db_manager):
+    with pytest.raises(ValueError, match="Invalid metric: gdp."):
+        request_handler.get_trend("CountryA", "gdp")
+    with pytest.raises(ValueError, match="Invalid since"):
+        request_handler.get_trend("CountryA", since="2025-13")
+    mock_db_manager.get_metrics_history.assert_not_called()
+
+
 def test_upload_image(request_handler, mock_db_manager, mock_cache_manager, tmp_path):
-    mock_cache_manager.get_data.return_value = None
     mock_db_manager.add_image.return_value = None
 
-    # Use a temporary directory for file operations
-    temp_dir = tmp_path / "assets/CountryA/images"
-    temp_dir.mkdir(parents=True, exist_ok=True)
-    file_path = temp_dir / "test_image.jpg"
+    # Use a temporary directory for the storage
+    request_handler.storage = LocalStorage(str(tmp_path))
 
     file_content = b"test_image_data"
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-
-    # Mock the _get_file_path method to return the temporary file path
-    request_handler._get_file_path = MagicMock(return_value=str(file_path))
-
     image_id = request_handler.upload_image(
         "CountryA", file_content, "Test Title", "Test Description"
     )
     assert len(image_id) == 32  # Random hex ID of 16 bytes
+    assert (tmp_path / f"CountryA/images/{image_id}.jpg").read_bytes() == file_content
     mock_db_manager.add_image.assert_called_once()
-    mock_cache_manager.set_data.assert_called_once()
+    mock_cache_manager.get_data.assert_not_called()
+    mock_cache_manager.incr.assert_called_once_with("images:{CountryA}:generation")
+
+
+def test_upload_images_in_bulk(
+    request_handler, mock_db_manager, mock_cache_manager, tmp_path
+):
+    # Arrange
+    request_handler.storage = LocalStorage(str(tmp_path))
+
+    def broken_file():
+        yield b"partial"
+        raise IOError("client went away")
+
+    uploads = [
+        {"file": b"first", "filename": "a.jpg", "title": "A", "description": "a"},
+        {"file": broken_file(), "filename": "b.jpg", "title": "B", "description": "b"},
+        {"file": iter([b"sec", b"ond"]), "title": "C", "description": "c"},
+    ]
+
+    # Act
+    results = request_handler.upload_images("CountryA", uploads, concurrency=2)
+
+    # Assert: a result per file, one insert and one cache update
+    assert [result["status"] for result in results] == ["stored", "failed", "stored"]
+    assert results[1] == {
+        "filename": "b.jpg",
+        "status": "failed",
+        "error": "client went away",
+    }
+    assert results[2]["sha256"] == hashlib.sha256(b"second").hexdigest()
+    (images,) = mock_db_manager.add_images.call_args.args
+    assert [(image["title"], image["size"]) for image in images] == [("A", 5), ("C", 6)]
+    assert request_handler.storage.get(images[1]["file_path"]) == b"second"
+    assert len(list(tmp_path.rglob("*.jpg"))) == 2
+    mock_cache_manager.incr.assert_called_once_with("images:{CountryA}:generation")
+
+
+def test_upload_images_removes_the_files_if_the_insert_fails(
+    request_handler, mock_db_manager, mock_cache_manager, tmp_path
+):
+    request_handler.storage = LocalStorage(str(tmp_path))
+    mock_db_manager.add_images.side_effect = RuntimeError("database down")
+    uploads = [{"file": b"data", "title": "A", "description": "a"}]
+
+    with pytest.raises(RuntimeError):
+        request_handler.upload_images("CountryA", uploads)
+
+    assert not list(tmp_path.rglob("*.jpg"))
+    mock_cache_manager.incr.assert_not_called()
 
 
 def test_get_images_from_cache(request_handler, mock_cache_manager):
-    mock_cache_manager.get_data.return_value = '[{"image_id": "img123"}]'
-    result = request_handler.get_images("CountryA")
-    assert result == [{"image_id": "img123"}]
-    mock_cache_manager.get_data.assert_called_once_with("images:CountryA")
+    mock_cache_manager.get_data.side_effect = [
+        "3",
+        '{"images": [{"image_id": "img123"}], "next_cursor": null}',
+    ]
+    result = request_handler.get_images("CountryA", 10)
+    assert result == {"images": [{"image_id": "img123"}], "next_cursor": None}
+    mock_cache_manager.get_data.assert_called_with(
+        "images:{CountryA}:generation=3:limit=10:cursor="
+    )
 
 
 def test_get_images_from_db(
@@ -118,19 +329,201 @@ def test_get_images_from_db(
 ):
     mock_cache_manager.get_data.return_value = None
     mock_db_manager.get_images.return_value = [
-        {"image_id": "img123", "title": "Test", "description": "Test Desc"}
+        {
+            "_id": ObjectId(f"{i:024x}"),
+            "image_id": f"img{i}",
+            "title": "Test",
+            "description": "Test Desc",
+        }
+        for i in range(3)
     ]
 
-    # Create the expected file path
-    image_path = tmp_path / "assets/CountryA/images/img123.jpg"
-    image_path.parent.mkdir(parents=True, exist_ok=True)
-    image_path.write_bytes(b"test_image_data")
+    # Store the files of the images of the page
+    request_handler.storage = LocalStorage(str(tmp_path))
+    for i in range(2):
+        request_handler.storage.write(f"CountryA/images/img{i}.jpg", b"test_image_data")
+
+    result = request_handler.get_images("CountryA", 2, f"{9:024x}")
+    assert [image["image_id"] for image in result["images"]] == ["img0", "img1"]
+    assert result["images"][0]["file"] == "dGVzdF9pbWFnZV9kYXRh"  # Base64 content
+    assert result["next_cursor"] == f"{1:024x}"
+    mock_db_manager.get_images.assert_called_once_with(
+        "CountryA", 3, ObjectId(f"{9:024x}")
+    )
+    key, value = mock_cache_manager.set_data.call_args.args
+    assert key == f"images:{{CountryA}}:generation=0:limit=2:cursor={9:024x}"
+    assert json.loads(value) == result
 
-    # Mock the _get_file_path method to return the correct file path
-    request_handler._get_file_path = MagicMock(return_value=str(image_path))
 
-    result = request_handler.get_images("CountryA")
-    assert len(result) == 1
-    assert result[0]["image_id"] == "img123"
-    assert result[0]["file"] == "dGVzdF9pbWFnZV9kYXRh"  # Base64 encoded content
-    mock_cache_manager.set_data.assert_called_once()
+def test_get_images_last_page(request_handler, mock_db_manager, mock_cache_manager):
+    mock_cache_manager.get_data.return_value = None
+    mock_db_manager.get_images.return_value = []
+
+    result = request_handler.get_images("CountryA", 2)
+
+    assert result == {"images": [], "next_cursor": None}
+
+
+def test_get_images_rejects_invalid_cursors(request_handler):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        request_handler.get_images("CountryA", 2, "not-a-cursor")
+
+
+def test_process_image_saves_checksum_and_retires_pages(
+    request_handler, mock_db_manager, mock_cache_manager, tmp_path
+):
+    # Arrange
+    request_handler.storage = LocalStorage(str(tmp_path))
+    image_id = request_handler.store_image("CountryA", [b"test_", b"image_data"])
+    payload = {
+        "image_id": image_id,
+        "country_name": "CountryA",
+        "title": "Test Title",
+        "description": "Test Description",
+    }
+
+    # Act: a retried job processes the same image again
+    result = request_handler.process_image(payload)
+    request_handler.process_image(payload)
+
+    # Assert
+    assert result == {
+        "image_id": image_id,
+        "size": 15,
+        "sha256": hashlib.sha256(b"test_image_data").hexdigest(),
+    }
+    assert not list((tmp_path / "CountryA/images").glob("*.tmp"))
+    key, image = mock_db_manager.add_image.call_args.args
+    assert key == image_id
+    assert image["sha256"] == result["sha256"]
+    mock_cache_manager.incr.assert_called_with("images:{CountryA}:generation")
+
+
+def test_preloaded_geo_index(request_handler, mock_db_manager):
+    mock_db_manager.get_countries.return_value = [
+        {"country_name": "CountryA", "latlng": [10.0, 20.0]},
+        {"country_name": "CountryB", "latlng": [-10.0, -20.0]},
+    ]
+    assert request_handler.geo_index.expired()
+
+    index = request_handler.geo_index.refresh()
+
+    mock_db_manager.get_countries.assert_called_once_with(
+        0, "country_name", 1, ["country_name", "latlng"]
+    )
+    assert index.nearest(9.0, 19.0, 1)[0]["country_name"] == "CountryA"
+    assert not request_handler.geo_index.expired()
+    request_handler.geo_index.max_age = 0
+    assert request_handler.geo_index.expired()
+
+
+def test_preloaded_border_graph(request_handler, mock_db_manager):
+    mock_db_manager.get_graph.return_value = None
+    assert len(request_handler.border_graph.refresh()) == 0
+
+    mock_db_manager.get_graph.return_value = {
+        "version": 1,
+        "names": ["CountryA", "CountryB"],
+        "offsets": [0, 1, 2],
+        "targets": [1, 0],
+    }
+    graph = request_handler.border_graph.refresh()
+
+    mock_db_manager.get_graph.assert_called_with("borders")
+    assert graph.neighbors("CountryA") == ["CountryB"]
+
+
+def test_reads_fall_back_to_the_dataset_snapshot(
+    mock_db_manager, mock_cache_manager, tmp_path
+):
+    # Arrange
+    storage = LocalStorage(str(tmp_path))
+    storage.write(
+        dataset_key(FORMAT_VERSION),
+        encode_dataset(
+            [
+                {"country_name": "CountryA", "population": 2, "region": "RegionA"},
+                {"country_name": "CountryB", "population": 1, "region": "RegionB"},
+            ]
+        ),
+    )
+    request_handler = RequestHandler(
+        mock_db_manager, mock_cache_manager, storage=storage
+    )
+    mock_cache_manager.get_data.return_value = None
+    mock_cache_manager.get_dict_data.return_value = None
+    mock_db_manager.get_countries.side_effect = AutoReconnect("maintenance")
+    mock_db_manager.get_country.side_effect = AutoReconnect("maintenance")
+
+    # Act: a database error without a snapshot is raised
+    with pytest.raises(AutoReconnect):
+        request_handler.get_countries(1, "population", -1)
+    request_handler.dataset.refresh()
+    countries = request_handler.get_countries(1, "population", -1, "region", 1)
+    country = request_handler.get_country("CountryA", "population")
+
+    # Assert
+    assert countries == [{"region": "RegionB"}]
+    assert country == {"population": 2}
+    mock_cache_manager.set_data.assert_not_called()
+    assert request_handler.get_countries_from_snapshot(0, "population", 1) == [
+        {
+            "country_name": "CountryB",
+            "population_density": None,
+            "area": None,
+            "population": 1,
+            "region": "RegionB",
+        },
+        {
+            "country_name": "CountryA",
+            "population_density": None,
+            "area": None,
+            "population": 2,
+            "region": "RegionA",
+        },
+    ]
+    assert request_handler.get_country("Unknown") is None
+    assert request_handler.get_country_from_snapshot("Unknown") is None
+
+
+def test_dataset_is_downloaded_once_per_version(
+    mock_db_manager, mock_cache_manager, tmp_path
+):
+    # Arrange
+    storage = MagicMock()
+    storage.version.return_value = "etag-1"
+    storage.read.side_effect = lambda key: iter(
+        [encode_dataset([{"country_name": "CountryA"}])]
+    )
+    request_handler = RequestHandler(
+        mock_db_manager,
+        mock_cache_manager,
+        storage=storage,
+        dataset_dir=str(tmp_path),
+    )
+
+    # Act
+    first = request_handler.dataset.refresh()
+    unchanged = request_handler.dataset.refresh()
+    storage.version.return_value = "etag-2"
+    changed = request_handler.dataset.refresh()
+
+    # Assert: the downloads were mapped and removed
+    assert unchanged is first
+    assert changed is not first
+    assert changed.get_country("CountryA")["country_name"] == "CountryA"
+    assert storage.read.call_count == 2
+    assert not list(tmp_path.iterdir())
+
+
+def test_get_unknown_country(request_handler, mock_db_manager, mock_cache_manager):
+    # Arrange
+    mock_cache_manager.get_dict_data.return_value = None
+    mock_db_manager.get_country.return_value = None
+
+    # Act
+    result = request_handler.get_country("Unknown")
+
+    # Assert
+    assert result is None
+    mock_cache_manager.set_dict_data.assert_not_called()
@@ -0,0 +1,269 @@
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from pymongo.errors import DuplicateKeyError
+
+from backend.jobs import FAILED, PENDING, RUNNING, SUCCEEDED, JobQueue
+from backend.main import APIBackend
+
+
+class InMemoryJobs:
+    """
+    The job methods of the database manager, backed by a dict.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+
+    def add_job(self, job):
+        key = job.get("idempotency_key")
+        if key and any(j.get("idempotency_key") == key for j in self.jobs.values()):
+            raise DuplicateKeyError("duplicate idempotency_key")
+        self.jobs[job["job_id"]] = dict(job)
+
+    def get_job(self, job_id=None, idempotency_key=None):
+        for job in self.jobs.values():
+            if job["job_id"] == job_id or (
+                idempotency_key and job.get("idempotency_key") == idempotency_key
+            ):
+                return dict(job)
+        return None
+
+    def update_job(self, job_id, fields):
+        self.jobs[job_id].update(fields)
+
+    def get_jobs(self, states, limit=0):
+        jobs = [dict(j) for j in self.jobs.values() if j["state"] in states]
+        return jobs[:limit] if limit else jobs
+
+    @staticmethod
+    def _claimable(job, states, leased_states, now):
+        if job["state"] in states:
+            return True
+        lease_until = job.get("lease_until")
+        return job["state"] in leased_states and (lease_until or 0) < now
+
+    def claim_job(self, job_id, states, leased_states, now, fields):
+        job = self.jobs.get(job_id)
+        if job is None or not self._claimable(job, states, leased_states, now):
+            return None
+        job.update(fields, attempts=job["attempts"] + 1)
+        return dict(job)
+
+    def get_claimable_jobs(self, states, leased_states, now, limit=0):
+        jobs = [
+            dict(job)
+            for job in self.jobs.values()
+            if self._claimable(job, states, leased_states, now)
+        ]
+        return jobs[:limit] if limit else jobs
+
+
+async def _wait_for(queue, job_id, states=(SUCCEEDED, FAILED)):
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job["state"] in states:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} is still {job['state']}")
+
+
+def test_failing_job_is_retried_until_it_succeeds():
+    # Arrange
+    handler = MagicMock(side_effect=[Exception("Mongo is down"), {"ok": 1}])
+    queue = JobQueue(InMemoryJobs(), retry_delay=0.01)
+    queue.register("work", handler)
+
+    async def scenario():
+        await queue.start()
+        job = await queue.submit("work", {"n": 1})
+        job = await _wait_for(queue, job["job_id"])
+        await queue.stop()
+        return job
+
+    # Act
+    job = asyncio.run(scenario())
+
+    # Assert
+    assert job["state"] == SUCCEEDED
+    assert job["attempts"] == 2
+    assert job["result"] == {"ok": 1}
+    assert job["error"] is None
+    handler.assert_called_with({"n": 1})
+
+
+def test_job_fails_after_max_attempts():
+    # Arrange
+    queue = JobQueue(InMemoryJobs(), max_attempts=3, retry_delay=0.01)
+    queue.register("work", MagicMock(side_effect=ValueError("bad image")))
+
+    async def scenario():
+        await queue.start()
+        job = await queue.submit("work", {})
+        job = await _wait_for(queue, job["job_id"])
+        await queue.stop()
+        return job
+
+    # Act
+    job = asyncio.run(scenario())
+
+    # Assert
+    assert job["state"] == FAILED
+    assert job["attempts"] == 3
+    assert job["error"] == "ValueError: bad image"
+
+
+def test_idempotency_key_returns_the_first_job():
+    # Arrange
+    store = InMemoryJobs()
+    queue = JobQueue(store)
+    queue.register("work", MagicMock())
+
+    async def scenario():
+        # The workers are not started, so the jobs stay pending
+        queue._queue = asyncio.Queue()
+        first = await queue.submit("work", {"n": 1}, idempotency_key="abc")
+        second = await queue.submit("work", {"n": 2}, idempotency_key="abc")
+        return first, second
+
+    # Act
+    first, second = asyncio.run(scenario())
+
+    # Assert
+    assert second["job_id"] == first["job_id"]
+    assert second["payload"] == {"n": 1}
+    assert len(store.jobs) == 1
+
+
+def test_unfinished_jobs_are_resumed_on_start():
+    # Arrange
+    store = InMemoryJobs()
+    jobs = [
+        ("a", PENDING, None),
+        ("b", RUNNING, time.time() - 1),
+        ("c", SUCCEEDED, None),
+        # Still leased by a live process
+        ("d", RUNNING, time.time() + 60),
+    ]
+    for job_id, state, lease_until in jobs:
+        store.add_job(
+            {"job_id": job_id, "kind": "work", "payload": {}, "state": state}
+            | {"attempts": 1, "error": None, "result": None}
+            | {"lease_until": lease_until}
+        )
+    handler = MagicMock(return_value=None)
+    queue = JobQueue(store)
+    queue.register("work", handler)
+
+    async def scenario():
+        await queue.start()
+        await _wait_for(queue, "a")
+        await _wait_for(queue, "b")
+        await queue.stop()
+
+    # Act
+    asyncio.run(scenario())
+
+    # Assert
+    assert handler.call_count == 2
+    assert store.jobs["b"]["attempts"] == 2
+    assert store.jobs["c"]["attempts"] == 1
+    assert store.jobs["d"]["state"] == RUNNING
+    assert store.jobs["d"]["attempts"] == 1
+
+
+def test_a_job_runs_once_across_queues():
+    # Arrange
+    store = InMemoryJobs()
+    handler = MagicMock(return_value=None)
+    queues = [JobQueue(store), JobQueue(store)]
+    for queue in queues:
+        queue.register("work", handler)
+
+    async def scenario():
+        queues[0]._queue = asyncio.Queue()
+        job = await queues[0].submit("work", {})
+        # Both processes found the job pending
+        await asyncio.gather(*(queue.run(job["job_id"]) for queue in queues))
+        return job
+
+    # Act
+    job = asyncio.run(scenario())
+
+    # Assert
+    assert handler.call_count == 1
+    assert store.jobs[job["job_id"]]["state"] == SUCCEEDED
+
+
+def test_failed_job_is_cleaned_up_and_timers_are_dropped():
+    # Arrange
+    store = InMemoryJobs()
+    on_failure = MagicMock()
+    queue = JobQueue(store, max_attempts=3, retry_delay=0.01)
+    queue.register("work", MagicMock(side_effect=ValueError("bad")), on_failure)
+
+    async def scenario():
+        await queue.start()
+        job = await queue.submit("work", {"n": 1})
+        job = await _wait_for(queue, job["job_id"])
+        timers = dict(queue._timers)
+        await queue.stop()
+        return job, timers
+
+    # Act
+    job, timers = asyncio.run(scenario())
+
+    # Assert
+    assert job["state"] == FAILED
+    on_failure.assert_called_once_with({"n": 1})
+    assert timers == {}
+
+
+def test_upload_returns_accepted_and_processes_in_background(tmp_path):
+    # Arrange
+    store = InMemoryJobs()
+    with patch("backend.main.NoSQLDatabaseManager") as mock_db_manager:
+        db_manager = mock_db_manager.return_value
+        for name in (
+            "add_job",
+            "get_job",
+            "update_job",
+            "get_jobs",
+            "claim_job",
+            "get_claimable_jobs",
+        ):
+            setattr(db_manager, name, getattr(store, name))
+        backend = APIBackend("mongodb://test", MagicMock(), assets_dir=str(tmp_path))
+    backend.startup.warmers = []
+    upload = {
+        "files": {"file": ("image.jpg", b"image_data")},
+        "data": {"title": "Title", "description": "Description"},
+        "headers": {"Idempotency-Key": "upload-1"},
+    }
+
+    with TestClient(backend.app) as client:
+        for _ in range(100):
+            if client.get("/ready").status_code == 200:
+                break
+            time.sleep(0.01)
+
+        # Act
+        response = client.post("/countries/CountryA/images", **upload)
+        retried = client.post("/countries/CountryA/images", **upload)
+        job_id = response.json()["job_id"]
+        for _ in range(200):
+            job = client.get(f"/jobs/{job_id}").json()["job"]
+            if job["state"] == SUCCEEDED:
+                break
+            time.sleep(0.01)
+
+        # Assert
+        assert response.status_code == 202
+        assert retried.json()["job_id"] == job_id
+        assert retried.json()["result"] == response.json()["result"]
+        assert job["result"]["size"] == len(b"image_data")
+        assert client.get("/jobs/unknown").status_code == 404
+    assert len(list((tmp_path / "CountryA/images").iterdir())) == 1
+    db_manager.add_image.assert_called_once()
@@ -0,0 +1,41 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import APIBackend
+
+
+@pytest.fixture
+def client():
+    with patch("backend.main.NoSQLDatabaseManager") as mock_db_manager:
+        mock_db_manager.return_value = MagicMock()
+        backend = APIBackend("mongodb://test", MagicMock())
+    return TestClient(backend.app)
+
+
+def test_metrics_endpoint_exposes_route_metrics(client):
+    client.get("/health")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert (
+        'countries_http_requests_total{method="GET",route="/health",status="200"}'
+        in body
+    )
+    assert (
+        'countries_http_request_duration_seconds_count{method="GET",route="/health"}'
+        in body
+    )
+    assert "# TYPE countries_http_requests_in_flight gauge" in body
+    assert "# TYPE countries_cache_requests_total counter" in body
+
+
+def test_metrics_label_path_templates(client):
+    client.get("/countries/CountryA/images")
+
+    body = client.get("/metrics").text
+    assert 'route="/countries/{countryName}/images"' in body
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.preloaded import Preloaded
+
+
+def test_get_builds_once_for_concurrent_callers():
+    # Arrange
+    calls = []
+
+    def load():
+        calls.append(1)
+        return len(calls)
+
+    preloaded = Preloaded(load)
+
+    async def scenario():
+        return await asyncio.gather(*(preloaded.get() for _ in range(10)))
+
+    # Act
+    values = asyncio.run(scenario())
+
+    # Assert
+    assert values == [1] * 10
+    assert len(calls) == 1
+
+
+def test_get_serves_the_old_value_while_rebuilding():
+    # Arrange
+    release = threading.Event()
+    preloaded = Preloaded(lambda: release.wait(5) and "new", initial="old")
+    preloaded.loaded_at = 0.0
+
+    async def scenario():
+        first = await preloaded.get()
+        second = await preloaded.get()
+        rebuild = preloaded._rebuild
+        release.set()
+        await rebuild
+        return first, second, await preloaded.get()
+
+    # Act
+    first, second, third = asyncio.run(scenario())
+
+    # Assert
+    assert (first, second, third) == ("old", "old", "new")
+
+
+def test_get_keeps_the_old_value_if_the_rebuild_fails():
+    # Arrange
+    def load():
+        raise RuntimeError("Mongo is down")
+
+    preloaded = Preloaded(load, initial="old")
+    preloaded.loaded_at = 0.0
+
+    async def scenario():
+        await preloaded.get()
+        await preloaded._rebuild
+        return await preloaded.get()
+
+    # Act
+    value = asyncio.run(scenario())
+
+    # Assert
+    assert value == "old"
+    assert not preloaded.expired()
+
+
+def test_get_raises_if_the_first_build_fails():
+    # Arrange
+    def load():
+        raise RuntimeError("Mongo is down")
+
+    preloaded = Preloaded(load)
+
+    # Act / Assert
+    with pytest.raises(RuntimeError, match="Mongo is down"):
+        asyncio.run(preloaded.get())
+
+
+def test_current_builds_once_for_concurrent_threads():
+    # Arrange
+    calls = []
+    release = threading.Event()
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return len(calls)
+
+    preloaded = Preloaded(load)
+    values = []
+    threads = [
+        threading.Thread(target=lambda: values.append(preloaded.current()))
+        for _ in range(8)
+    ]
+
+    # Act
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    # Assert
+    assert values == [1] * 8
+    assert len(calls) == 1
+
+
+def test_current_serves_the_old_value_while_another_thread_rebuilds():
+    # Arrange
+    started, release = threading.Event(), threading.Event()
+
+    def load():
+        started.set()
+        release.wait(5)
+        return "new"
+
+    preloaded = Preloaded(load, initial="old")
+    preloaded.loaded_at = 0.0
+    rebuild = threading.Thread(target=preloaded.current)
+
+    # Act
+    rebuild.start()
+    started.wait(5)
+    during = preloaded.current()
+    release.set()
+    rebuild.join(5)
+
+    # Assert
+    assert during == "old"
+    assert preloaded.current() == "new"
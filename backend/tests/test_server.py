@@ -0,0 +1,141 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from backend import server
+
+
+@pytest.mark.parametrize(
+    "cpu_max, expected",
+    [("max 100000", 4), ("50000 100000", 1), ("250000 100000", 3)],
+)
+def test_available_cpus_honours_the_cgroup_quota(
+    tmp_path, monkeypatch, cpu_max, expected
+):
+    # Arrange
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: {0, 1, 2, 3})
+    path = tmp_path / "cpu.max"
+    path.write_text(cpu_max)
+
+    # Act & Assert
+    assert server.available_cpus(str(path)) == expected
+
+
+def test_available_cpus_without_cgroup(tmp_path, monkeypatch):
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: {0, 1})
+
+    assert server.available_cpus(str(tmp_path / "missing")) == 2
+
+
+def test_worker_count(monkeypatch):
+    monkeypatch.setattr(server, "available_cpus", lambda: 8)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+
+    assert server.worker_count(3) == 3
+    assert server.worker_count() == 8
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    assert server.worker_count() == 2
+
+
+def test_fastest_falls_back_if_nothing_is_installed():
+    assert server.fastest(["not_a_real_module"], "asyncio") == "asyncio"
+    assert server.fastest(["not_a_real_module", "json"], "asyncio") == "json"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_master_backs_off_and_stops_a_crash_loop(monkeypatch):
+    # Arrange
+    clock = FakeClock()
+    monkeypatch.setattr(server.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(server.time, "sleep", clock.sleep)
+    monkeypatch.setattr(server.signal, "signal", lambda signum, handler: None)
+    spawned = []
+    exited = []
+
+    def fork():
+        spawned.append(clock.now)
+        exited.append(len(spawned))
+        return len(spawned)
+
+    def waitpid(pid, options):
+        # Every worker crashes right after it starts
+        return (exited.pop(0), 0) if exited else (0, 0)
+
+    monkeypatch.setattr(server.os, "fork", fork)
+    monkeypatch.setattr(server.os, "waitpid", waitpid)
+    master = server.Master(
+        MagicMock(), 1, graceful_timeout=1, backoff=1, max_backoff=4, max_restarts=4
+    )
+
+    # Act
+    code = master.run()
+
+    # Assert
+    assert code == 1
+    assert len(spawned) == 5
+    delays = [b - a for a, b in zip(spawned, spawned[1:])]
+    assert [round(delay) for delay in delays] == [1, 2, 4, 4]
+
+
+def test_master_resets_the_backoff_of_a_stable_worker(monkeypatch):
+    # Arrange
+    clock = FakeClock()
+    monkeypatch.setattr(server.time, "monotonic", clock.monotonic)
+    master = server.Master(MagicMock(), 1, graceful_timeout=1, stable_after=60)
+    master.started[0] = 0.0
+    assert master._restart_delay(0) == 0.5
+    master.started[0] = 1.0
+    assert master._restart_delay(0) == 1.0
+
+    # Act
+    master.started[0] = 2.0
+    clock.now = 100.0
+    delay = master._restart_delay(0)
+
+    # Assert
+    assert delay == 0.5
+
+
+def test_preload_data_shares_what_could_be_loaded(monkeypatch):
+    # Arrange
+    client = MagicMock()
+    handler = MagicMock()
+    handler.dataset.refresh.return_value = "snapshot"
+    handler.geo_index.refresh.side_effect = Exception("Mongo is down")
+    handler.border_graph.refresh.side_effect = Exception("Mongo is down")
+    monkeypatch.setattr(server, "MongoClient", lambda *args, **kwargs: client)
+    monkeypatch.setattr(server, "RequestHandler", lambda *args, **kwargs: handler)
+    monkeypatch.setattr(server, "StorageClient", MagicMock())
+    monkeypatch.setattr(server, "SHARED", {})
+
+    # Act
+    shared = server.preload_data("mongodb://test")
+
+    # Assert
+    assert shared == {"dataset": "snapshot"}
+    client.close.assert_called_once()
+
+
+def test_share_signing_secret_between_workers(monkeypatch):
+    # Arrange
+    monkeypatch.setattr(server.os, "environ", {})
+
+    # Act & Assert: one worker signs and checks its own URLs
+    server.share_signing_secret(1)
+    assert "STORAGE_SIGNING_SECRET" not in server.os.environ
+    server.share_signing_secret(4)
+    secret = server.os.environ["STORAGE_SIGNING_SECRET"]
+    assert len(secret) == 64
+    # A configured secret is kept
+    server.share_signing_secret(4)
+    assert server.os.environ["STORAGE_SIGNING_SECRET"] == secret
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from backend.main import APIBackend
+from backend.startup import READY, Startup
+
+
+def test_startup_retries_until_connected():
+    # Arrange
+    db_manager = MagicMock()
+    db_manager.bootstrap.side_effect = [Exception("Mongo is down"), None]
+    warmer = MagicMock()
+    startup = Startup(db_manager, MagicMock(), [warmer], retry_delay=0.01)
+
+    # Act
+    asyncio.run(startup.run())
+
+    # Assert
+    assert startup.state == READY
+    assert startup.attempts == 2
+    warmer.assert_called_once()
+    assert "error" not in startup.status()
+
+
+def test_failing_warm_up_does_not_block_readiness():
+    # Arrange
+    warmer = MagicMock(side_effect=Exception("Redis is full"))
+    startup = Startup(MagicMock(), MagicMock(), [warmer])
+
+    # Act
+    asyncio.run(startup.run())
+
+    # Assert
+    assert startup.ready
+    assert startup.status()["error"] == "Warm-up failed: Redis is full"
+
+
+def test_ready_endpoint_and_gating_during_startup():
+    # Arrange
+    connected = threading.Event()
+    with patch("backend.main.NoSQLDatabaseManager") as mock_db_manager:
+        mock_db_manager.return_value.bootstrap.side_effect = (
+            lambda *args: connected.wait(5)
+        )
+        mock_db_manager.return_value.get_countries.return_value = []
+        cache = MagicMock()
+        cache.get.return_value = None
+        backend = APIBackend("mongodb://test", cache)
+
+    with TestClient(backend.app) as client:
+        # Act & Assert: live but not ready while Mongo is unreachable
+        assert client.get("/health").status_code == 200
+        assert client.get("/ready").json()["status"] == "starting"
+        response = client.get("/countries")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+
+        connected.set()
+        for _ in range(100):
+            if client.get("/ready").status_code == 200:
+                break
+            time.sleep(0.01)
+
+        assert client.get("/ready").json()["status"] == "ready"
+        assert client.get("/countries").status_code == 200
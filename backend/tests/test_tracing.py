@@ -0,0 +1,71 @@
+import contextvars
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import APIBackend
+from backend.profiler import SamplingProfiler
+from backend.tracing import RequestTrace, span, start_trace
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILE_TOKEN", "secret")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    with patch("backend.main.NoSQLDatabaseManager") as mock_db_manager:
+        mock_db_manager.return_value = MagicMock()
+        backend = APIBackend("mongodb://test", MagicMock())
+    return TestClient(backend.app)
+
+
+def test_span_without_trace_is_a_no_op():
+    with span("db") as result:
+        pass
+    assert result.trace is None
+
+
+def test_spans_add_up_per_name():
+    def handle_request():
+        trace = start_trace()
+        with span("cache"):
+            pass
+        with span("cache"):
+            pass
+        return trace
+
+    # Run in a copied context, so the trace does not leak into other tests
+    trace = contextvars.copy_context().run(handle_request)
+
+    assert trace.counts == {"cache": 2}
+    assert trace.server_timing().startswith("cache;dur=")
+
+
+def test_server_timing_header(client):
+    response = client.get("/health")
+
+    assert "total;dur=" in response.headers["server-timing"]
+
+
+def test_profile_with_token_writes_folded_stacks(client, tmp_path):
+    client.get("/health", headers={"X-Profile": "secret"})
+    client.get("/health", headers={"X-Profile": "wrong"})
+
+    profiles = list(tmp_path.glob("*.folded"))
+    assert len(profiles) == 1
+    assert profiles[0].name.endswith("-get-health.folded")
+
+
+def test_write_folded(tmp_path):
+    path = tmp_path / "profile.folded"
+
+    SamplingProfiler.write_folded({"MainThread;main;work": 3}, str(path))
+
+    assert path.read_text() == "MainThread;main;work 3\n"
+
+
+def test_request_trace_to_dict():
+    trace = RequestTrace()
+    trace.add("fs", 0.002)
+
+    assert trace.to_dict() == {"fs": {"duration_ms": 2.0, "count": 1}}
@@ -0,0 +1,141 @@
+"""
+Per-request timing breakdown.
+Work inside a request is wrapped in spans (cache, db, fs, snapshot, serialize);
+the time per span is returned in the Server-Timing header and logged as
+structured JSON.
+Outside of a traced request a span only does one context variable lookup.
+"""
+
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+
+logger = logging.getLogger("backend.requests")
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar(
+    "request_trace", default=None
+)
+
+
+class RequestTrace:
+    """
+    The time spent per kind of work within one request.
+    """
+
+    __slots__ = ("start", "durations", "counts")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, name: str, seconds: float):
+        """
+        Add the duration of a span.
+
+        Args:
+            name (str): The name of the span.
+            seconds (float): The duration of the span.
+        """
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def elapsed(self) -> float:
+        """
+        Time since the start of the request, in seconds.
+        """
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """
+        Render the spans as a Server-Timing header value.
+
+        Returns:
+            str: The header value, e.g. 'cache;dur=0.41, db;dur=3.20, total;dur=4.02'.
+        """
+        metrics = [
+            f"{name};dur={seconds * 1000:.2f}"
+            for name, seconds in self.durations.items()
+        ]
+        metrics.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(metrics)
+
+    def to_dict(self) -> dict:
+        """
+        The spans in milliseconds, for the structured log.
+        """
+        return {
+            name: {
+                "duration_ms": round(seconds * 1000, 3),
+                "count": self.counts[name],
+            }
+            for name, seconds in self.durations.items()
+        }
+
+
+class span:
+    """
+    Context manager that adds the duration of its block to the current trace.
+
+    Example:
+        with span("db"):
+            country = self.db_manager.get_country(country_name)
+    """
+
+    __slots__ = ("name", "trace", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = _current_trace.get()
+        if self.trace is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.trace is not None:
+            self.trace.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def start_trace() -> RequestTrace:
+    """
+    Start tracing the current request.
+
+    Returns:
+        RequestTrace: The trace of the request.
+    """
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+
+def log_request(trace: RequestTrace, method: str, path: str, status: int, **extra):
+    """
+    Write one structured log line for a finished request.
+
+    Args:
+        trace (RequestTrace): The trace of the request.
+        method (str): The HTTP method.
+        path (str): The request path.
+        status (int): The response status code.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info(
+        json.dumps(
+            {
+                "event": "request",
+                "method": method,
+                "path": path,
+                "status": status,
+                "duration_ms": round(trace.elapsed() * 1000, 3),
+                "spans": trace.to_dict(),
+                **extra,
+            }
+        )
+    )
@@ -0,0 +1,474 @@
+"""
+In-process stand-ins for Redis and MongoDB.
+They implement the subset of the redis-py and pymongo APIs the project uses,
+so the real CacheManager, NoSQLDatabaseManager and handlers can run without
+a network or containers. Expiry times are accepted and ignored.
+"""
+
+import copy
+import itertools
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+
+
+class FakeRedis:
+    """
+    A dictionary-backed Redis with decode_responses=True semantics.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _encode(value: Any) -> str:
+        if isinstance(value, bytes):
+            return value.decode("utf-8")
+        return str(value)
+
+    def ping(self) -> bool:
+        return True
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._data.get(key)
+        if value is not None and not isinstance(value, str):
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind")
+        return value
+
+    def set(self, key: str, value: Any, ex: int = None, px: int = None, nx=False):
+        with self._lock:
+            if nx and key in self._data:
+                return None
+            self._data[key] = self._encode(value)
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    def exists(self, *keys: str) -> int:
+        return sum(1 for key in keys if key in self._data)
+
+    def expire(self, key: str, seconds: int) -> bool:
+        return key in self._data
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            value = int(self._data.get(key, 0)) + amount
+            self._data[key] = str(value)
+            return value
+
+    def hset(self, key: str, field: str = None, value: Any = None, mapping=None):
+        with self._lock:
+            hash_ = self._data.setdefault(key, {})
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            added = sum(1 for name in items if name not in hash_)
+            hash_.update({name: self._encode(item) for name, item in items.items()})
+            return added
+
+    def hget(self, key: str, field: str) -> Optional[str]:
+        return self._data.get(key, {}).get(field)
+
+    def hgetall(self, key: str) -> Dict[str, str]:
+        return dict(self._data.get(key, {}))
+
+    def hkeys(self, key: str) -> List[str]:
+        return list(self._data.get(key, {}))
+
+    def hmget(self, key: str, fields: Iterable[str]) -> List[Optional[str]]:
+        hash_ = self._data.get(key, {})
+        return [hash_.get(field) for field in fields]
+
+    def hdel(self, key: str, *fields: str) -> int:
+        with self._lock:
+            hash_ = self._data.get(key, {})
+            return sum(1 for field in fields if hash_.pop(field, None) is not None)
+
+    def rpush(self, key: str, *values: Any) -> int:
+        with self._lock:
+            list_ = self._data.setdefault(key, [])
+            list_.extend(self._encode(value) for value in values)
+            return len(list_)
+
+    def rpushx(self, key: str, *values: Any) -> int:
+        with self._lock:
+            if key not in self._data:
+                return 0
+            return self.rpush(key, *values)
+
+    def lrange(self, key: str, start: int, end: int) -> List[str]:
+        list_ = self._data.get(key, [])
+        end = len(list_) if end == -1 else end + 1
+        return list_[start:end]
+
+    def zadd(self, key: str, mapping: Dict[str, float]) -> int:
+        with self._lock:
+            zset = self._data.setdefault(key, {})
+            added = sum(1 for member in mapping if member not in zset)
+            zset.update({member: float(score) for member, score in mapping.items()})
+            return added
+
+    def zrem(self, key: str, *members: str) -> int:
+        with self._lock:
+            zset = self._data.get(key, {})
+            removed = sum(1 for member in members if zset.pop(member, None) is not None)
+            if not zset:
+                self._data.pop(key, None)
+            return removed
+
+    def zcard(self, key: str) -> int:
+        return len(self._data.get(key, {}))
+
+    def zrange(self, key: str, start: int, end: int, desc: bool = False) -> List[str]:
+        with self._lock:
+            members = sorted(
+                self._data.get(key, {}).items(),
+                key=lambda item: (item[1], item[0]),
+                reverse=desc,
+            )
+        end = len(members) if end == -1 else end + 1
+        return [member for member, _ in members[start:end]]
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """
+    Queues commands and runs them on execute(), like a redis-py pipeline.
+    """
+
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        method = getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._commands = []
+
+    def execute(self) -> list:
+        commands, self._commands = self._commands, []
+        with self._redis._lock:
+            return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
+def _get_field(document: dict, field: str) -> Any:
+    value = document
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _matches(document: dict, query: dict) -> bool:
+    for field, condition in (query or {}).items():
+        if field == "$or":
+            if not any(_matches(document, branch) for branch in condition):
+                return False
+            continue
+        value = _get_field(document, field)
+        if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            for operator, operand in condition.items():
+                if value is None and operator in ("$gt", "$gte", "$lt", "$lte"):
+                    return False
+                match operator:
+                    case "$gt" if not value > operand:
+                        return False
+                    case "$gte" if not value >= operand:
+                        return False
+                    case "$lt" if not value < operand:
+                        return False
+                    case "$lte" if not value <= operand:
+                        return False
+                    case "$in" if value not in operand:
+                        return False
+                    case "$ne" if value == operand:
+                        return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(document: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return copy.deepcopy(document)
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if included:
+        result = {
+            field: copy.deepcopy(document[field])
+            for field in included
+            if field in document
+        }
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    return {
+        field: copy.deepcopy(value)
+        for field, value in document.items()
+        if projection.get(field, 1)
+    }
+
+
+def _sort_key(value: Any):
+    # MongoDB orders null before numbers and numbers before strings
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    return (2, str(value))
+
+
+class FakeCursor:
+    """
+    A lazily evaluated query, supporting sort, skip, limit and batch_size.
+    """
+
+    def __init__(self, collection: "FakeCollection", query: dict, projection: dict):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction: int = 1) -> "FakeCursor":
+        self._sort = key if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def skip(self, count: int) -> "FakeCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "FakeCursor":
+        return self
+
+    def __iter__(self):
+        documents = self._collection._find(self._query)
+        for field, direction in reversed(self._sort):
+            documents.sort(
+                key=lambda d: _sort_key(_get_field(d, field)), reverse=direction < 0
+            )
+        documents = documents[self._skip :]
+        if self._limit:
+            documents = documents[: self._limit]
+        return (_project(document, self._projection) for document in documents)
+
+
+class _Result:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeCollection:
+    """
+    A list-backed MongoDB collection with a hash index on 'country_name'.
+    """
+
+    INDEXED_FIELD = "country_name"
+
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: List[dict] = []
+        self._index: Dict[Any, List[dict]] = {}
+        self._lock = threading.RLock()
+
+    def _find(self, query: dict) -> List[dict]:
+        with self._lock:
+            value = (query or {}).get(self.INDEXED_FIELD)
+            if value is not None and not isinstance(value, dict):
+                candidates = list(self._index.get(value, []))
+            else:
+                candidates = list(self._documents)
+        return [document for document in candidates if _matches(document, query)]
+
+    def insert_one(self, document: dict) -> _Result:
+        with self._lock:
+            document.setdefault("_id", ObjectId())
+            stored = copy.deepcopy(document)
+            self._documents.append(stored)
+            self._index.setdefault(stored.get(self.INDEXED_FIELD), []).append(stored)
+            return _Result(inserted_id=stored["_id"], acknowledged=True)
+
+    def insert_many(self, documents: List[dict], ordered: bool = True) -> _Result:
+        ids = [self.insert_one(document).inserted_id for document in documents]
+        return _Result(inserted_ids=ids, acknowledged=True)
+
+    def find(self, query: dict = None, projection: dict = None) -> FakeCursor:
+        return FakeCursor(self, query or {}, projection)
+
+    def find_one(self, query: dict = None, projection: dict = None, sort=None):
+        cursor = self.find(query, projection)
+        if sort:
+            cursor.sort(sort)
+        return next(iter(cursor.limit(1)), None)
+
+    def update_one(self, query: dict, update: dict, upsert: bool = False) -> _Result:
+        with self._lock:
+            matches = self._find(query)
+            if not matches:
+                if not upsert:
+                    return _Result(matched_count=0, modified_count=0, upserted_id=None)
+                document = {k: v for k, v in query.items() if not isinstance(v, dict)}
+                document.update(update.get("$setOnInsert", {}))
+                document.update(update.get("$set", {}))
+                for field, value in update.get("$push", {}).items():
+                    document[field] = [value]
+                for field, value in update.get("$inc", {}).items():
+                    document[field] = value
+                result = self.insert_one(document)
+                return _Result(
+                    matched_count=0, modified_count=0, upserted_id=result.inserted_id
+                )
+
+            document = matches[0]
+            old_key = document.get(self.INDEXED_FIELD)
+            document.update(copy.deepcopy(update.get("$set", {})))
+            for field, value in update.get("$push", {}).items():
+                document.setdefault(field, []).append(copy.deepcopy(value))
+            for field, value in update.get("$inc", {}).items():
+                document[field] = document.get(field, 0) + value
+            if document.get(self.INDEXED_FIELD) != old_key:
+                self._index[old_key].remove(document)
+                self._index.setdefault(document.get(self.INDEXED_FIELD), []).append(
+                    document
+                )
+            return _Result(matched_count=1, modified_count=1, upserted_id=None)
+
+    def find_one_and_update(
+        self, query: dict, update: dict, projection: dict = None, return_document=False
+    ) -> Optional[dict]:
+        with self._lock:
+            matches = self._find(query)
+            if not matches:
+                return None
+            before = _project(matches[0], projection)
+            self.update_one({"_id": matches[0]["_id"]}, update)
+            # ReturnDocument.AFTER is True
+            return _project(matches[0], projection) if return_document else before
+
+    def bulk_write(self, requests: list, ordered: bool = True) -> _Result:
+        # pymongo's UpdateOne keeps its arguments in private attributes
+        upserted = 0
+        for request in requests:
+            result = self.update_one(
+                request._filter, request._doc, upsert=bool(request._upsert)
+            )
+            upserted += result.upserted_id is not None
+        return _Result(
+            matched_count=len(requests) - upserted,
+            upserted_count=upserted,
+            acknowledged=True,
+        )
+
+    def delete_many(self, query: dict) -> _Result:
+        with self._lock:
+            matches = self._find(query)
+            for document in matches:
+                self._documents.remove(document)
+                self._index[document.get(self.INDEXED_FIELD)].remove(document)
+            return _Result(deleted_count=len(matches))
+
+    def count_documents(self, query: dict) -> int:
+        return len(self._find(query))
+
+    def create_index(self, keys, **kwargs) -> str:
+        fields = keys if isinstance(keys, list) else [(keys, 1)]
+        return "_".join(f"{field}_{direction}" for field, direction in fields)
+
+
+class FakeDatabase:
+    """
+    A MongoDB database that creates collections on first access.
+    """
+
+    def __init__(self):
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    def create_collection(self, name: str, **kwargs) -> FakeCollection:
+        return self[name]
+
+
+class _FakeAdmin:
+    def command(self, name: str, *args, **kwargs) -> dict:
+        return {"ok": 1.0}
+
+
+class FakeMongoClient:
+    """
+    A MongoDB client holding FakeDatabases.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.admin = _FakeAdmin()
+        self._databases: Dict[str, FakeDatabase] = {}
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase()
+        return self._databases[name]
+
+    def close(self):
+        pass
+
+
+def country_documents(count: int) -> List[dict]:
+    """
+    Build REST Countries-like documents for benchmarks and load tests.
+
+    Args:
+        count (int): The number of documents.
+
+    Returns:
+        List[dict]: The documents.
+    """
+    regions = itertools.cycle(["Africa", "Americas", "Asia", "Europe", "Oceania"])
+    return [
+        {
+            "name": {"common": f"Country{i:06d}", "official": f"Republic of {i}"},
+            "region": next(regions),
+            "population": 1000 + i * 37,
+            "area": float(100 + (i * 13) % 9000),
+            "capital": [f"Capital{i}"],
+            "latlng": [((i * 7) % 180) - 90.0, ((i * 11) % 360) - 180.0],
+            "cca3": f"C{i:05d}",
+            "borders": [f"C{j:05d}" for j in (i - 1, i + 1, i + 10) if 0 <= j < count],
+        }
+        for i in range(count)
+    ]
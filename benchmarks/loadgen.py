@@ -0,0 +1,537 @@
+"""
+End-to-end load generator for the API.
+
+    python -m benchmarks.loadgen --mode closed --concurrency 32 --duration 30
+    python -m benchmarks.loadgen --mode open --rate 500 --duration 30
+    python -m benchmarks.loadgen --url http://localhost:8080 --mode open --rate 200
+
+Without --url the FastAPI app runs in-process behind an ASGI transport, with
+Mongo and Redis replaced by in-memory fakes (--stores memory) or by local
+containers (--stores local, e.g. 'docker-compose up mongo redis').
+
+In closed-loop mode a fixed number of workers send a request as soon as their
+previous one completes. In open-loop mode requests arrive at the target rate
+whether or not earlier ones have completed, and latency is measured from the
+scheduled arrival, so a slow server is not hidden by a slowed-down client.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fakes import FakeMongoClient, FakeRedis, country_documents
+from internal.db.model import DEFAULT_LIMIT, SORT_FIELDS, SORT_ORDERS
+
+
+OPERATIONS = ("countries", "country", "images", "upload")
+DEFAULT_MIX = "countries=60,country=25,images=10,upload=5"
+LIMITS = (10, 50, DEFAULT_LIMIT)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """
+    Parse a request mix such as 'countries=60,country=25,images=10,upload=5'.
+
+    Args:
+        value (str): Comma-separated operation=weight pairs.
+
+    Returns:
+        Dict[str, float]: The weight of every operation.
+
+    Raises:
+        ValueError: If an operation is unknown or a weight is not positive.
+    """
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Invalid operation in mix: {name}")
+        mix[name] = float(weight or 1)
+        if mix[name] < 0:
+            raise ValueError(f"Invalid weight in mix: {item}")
+    if not sum(mix.values()) > 0:
+        raise ValueError("The mix needs at least one positive weight")
+    return mix
+
+
+def percentile(samples: List[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of sorted samples.
+    """
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+class Workload:
+    """
+    Picks the next request of the mix.
+    """
+
+    def __init__(
+        self,
+        mix: Dict[str, float],
+        country_names: List[str],
+        upload_size: int = 50_000,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the Workload.
+
+        Args:
+            mix (Dict[str, float]): The weight of every operation.
+            country_names (List[str]): The countries to request.
+            upload_size (int): The size of the uploaded images in bytes.
+            seed (int): Seed of the random choices.
+        """
+        if not country_names:
+            raise ValueError("The workload needs at least one country")
+        self.operations = list(mix)
+        self.weights = list(mix.values())
+        self.country_names = country_names
+        self.random = random.Random(seed)
+        self.payload = self.random.randbytes(upload_size)
+
+    def next_request(self) -> Tuple[str, str, str, dict]:
+        """
+        Pick the next request.
+
+        Returns:
+            Tuple[str, str, str, dict]: The operation, the HTTP method, the path
+                and the keyword arguments of the httpx request.
+        """
+        operation = self.random.choices(self.operations, self.weights)[0]
+        country = self.random.choice(self.country_names)
+        match operation:
+            case "countries":
+                params = {
+                    "limit": self.random.choice(LIMITS),
+                    "sortBy": self.random.choice(SORT_FIELDS),
+                    "orderBy": self.random.choice(SORT_ORDERS),
+                }
+                return operation, "GET", "/countries", {"params": params}
+            case "country":
+                return operation, "GET", f"/countries/{country}", {}
+            case "images":
+                return operation, "GET", f"/countries/{country}/images", {}
+            case "upload":
+                return (
+                    operation,
+                    "POST",
+                    f"/countries/{country}/images",
+                    {
+                        "files": {"file": ("load.jpg", self.payload, "image/jpeg")},
+                        "data": {"title": "Load test", "description": "Load test"},
+                    },
+                )
+
+
+class Recorder:
+    """
+    Collects the latency and outcome of every request.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, int] = defaultdict(int)
+        self.dropped = 0
+
+    def record(self, operation: str, seconds: float, status: str):
+        """
+        Record a completed request.
+
+        Args:
+            operation (str): The operation of the request.
+            seconds (float): The latency of the request.
+            status (str): The HTTP status code, or the name of the client error.
+        """
+        self.latencies[operation].append(seconds)
+        self.statuses[status] += 1
+        if not status.isdigit() or int(status) >= 400:
+            self.errors[operation] += 1
+
+    @staticmethod
+    def _summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+        latencies = sorted(latencies)
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+            "mean_seconds": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50_seconds": percentile(latencies, 50),
+            "p90_seconds": percentile(latencies, 90),
+            "p99_seconds": percentile(latencies, 99),
+            "max_seconds": latencies[-1] if latencies else 0.0,
+        }
+
+    def summary(self, elapsed: float) -> dict:
+        """
+        Summarize the recorded requests.
+
+        Args:
+            elapsed (float): The duration of the run in seconds.
+
+        Returns:
+            dict: Throughput and latency percentiles, in total and by operation.
+        """
+        return {
+            "elapsed_seconds": elapsed,
+            "dropped": self.dropped,
+            "statuses": dict(sorted(self.statuses.items())),
+            "total": self._summarize(
+                [s for samples in self.latencies.values() for s in samples],
+                sum(self.errors.values()),
+                elapsed,
+            ),
+            "operations": {
+                operation: self._summarize(samples, self.errors[operation], elapsed)
+                for operation, samples in sorted(self.latencies.items())
+            },
+        }
+
+
+async def _send(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    recorder: Recorder,
+    start: Optional[float] = None,
+):
+    operation, method, path, kwargs = workload.next_request()
+    start = time.perf_counter() if start is None else start
+    try:
+        response = await client.request(method, path, **kwargs)
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    recorder.record(operation, time.perf_counter() - start, status)
+
+
+async def closed_loop(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    recorder: Recorder,
+    concurrency: int,
+    duration: float,
+    requests: Optional[int] = None,
+):
+    """
+    Run workers that each send a request as soon as the previous one completed.
+
+    Args:
+        client (httpx.AsyncClient): The HTTP client.
+        workload (Workload): The request mix.
+        recorder (Recorder): Collects the results.
+        concurrency (int): The number of workers.
+        duration (float): Stop after this many seconds.
+        requests (int): Stop after this many requests in total.
+    """
+    deadline = time.perf_counter() + duration
+    remaining = requests if requests is not None else math.inf
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0 and time.perf_counter() < deadline:
+            remaining -= 1
+            await _send(client, workload, recorder)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    recorder: Recorder,
+    rate: float,
+    duration: float,
+    max_in_flight: int = 1000,
+    arrivals: str = "poisson",
+):
+    """
+    Send requests at a target rate, independently of their completion.
+    Requests that would exceed max_in_flight are dropped and counted.
+
+    Args:
+        client (httpx.AsyncClient): The HTTP client.
+        workload (Workload): The request mix.
+        recorder (Recorder): Collects the results.
+        rate (float): The target rate in requests per second.
+        duration (float): The duration of the run in seconds.
+        max_in_flight (int): The maximum number of outstanding requests.
+        arrivals (str): 'poisson' for exponential gaps, 'uniform' for fixed gaps.
+    """
+    tasks = set()
+    start = time.perf_counter()
+    scheduled = start
+    while True:
+        gap = workload.random.expovariate(rate) if arrivals == "poisson" else 1 / rate
+        scheduled += gap
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= max_in_flight:
+            recorder.dropped += 1
+            continue
+        task = asyncio.create_task(_send(client, workload, recorder, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+def build_app(stores: str, countries: int, assets_dir: str):
+    """
+    Build the API backed by in-memory fakes or local containers.
+
+    Args:
+        stores (str): 'memory' or 'local'.
+        countries (int): The number of countries loaded into the fakes.
+        assets_dir (str): The directory of the uploaded images.
+
+    Returns:
+        FastAPI: The application.
+    """
+    # Imported here so that load testing a remote server needs no backend setup
+    from backend.main import APIBackend
+    from data_pipeline.handler import Handler
+    from data_pipeline.main import DataPipelineOrchestrator
+    from internal.cache.cache import CacheManager
+    from internal.db.manager import NoSQLDatabaseManager
+    from internal.storage.local import LocalStorage
+
+    if stores == "memory":
+        mongo_client, redis_client = FakeMongoClient(), FakeRedis()
+        db_url = "memory://"
+        with contextlib.redirect_stdout(io.StringIO()):
+            db_manager = NoSQLDatabaseManager(db_url, mongo_client)
+            db_manager.bootstrap()
+            cache_manager = CacheManager(redis_client)
+            Handler(db_manager, cache_manager).process_countries(
+                country_documents(countries)
+            )
+            orchestrator = DataPipelineOrchestrator(
+                db_manager, cache_manager, storage=LocalStorage(assets_dir)
+            )
+            orchestrator.build_border_graph()
+            orchestrator.record_history()
+            orchestrator.publish_dataset()
+        redis_client.flushall()
+        # The lists are served from the views the pipeline publishes
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator.publish_views()
+    elif stores == "local":
+        import redis
+
+        mongo_client = None
+        db_url = os.getenv("MONGO_DB_URL", "mongodb://localhost:27017")
+        redis_client = redis.StrictRedis.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379"), decode_responses=True
+        )
+    else:
+        raise ValueError(f"Invalid stores: {stores}")
+
+    backend = APIBackend(db_url, redis_client, mongo_client, assets_dir)
+    return backend.app
+
+
+@contextlib.asynccontextmanager
+async def open_client(url: str = None, app=None):
+    """
+    Open an HTTP client for a remote server, or for an in-process app with
+    its lifespan running.
+
+    Args:
+        url (str): The base URL of a running server.
+        app (FastAPI): The in-process application, used if url is not set.
+    """
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+            yield client
+        return
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadgen", timeout=30
+        ) as client:
+            yield client
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60.0):
+    """
+    Wait until the API reports that it is ready to serve.
+
+    Args:
+        client (httpx.AsyncClient): The HTTP client.
+        timeout (float): Seconds to wait.
+
+    Raises:
+        Exception: If the API is not ready in time.
+    """
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.1)
+    raise Exception(f"The API was not ready after {timeout} seconds")
+
+
+async def discover_countries(client: httpx.AsyncClient) -> List[str]:
+    """
+    List the country names served by the API.
+
+    Args:
+        client (httpx.AsyncClient): The HTTP client.
+
+    Returns:
+        List[str]: The country names.
+    """
+    response = await client.get("/countries", params={"limit": DEFAULT_LIMIT})
+    response.raise_for_status()
+    return [country["country_name"] for country in response.json()["countries"]]
+
+
+async def run(args: argparse.Namespace, app=None) -> dict:
+    """
+    Run a load test.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        app (FastAPI): The in-process application, if args.url is not set.
+
+    Returns:
+        dict: The summary of the run.
+    """
+    async with open_client(args.url, app) as client:
+        await wait_ready(client)
+        names = await discover_countries(client)
+        workload = Workload(parse_mix(args.mix), names, args.upload_size, args.seed)
+        recorder = Recorder()
+        start = time.perf_counter()
+        if args.mode == "closed":
+            await closed_loop(
+                client,
+                workload,
+                recorder,
+                args.concurrency,
+                args.duration,
+                args.requests,
+            )
+        else:
+            await open_loop(
+                client,
+                workload,
+                recorder,
+                args.rate,
+                args.duration,
+                args.max_in_flight,
+                args.arrivals,
+            )
+        summary = recorder.summary(time.perf_counter() - start)
+    summary["config"] = {
+        key: value for key, value in vars(args).items() if key != "output"
+    }
+    return summary
+
+
+def print_summary(summary: dict):
+    """
+    Print the summary as a table.
+
+    Args:
+        summary (dict): The summary of the run.
+    """
+    header = f"{'operation':<12}{'requests':>10}{'errors':>8}{'rps':>10}"
+    header += "".join(
+        f"{name:>10}" for name in ("p50 ms", "p90 ms", "p99 ms", "max ms")
+    )
+    print(header)
+    rows = list(summary["operations"].items()) + [("total", summary["total"])]
+    for operation, stats in rows:
+        print(
+            f"{operation:<12}{stats['requests']:>10}{stats['errors']:>8}"
+            f"{stats['throughput_rps']:>10.1f}"
+            + "".join(
+                f"{stats[key] * 1000:>10.2f}"
+                for key in ("p50_seconds", "p90_seconds", "p99_seconds", "max_seconds")
+            )
+        )
+    print(f"statuses: {summary['statuses']}  dropped: {summary['dropped']}")
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load test the Countries API.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--url", help="Base URL of a running server")
+    parser.add_argument("--stores", choices=["memory", "local"], default="memory")
+    parser.add_argument("--countries", type=int, default=250)
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, help="Closed loop request budget")
+    parser.add_argument("--rate", type=float, default=100.0)
+    parser.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--upload-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="Write the summary to this JSON file")
+    args = parser.parse_args(argv)
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+
+    app, assets_dir = None, None
+    if not args.url:
+        # Only the in-process app's warnings and errors, and no request log,
+        # which would dominate the output
+        logging.basicConfig(
+            level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s"
+        )
+        logging.getLogger("backend.requests").disabled = True
+        assets_dir = tempfile.mkdtemp(prefix="countries-load-")
+        app = build_app(args.stores, args.countries, assets_dir)
+
+    try:
+        summary = asyncio.run(run(args, app))
+    finally:
+        if assets_dir:
+            shutil.rmtree(assets_dir, ignore_errors=True)
+
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
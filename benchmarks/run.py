@@ -0,0 +1,153 @@
+"""
+Runs the microbenchmarks and compares them against a baseline.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --baseline bench.json --tolerance 0.25
+
+The results are stored as JSON. With --baseline, a benchmark whose median
+time per operation grew by more than the tolerance is reported as a
+regression and the command exits with status 1.
+"""
+
+import argparse
+import fnmatch
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.suite import BENCHMARKS
+
+
+def measure(operation: Callable[[], object], min_time: float, repeat: int) -> dict:
+    """
+    Time an operation.
+    The number of calls per round is calibrated so that a round lasts at least
+    min_time; the time per call of every round is recorded.
+
+    Args:
+        operation (Callable[[], object]): The operation to time.
+        min_time (float): Minimum duration of a round in seconds.
+        repeat (int): The number of rounds.
+
+    Returns:
+        dict: The calls per round and the min, median and max seconds per call.
+    """
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or calls >= 1_000_000:
+            break
+        calls *= 10 if elapsed < min_time / 10 else 2
+
+    rounds = [elapsed / calls]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            operation()
+        rounds.append((time.perf_counter() - start) / calls)
+
+    return {
+        "calls": calls,
+        "min_s": min(rounds),
+        "median_s": statistics.median(rounds),
+        "max_s": max(rounds),
+    }
+
+
+def run(patterns: List[str], min_time: float, repeat: int) -> Dict[str, dict]:
+    """
+    Run the benchmarks whose names match one of the patterns.
+
+    Args:
+        patterns (List[str]): Shell-style patterns of benchmark names.
+        min_time (float): Minimum duration of a round in seconds.
+        repeat (int): The number of rounds.
+
+    Returns:
+        Dict[str, dict]: The measurements by benchmark name.
+    """
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            continue
+        results[name] = measure(setup(), min_time, repeat)
+        print(
+            f"{name:<50} {results[name]['median_s'] * 1e6:>14.1f} us/op "
+            f"({results[name]['calls']} calls x {repeat})"
+        )
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Compare results against a baseline.
+
+    Args:
+        results (dict): The current measurements by benchmark name.
+        baseline (dict): The baseline measurements by benchmark name.
+        tolerance (float): Allowed relative slowdown, e.g. 0.25 for 25%.
+
+    Returns:
+        List[str]: A description of every regression.
+    """
+    regressions = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        ratio = current["median_s"] / baseline[name]["median_s"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{name}: {ratio:.2f}x slower "
+                f"({baseline[name]['median_s'] * 1e6:.1f} -> "
+                f"{current['median_s'] * 1e6:.1f} us/op)"
+            )
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("patterns", nargs="*", default=["*"])
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(args.patterns, args.min_time, args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "timestamp": time.time(),
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Microbenchmarks of the RequestHandler, the CacheManager and the pipeline Handler.
+Each benchmark is a setup function that returns the operation to time, so
+building fixtures never counts towards the measurement.
+"""
+
+import atexit
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict
+
+from backend.handler import RequestHandler
+from benchmarks.fakes import FakeMongoClient, FakeRedis, country_documents
+from data_pipeline.handler import Handler, transform_country
+from internal.cache.cache import CacheManager
+from internal.db.manager import NoSQLDatabaseManager
+from internal.geo.index import GeoIndex
+
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    """
+    Register a benchmark setup function under a name.
+
+    Args:
+        name (str): The name of the benchmark.
+    """
+
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def build_managers(countries: int = 250):
+    """
+    Build database and cache managers backed by in-process fakes and load
+    the countries through the pipeline Handler.
+
+    Args:
+        countries (int): The number of countries to load.
+
+    Returns:
+        tuple: The database manager and the cache manager.
+    """
+    db_manager = NoSQLDatabaseManager("fake://", FakeMongoClient())
+    with contextlib.redirect_stdout(io.StringIO()):
+        db_manager.bootstrap()
+    cache_manager = CacheManager(FakeRedis())
+    if countries:
+        Handler(db_manager, cache_manager).process_countries(
+            country_documents(countries)
+        )
+        cache_manager.client.flushall()
+    return db_manager, cache_manager
+
+
+def build_request_handler(images: int = 0, image_size: int = 50_000):
+    """
+    Build a RequestHandler over fakes, with images stored in a temporary directory.
+
+    Args:
+        images (int): The number of images of 'Country000000'.
+        image_size (int): The size of every image in bytes.
+
+    Returns:
+        RequestHandler: The request handler.
+    """
+    db_manager, cache_manager = build_managers()
+    assets_dir = tempfile.mkdtemp(prefix="countries-bench-")
+    atexit.register(shutil.rmtree, assets_dir, True)
+    handler = RequestHandler(db_manager, cache_manager, assets_dir)
+    payload = os.urandom(image_size)
+    for i in range(images):
+        handler.upload_image("Country000000", payload, f"Title {i}", "Description")
+    cache_manager.client.flushall()
+    return handler
+
+
+@benchmark("request_handler.get_countries.cached")
+def get_countries_cached():
+    handler = build_request_handler()
+    handler.get_countries(250, "population", -1)
+    return lambda: handler.get_countries(250, "population", -1)
+
+
+@benchmark("request_handler.get_countries.uncached")
+def get_countries_uncached():
+    handler = build_request_handler()
+
+    def run():
+        handler.cache_manager.client.flushall()
+        return handler.get_countries(250, "population", -1)
+
+    return run
+
+
+@benchmark("request_handler.get_country.cached")
+def get_country_cached():
+    handler = build_request_handler()
+    handler.get_country("Country000042")
+    return lambda: handler.get_country("Country000042")
+
+
+@benchmark("request_handler.get_country.uncached")
+def get_country_uncached():
+    handler = build_request_handler()
+
+    def run():
+        handler.cache_manager.client.flushall()
+        return handler.get_country("Country000042")
+
+    return run
+
+
+@benchmark("request_handler.get_images.cached")
+def get_images_cached():
+    handler = build_request_handler(images=20)
+    handler.get_images("Country000000")
+    return lambda: handler.get_images("Country000000")
+
+
+@benchmark("request_handler.get_images.uncached")
+def get_images_uncached():
+    handler = build_request_handler(images=20)
+
+    def run():
+        handler.cache_manager.client.flushall()
+        return handler.get_images("Country000000")
+
+    return run
+
+
+def _geo_index(cache_size: int) -> GeoIndex:
+    countries = [transform_country(country) for country in country_documents(250)]
+    return GeoIndex(countries, cache_size=cache_size)
+
+
+@benchmark("geo_index.nearest.cached")
+def geo_nearest_cached():
+    index = _geo_index(4096)
+    index.nearest(48.85, 2.35, 5)
+    return lambda: index.nearest(48.85, 2.35, 5)
+
+
+@benchmark("geo_index.nearest.uncached")
+def geo_nearest_uncached():
+    index = _geo_index(0)
+    return lambda: index.nearest(48.85, 2.35, 5)
+
+
+@benchmark("geo_index.within.uncached")
+def geo_within_uncached():
+    index = _geo_index(0)
+    return lambda: index.within(35.0, -10.0, 60.0, 30.0)
+
+
+def _upload(size: int):
+    def setup():
+        handler = build_request_handler()
+        payload = os.urandom(size)
+        return lambda: handler.upload_image(
+            "Country000001", payload, "Title", "Description"
+        )
+
+    return setup
+
+
+for _label, _size in (("10kb", 10_000), ("100kb", 100_000), ("1mb", 1_000_000)):
+    benchmark(f"request_handler.upload_image.{_label}")(_upload(_size))
+
+
+@benchmark("cache_manager.set_get")
+def cache_set_get():
+    cache_manager = CacheManager(FakeRedis())
+
+    def run():
+        cache_manager.set_data("key", "value")
+        return cache_manager.get_data("key")
+
+    return run
+
+
+@benchmark("cache_manager.set_get_dict")
+def cache_set_get_dict():
+    cache_manager = CacheManager(FakeRedis())
+    country = transform_country(country_documents(1)[0])
+
+    def run():
+        cache_manager.set_dict_data("key", country)
+        return cache_manager.get_dict_data("key")
+
+    return run
+
+
+def _process(count: int):
+    def setup():
+        documents = country_documents(count)
+
+        def run():
+            db_manager, cache_manager = build_managers(countries=0)
+            # The handler mutates the documents, so every run gets fresh copies
+            Handler(db_manager, cache_manager).process_countries(
+                [dict(document) for document in documents]
+            )
+
+        return run
+
+    return setup
+
+
+for _count in (250, 10_000, 100_000):
+    benchmark(f"pipeline_handler.process_countries.{_count}")(_process(_count))
@@ -0,0 +1,56 @@
+from benchmarks.fakes import FakeMongoClient, FakeRedis
+from benchmarks.run import compare, measure
+from internal.cache.cache import CacheManager
+from internal.db.manager import NoSQLDatabaseManager
+
+
+def test_measure_reports_time_per_call():
+    # Act
+    result = measure(lambda: None, min_time=0.001, repeat=3)
+
+    # Assert
+    assert result["calls"] >= 1
+    assert result["min_s"] <= result["median_s"] <= result["max_s"]
+
+
+def test_compare_reports_regressions():
+    # Arrange
+    baseline = {"fast": {"median_s": 1.0}, "slow": {"median_s": 1.0}}
+    results = {
+        "fast": {"median_s": 1.1},
+        "slow": {"median_s": 2.0},
+        "new": {"median_s": 5.0},
+    }
+
+    # Act
+    regressions = compare(results, baseline, tolerance=0.25)
+
+    # Assert
+    assert len(regressions) == 1
+    assert regressions[0].startswith("slow: 2.00x slower")
+
+
+def test_fake_mongo_sorts_and_limits():
+    # Arrange
+    db_manager = NoSQLDatabaseManager("fake://", FakeMongoClient())
+    db_manager.bootstrap()
+    for name, population in (("A", 3), ("B", 1), ("C", 2)):
+        db_manager.add_country(name, {"population": population})
+
+    # Act
+    result = db_manager.get_countries(2, "population", -1)
+
+    # Assert
+    assert [country["country_name"] for country in result] == ["A", "C"]
+    assert db_manager.get_country("B")["population"] == 1
+
+
+def test_fake_redis_round_trips_dict_data():
+    # Arrange
+    cache_manager = CacheManager(FakeRedis())
+
+    # Act
+    cache_manager.set_dict_data("country:A", {"population": 3, "region": "X"})
+
+    # Assert
+    assert cache_manager.get_dict_data("country:A") == {"population": 3, "region": "X"}
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from benchmarks import loadgen
+
+
+def test_parse_mix():
+    # Act
+    mix = loadgen.parse_mix("countries=3,upload=1")
+
+    # Assert
+    assert mix == {"countries": 3.0, "upload": 1.0}
+
+
+@pytest.mark.parametrize("value", ["unknown=1", "countries=-1", "countries=0"])
+def test_parse_mix_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        loadgen.parse_mix(value)
+
+
+def test_workload_builds_requests_of_every_operation():
+    # Arrange
+    workload = loadgen.Workload(
+        loadgen.parse_mix(loadgen.DEFAULT_MIX), ["A"], upload_size=10, seed=1
+    )
+
+    # Act
+    requests = [workload.next_request() for _ in range(200)]
+
+    # Assert
+    assert {operation for operation, *_ in requests} == set(loadgen.OPERATIONS)
+    upload = next(request for request in requests if request[0] == "upload")
+    assert upload[1:3] == ("POST", "/countries/A/images")
+
+
+def test_recorder_summary():
+    # Arrange
+    recorder = loadgen.Recorder()
+    for i in range(1, 101):
+        recorder.record("country", i / 1000, "200")
+    recorder.record("country", 0.5, "500")
+
+    # Act
+    summary = recorder.summary(elapsed=2.0)
+
+    # Assert
+    assert summary["total"]["requests"] == 101
+    assert summary["total"]["errors"] == 1
+    assert summary["operations"]["country"]["p50_seconds"] == 0.051
+    assert summary["statuses"] == {"200": 100, "500": 1}
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ["--mode", "closed", "--requests", "30", "--concurrency", "4"],
+        ["--mode", "open", "--rate", "100", "--duration", "0.3"],
+    ],
+)
+def test_run_against_in_memory_app(tmp_path, options):
+    # Arrange
+    args = loadgen.parse_args(["--seed", "1", "--countries", "20"] + options)
+    app = loadgen.build_app("memory", args.countries, str(tmp_path))
+
+    # Act
+    summary = asyncio.run(loadgen.run(args, app))
+
+    # Assert
+    assert summary["total"]["requests"] > 0
+    assert summary["total"]["errors"] == 0
+    if args.mode == "closed":
+        assert summary["total"]["requests"] == 30
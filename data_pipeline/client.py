@@ -2,7 +2,7 @@
 RestCountriesAPIClient class that is responsible for fetching data from the external API.
 """
 
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
 import requests
 
@@ -14,21 +14,73 @@ class RestCountriesAPIClient:
 
     API = "https://restcountries.com/v3.1/all"
 
+    # Size of the chunks a streamed response is read in
+    CHUNK_SIZE = 64 * 1024
+
     @staticmethod
-    def fetch_countries() -> List[dict]:
+    def _get(headers: dict = None, stream: bool = False) -> requests.Response:
         """
-        Fetch the data from the API.
+        Request the data from the API.
+
+        Args:
+            headers (dict): Additional request headers.
+            stream (bool): Read the body lazily instead of downloading it whole.
 
         Returns:
-            List[dict]: A list of countries data.
+            requests.Response: The successful response, or 304 Not Modified
+                for a conditional request.
 
         Raises:
             Exception: If the API request fails.
         """
-        response = requests.get(RestCountriesAPIClient.API, timeout=10)
+        response = requests.get(
+            RestCountriesAPIClient.API, timeout=10, headers=headers, stream=stream
+        )
 
         match response.status_code:
-            case 200:
-                return response.json()
+            case 200 | 304:
+                return response
             case _:
                 raise Exception(f"Couldn't fetch data from the API: {response.text}")
+
+    @staticmethod
+    def fetch_countries() -> List[dict]:
+        """
+        Fetch the data from the API.
+
+        Returns:
+            List[dict]: A list of countries data.
+
+        Raises:
+            Exception: If the API request fails.
+        """
+        return RestCountriesAPIClient._get().json()
+
+    @staticmethod
+    def stream_countries(
+        etag: str = None,
+    ) -> Tuple[Optional[Iterator[bytes]], Optional[str]]:
+        """
+        Stream the raw data from the API unless it still has the given ETag.
+
+        Args:
+            etag (str): The ETag of the data fetched last, if any.
+
+        Returns:
+            Tuple[Optional[Iterator[bytes]], Optional[str]]: The chunks of the
+                JSON encoded list of countries, or None if it has not changed,
+                and its ETag.
+
+        Raises:
+            Exception: If the API request fails.
+        """
+        response = RestCountriesAPIClient._get(
+            {"If-None-Match": etag} if etag else {}, stream=True
+        )
+        if response.status_code == 304:
+            response.close()
+            return None, etag
+        return (
+            response.iter_content(RestCountriesAPIClient.CHUNK_SIZE),
+            response.headers.get("ETag"),
+        )
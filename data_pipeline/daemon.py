@@ -0,0 +1,220 @@
+"""
+Runs the data pipeline on a schedule.
+Every replica of the daemon wakes up every interval, give or take a random
+jitter so the replicas don't all wake up at once, and tries to take a lease
+lock in Redis. The replica that holds the lease refreshes the data while the
+others stand by. The lease expires on its own if its holder dies, and is
+renewed in the background while a refresh runs; if it is lost anyway, the
+refresh is told to stop before it publishes anything else. A refresh is
+skipped when the source's fingerprint is the one of the last successful
+refresh.
+"""
+
+import random
+import threading
+import uuid
+from typing import Callable
+
+from redis import RedisError, StrictRedis
+
+from data_pipeline.source import CountrySource
+from internal.cache.cache import CACHE_TTL
+
+# Outcomes of a scheduled run
+REFRESHED = "refreshed"
+UNCHANGED = "unchanged"
+STANDBY = "standby"
+FAILED = "failed"
+LOST = "lost"
+
+# Extends the lease only if this owner still holds it
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Deletes the lease only if this owner still holds it
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaseLock:
+    """
+    A lock in Redis that expires unless its owner renews it.
+    """
+
+    def __init__(
+        self, client: StrictRedis, key: str, ttl: float = 60.0, owner: str = None
+    ):
+        """
+        Initialize the LeaseLock.
+
+        Args:
+            client (StrictRedis): The Redis client.
+            key (str): The key of the lock.
+            ttl (float): Seconds the lease lasts unless it is renewed.
+            owner (str): Identifies this holder; random by default.
+        """
+        self.client = client
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.owner = owner or uuid.uuid4().hex
+        self._renew = client.register_script(RENEW_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    def acquire(self) -> bool:
+        """
+        Take the lease if nobody holds it.
+
+        Returns:
+            bool: True if the lease was taken.
+        """
+        return bool(self.client.set(self.key, self.owner, nx=True, px=self.ttl_ms))
+
+    def renew(self) -> bool:
+        """
+        Extend the lease by its TTL.
+
+        Returns:
+            bool: False if the lease was lost, e.g. because it expired.
+        """
+        return bool(int(self._renew(keys=[self.key], args=[self.owner, self.ttl_ms])))
+
+    def release(self) -> bool:
+        """
+        Give the lease up, unless somebody else holds it by now.
+
+        Returns:
+            bool: True if the lease was released.
+        """
+        return bool(int(self._release(keys=[self.key], args=[self.owner])))
+
+
+class PipelineDaemon:
+    """
+    Refreshes the data on a schedule, on one replica at a time.
+    """
+
+    FINGERPRINT_KEY = "pipeline:fingerprint"
+    # Half the lifetime of the cache entries the refresh publishes, so an
+    # unchanged source still republishes them before they expire
+    FINGERPRINT_TTL = CACHE_TTL // 2
+
+    def __init__(
+        self,
+        refresh: Callable[[threading.Event], dict],
+        source: CountrySource,
+        client: StrictRedis,
+        interval: float = 3600.0,
+        jitter: float = 300.0,
+        lock_ttl: float = 60.0,
+    ):
+        """
+        Initialize the PipelineDaemon.
+
+        Args:
+            refresh (Callable[[threading.Event], dict]): Runs the pipeline
+                once; the event is set when the lease is lost, and the run
+                must then stop before its next publishing stage.
+            source (CountrySource): The source the pipeline reads, whose
+                fingerprint tells if the data changed.
+            client (StrictRedis): The Redis client of the lease and the fingerprint.
+            interval (float): Seconds between two runs.
+            jitter (float): Up to this many seconds are added to or taken from
+                every interval.
+            lock_ttl (float): Seconds the lease lasts if its holder stops renewing it.
+        """
+        self.refresh = refresh
+        self.source = source
+        self.client = client
+        self.interval = interval
+        self.jitter = jitter
+        self.lock = LeaseLock(client, "pipeline:lock", lock_ttl)
+        self._stopping = threading.Event()
+
+    def next_delay(self) -> float:
+        """
+        Seconds until the next run.
+
+        Returns:
+            float: The interval, give or take the jitter.
+        """
+        return max(self.interval + random.uniform(-self.jitter, self.jitter), 0.0)
+
+    def _keep_lease(self, done: threading.Event, lost: threading.Event):
+        # Renew at a third of the TTL, so one missed renewal doesn't lose it
+        while not done.wait(self.lock.ttl_ms / 3000):
+            try:
+                if not self.lock.renew():
+                    print("Lost the pipeline lease, stopping the refresh")
+                    lost.set()
+                    return
+            except RedisError as e:
+                print(f"Couldn't renew the pipeline lease: {e}")
+
+    def run_once(self) -> str:
+        """
+        Refresh the data if this replica gets the lease and the source changed.
+
+        Returns:
+            str: 'refreshed', 'unchanged', 'standby', 'failed', or 'lost' if
+                the lease was lost during the refresh.
+        """
+        try:
+            if not self.lock.acquire():
+                return STANDBY
+        except RedisError as e:
+            print(f"Couldn't take the pipeline lease: {e}")
+            return FAILED
+
+        done, lost = threading.Event(), threading.Event()
+        keeper = threading.Thread(
+            target=self._keep_lease, args=(done, lost), daemon=True
+        )
+        keeper.start()
+        try:
+            fingerprint = self.source.fingerprint()
+            if fingerprint and fingerprint == self.client.get(self.FINGERPRINT_KEY):
+                return UNCHANGED
+            self.refresh(lost)
+            if lost.is_set():
+                return LOST
+            if fingerprint:
+                self.client.set(
+                    self.FINGERPRINT_KEY, fingerprint, ex=self.FINGERPRINT_TTL
+                )
+            return REFRESHED
+        except Exception as e:
+            if lost.is_set():
+                print(f"Pipeline run stopped after losing the lease: {e}")
+                return LOST
+            print(f"Pipeline run failed: {e}")
+            return FAILED
+        finally:
+            done.set()
+            keeper.join()
+            try:
+                self.lock.release()
+            except RedisError as e:
+                print(f"Couldn't release the pipeline lease, it will expire: {e}")
+
+    def serve(self):
+        """
+        Run until stop() is called. A run in progress is finished first.
+        """
+        while not self._stopping.is_set():
+            print(f"Scheduled pipeline run: {self.run_once()}")
+            self._stopping.wait(self.next_delay())
+        print("Pipeline daemon stopped")
+
+    def stop(self, *args):
+        """
+        Stop after the current run; usable as a signal handler.
+        """
+        self._stopping.set()
@@ -5,11 +5,105 @@ adding or updating country information in the database,
 and managing cache operations.
 """
 
-from typing import List
+from typing import Iterable, List, Tuple
 
 from internal.db.manager import NoSQLDatabaseManager
 from internal.cache.cache import CacheManager
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+
+INSERTED = "inserted"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+
+
+def _population_density(population: float, area: float) -> float:
+    """
+    Calculate the population density, which is undefined for a zero area.
+
+    Args:
+        population (float): The population of the country.
+        area (float): The area of the country.
+
+    Returns:
+        float: The population density, or None if the area is zero.
+    """
+    return population / area if area else None
+
+
+def transform_country(country: dict) -> dict:
+    """
+    Add the derived fields to a country document.
+
+    Args:
+        country (dict): The country document from the source.
+
+    Returns:
+        dict: The country document with 'country_name' and 'population_density'.
+
+    Raises:
+        KeyError: If a required field is missing.
+    """
+    country["country_name"] = country["name"]["common"]
+    country["population_density"] = _population_density(
+        country["population"], country["area"]
+    )
+    return country
+
+
+def transform_chunk(
+    countries: List[dict], vectorized: bool = False
+) -> Tuple[List[dict], int]:
+    """
+    Transform a chunk of country documents.
+    Documents that are missing a required field are skipped and counted.
+    In vectorized mode the densities of the chunk are derived in one numpy
+    operation; without numpy it falls back to the scalar path.
+
+    Args:
+        countries (List[dict]): The country documents from the source.
+        vectorized (bool): Derive the numeric fields with numpy.
+
+    Returns:
+        Tuple[List[dict], int]: The transformed documents and the number of
+            documents that failed.
+    """
+    valid = []
+    population = []
+    area = []
+    for country in countries:
+        try:
+            name = country["name"]["common"]
+            values = country["population"], country["area"]
+        except (KeyError, TypeError) as error:
+            print(f"Skipping country: {error}")
+            continue
+        country["country_name"] = name
+        valid.append(country)
+        population.append(values[0])
+        area.append(values[1])
+
+    failed = len(countries) - len(valid)
+
+    if vectorized and np is not None and valid:
+        population = np.asarray(population, dtype=np.float64)
+        area = np.asarray(area, dtype=np.float64)
+        density = np.divide(
+            population, area, out=np.full(len(valid), np.nan), where=area != 0
+        )
+        densities = [None if value != value else value for value in density.tolist()]
+    else:
+        densities = [_population_density(p, a) for p, a in zip(population, area)]
+
+    for country, value in zip(valid, densities):
+        country["population_density"] = value
+
+    return valid, failed
+
 
 class Handler:
     """
@@ -20,54 +114,61 @@ class Handler:
         self.db_manager = db_manager
         self.cache_manager = cache_manager
 
-    def process_countries(self, countries: List[dict]):
+    def load_country(self, country: dict) -> str:
+        """
+        Add or update a transformed country in the database and cache.
+
+        Args:
+            country (dict): The transformed country document.
+
+        Returns:
+            str: 'inserted', 'updated' or 'unchanged'.
+        """
+        name = country["country_name"]
+        population = country["population"]
+        area = country["area"]
+
+        # Check if the country is already in the cache
+        match = self.cache_manager.get_dict_data(name)
+        match = match if match else None
+
+        if not match:
+            # Check if the country is already in the database
+            match = self.db_manager.get_country(name)
+
+        # Add / Update the country
+        match match:
+            case None:
+                # Add to database
+                self.db_manager.add_country(name, country)
+
+                # Add to cache
+                self.cache_manager.set_dict_data(name, country)
+                return INSERTED
+
+            case _ if population != match["population"] or area != match["area"]:
+                # Update database
+                self.db_manager.update_country(name, country)
+
+                # Update cache
+                self.cache_manager.set_dict_data(name, country)
+                return UPDATED
+
+        return UNCHANGED
+
+    def process_countries(self, countries: Iterable[dict]):
         """
         Process a list of countries, adding or updating them in the database and cache.
 
         Args:
-            countries (List[dict]): List of country data dictionaries.
+            countries (Iterable[dict]): Country data dictionaries.
 
         Returns:
             None
         """
         for country in countries:
             try:
-                # name to be used as the key in the cache and database
-                name = country["name"]["common"]
-
-                # Extracting population and area
-                population = country["population"]
-                area = country["area"]
-
-                # Additional fields to be added to the country
-                country["country_name"] = name
-                country["population_density"] = population / area
-
-                # Check if the country is already in the cache
-                match = self.cache_manager.get_dict_data(name)
-                match = match if match else None
-
-                if not match:
-                    # Check if the country is already in the database
-                    match = self.db_manager.get_country(name)
-
-                # Add / Update the country
-                match match:
-                    case None:
-                        # Add to database
-                        self.db_manager.add_country(name, country)
-
-                        # Add to cache
-                        self.cache_manager.set_dict_data(name, country)
-
-                    case _ if (
-                        population != match["population"] or area != match["area"]
-                    ):
-                        # Update database
-                        self.db_manager.update_country(name, country)
-
-                        # Update cache
-                        self.cache_manager.set_dict_data(name, country)
+                self.load_country(transform_country(country))
 
             except KeyError as error:
                 raise KeyError(f"Couldn't process country: {error}")
@@ -5,14 +5,42 @@ It adds / updates the data to the database.
 
 import sys
 import os
+import json
+import logging
+import signal
+import threading
+import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from data_pipeline.client import RestCountriesAPIClient
+from data_pipeline.daemon import PipelineDaemon
 from data_pipeline.handler import Handler
+from data_pipeline.pipeline import StreamingPipeline
+from data_pipeline.report import RunReport
+from data_pipeline.source import CountrySource, RestCountriesSource, build_source
+from data_pipeline.warmer import CacheWarmer
 from internal.db.manager import NoSQLDatabaseManager
+from internal.db.model import (
+    BORDER_GRAPH,
+    HISTORY_METRICS,
+    SELECTABLE_COUNTRY_FIELDS,
+)
 from internal.cache.client import RedisClient
 from internal.cache.cache import CacheManager
+from internal.cache.keys import countries_records_key
+from internal.cache.views import build_views
+from internal.dataset.snapshot import FORMAT_VERSION, encode_dataset
+from internal.graph.borders import BorderGraph
+from internal.history.series import period_of
+from internal.storage.base import ObjectStorage
+from internal.storage.client import StorageClient
+from internal.storage.keys import dataset_key
+
+
+class RunCancelled(Exception):
+    """
+    Raised when a run is cancelled, e.g. because its lease was lost.
+    """
 
 
 class DataPipelineOrchestrator:
@@ -20,27 +48,235 @@ class DataPipelineOrchestrator:
     Orchestrates the data pipeline process.
     """
 
-    def __init__(self, db_manager: NoSQLDatabaseManager, cache_manager: CacheManager):
+    def __init__(
+        self,
+        db_manager: NoSQLDatabaseManager,
+        cache_manager: CacheManager,
+        source: CountrySource = None,
+        pipeline_options: dict = None,
+        warmer: CacheWarmer = None,
+        report: RunReport = None,
+        storage: ObjectStorage = None,
+        cancelled: threading.Event = None,
+    ):
         """
         Initialize the DataPipelineOrchestrator with database and cache managers.
 
         Args:
             db_manager (NoSQLDatabaseManager): Database manager instance.
             cache_manager (CacheManager): Cache manager instance.
+            source (CountrySource): Source of the country data.
+                Defaults to the live REST Countries API.
+            pipeline_options (dict): Keyword arguments for the StreamingPipeline.
+            warmer (CacheWarmer): Warms the backend's cache after the load.
+                The cache is not warmed if it is not set.
+            report (RunReport): Collects the measurements of the run.
+            storage (ObjectStorage): Where the dataset snapshot is published
+                for the backend. It is not published if it is not set.
+            cancelled (threading.Event): Once set, the run stops before its
+                next stage.
         """
         self.db_manager = db_manager
         self.cache_manager = cache_manager
+        self.source = source or RestCountriesSource()
+        self.pipeline_options = pipeline_options or {}
+        self.warmer = warmer
+        self.report = report or RunReport()
+        self.storage = storage
+        self.cancelled = cancelled or threading.Event()
+
+    def _check_cancelled(self, stage: str):
+        """
+        Stop the run before a stage if it was cancelled.
+
+        Args:
+            stage (str): The stage about to start.
+
+        Raises:
+            RunCancelled: If the run was cancelled.
+        """
+        if self.cancelled.is_set():
+            raise RunCancelled(f"The run was cancelled before the {stage} stage.")
+
+    def build_border_graph(self) -> BorderGraph:
+        """
+        Build the land border graph of the loaded countries and store it for
+        the backend.
+
+        Returns:
+            BorderGraph: The graph.
+        """
+        countries = self.db_manager.get_countries(
+            0, "country_name", 1, ["country_name", "cca3", "borders"]
+        )
+        graph = BorderGraph.build(countries)
+        self.db_manager.set_graph(BORDER_GRAPH, graph.to_document())
+        return graph
+
+    def publish_views(self) -> int:
+        """
+        Publish the sorted views the backend lists the countries from.
+
+        Returns:
+            int: The number of countries published, or 0 if the cache failed.
+        """
+        countries = self.db_manager.get_countries(
+            0, "country_name", 1, SELECTABLE_COUNTRY_FIELDS
+        )
+        records, views = build_views(countries)
+        if not self.cache_manager.set_sorted_views(
+            countries_records_key(), records, views
+        ):
+            return 0
+        return len(records)
+
+    def publish_dataset(self) -> int:
+        """
+        Publish the snapshot of the served country data, which the backend
+        reads while the database is not available.
+
+        Returns:
+            int: The size of the snapshot in bytes, or 0 if the storage is
+                not reachable.
+        """
+        if not self.storage.reachable():
+            print("Storage not reachable, skipping the dataset snapshot")
+            return 0
+        countries = self.db_manager.get_countries(
+            0, "country_name", 1, SELECTABLE_COUNTRY_FIELDS
+        )
+        return self.storage.write(
+            dataset_key(FORMAT_VERSION), encode_dataset(countries)
+        )
+
+    def record_history(self, timestamp: float = None) -> int:
+        """
+        Record the current metrics of every loaded country in its history.
 
-    def main(self):
+        Args:
+            timestamp (float): The time of the points, now by default.
+
+        Returns:
+            int: The number of points recorded.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        countries = self.db_manager.get_countries(
+            0, "country_name", 1, ["country_name"] + HISTORY_METRICS
+        )
+        points = [
+            {
+                "country_name": country["country_name"],
+                "t": timestamp,
+                **{metric: country.get(metric) for metric in HISTORY_METRICS},
+            }
+            for country in countries
+        ]
+        self.db_manager.record_metrics(period_of(timestamp), points)
+        return len(points)
+
+    def main(self) -> dict:
         """
         Main method to orchestrate the data pipeline.
+
+        Returns:
+            dict: The number of documents per outcome.
         """
-        countries = RestCountriesAPIClient.fetch_countries()
-        handler = Handler(self.db_manager, self.cache_manager)
-        handler.process_countries(countries)
+        try:
+            countries = self.source.iter_countries()
+            handler = Handler(self.db_manager, self.cache_manager)
+            counts = StreamingPipeline(
+                handler, report=self.report, **self.pipeline_options
+            ).run(countries)
+            self.report.add_bytes(self.source.bytes_read)
+            print(f"Processed countries: {counts}")
+
+            self._check_cancelled("graph")
+            with self.report.stage("graph"):
+                graph = self.build_border_graph()
+            print(f"Built the border graph of {len(graph)} countries")
+
+            self._check_cancelled("views")
+            with self.report.stage("views"):
+                print(f"Published the views of {self.publish_views()} countries")
+
+            if self.storage:
+                self._check_cancelled("dataset")
+                with self.report.stage("dataset"):
+                    print(f"Published a dataset of {self.publish_dataset()} bytes")
+
+            self._check_cancelled("history")
+            with self.report.stage("history"):
+                print(f"Recorded the history of {self.record_history()} countries")
+
+            if self.warmer:
+                self._check_cancelled("warm")
+                with self.report.stage("warm"):
+                    print(f"Warmed cache entries: {self.warmer.warm()}")
+
+        except Exception:
+            self.report.finish(success=False)
+            raise
+
+        self.report.finish(success=True)
+        return counts
+
+
+def run_pipeline(
+    database_manager: NoSQLDatabaseManager,
+    redis_client: object,
+    source: CountrySource,
+    pipeline_options: dict,
+    warm_cache: bool = True,
+    cancelled: threading.Event = None,
+) -> dict:
+    """
+    Run the pipeline once and write its report.
+
+    Args:
+        database_manager (NoSQLDatabaseManager): Database manager instance.
+        redis_client (object): The Redis client.
+        source (CountrySource): Source of the country data.
+        pipeline_options (dict): Keyword arguments for the StreamingPipeline.
+        warm_cache (bool): Warm the backend's cache after the load.
+        cancelled (threading.Event): Once set, the run stops before its next
+            stage.
+
+    Returns:
+        dict: The number of documents per outcome.
+    """
+    # Mongo and Redis round trips are recorded through the instrumented clients
+    report = RunReport()
+    database_manager = report.instrument(database_manager, "mongo")
+    cache_manager = CacheManager(report.instrument(redis_client, "redis"))
+
+    storage = StorageClient().get_storage()
+    warmer = None
+    if warm_cache:
+        warmer = CacheWarmer(database_manager, cache_manager, storage=storage)
+
+    try:
+        return DataPipelineOrchestrator(
+            database_manager,
+            cache_manager,
+            source,
+            pipeline_options,
+            warmer,
+            report,
+            storage,
+            cancelled,
+        ).main()
+    finally:
+        report.write(
+            os.getenv("PIPELINE_REPORT_PATH", "reports/pipeline_run.json"),
+            os.getenv("PIPELINE_METRICS_PATH", "reports/pipeline_run.prom"),
+        )
+        print(json.dumps(report.to_dict()))
 
 
 if __name__ == "__main__":
+    # The shared modules log their diagnostics, printed like the pipeline's own
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     db_url = os.getenv("MONGO_DB_URL")
     if not db_url:
         raise ValueError("DB_URL environment variable is not set.")
@@ -49,6 +285,41 @@ if __name__ == "__main__":
     database_manager.bootstrap()
 
     redis_client = RedisClient().get_client()
-    cache_manager = CacheManager(redis_client)
 
-    DataPipelineOrchestrator(database_manager, cache_manager).main()
+    source = build_source(
+        os.getenv("PIPELINE_SOURCE", "live"), os.getenv("PIPELINE_SNAPSHOT_PATH")
+    )
+
+    pipeline_options = {
+        "chunk_size": int(os.getenv("PIPELINE_CHUNK_SIZE", "500")),
+        "workers": int(os.getenv("PIPELINE_WORKERS", "0")) or None,
+        "executor": os.getenv("PIPELINE_EXECUTOR", "thread"),
+        "queue_size": int(os.getenv("PIPELINE_QUEUE_SIZE", "4")),
+        "vectorized": os.getenv("PIPELINE_VECTORIZED", "false").lower() == "true",
+    }
+    warm_cache = os.getenv("PIPELINE_WARM_CACHE", "true").lower() == "true"
+
+    def refresh(cancelled: threading.Event = None) -> dict:
+        return run_pipeline(
+            database_manager,
+            redis_client,
+            source,
+            pipeline_options,
+            warm_cache,
+            cancelled,
+        )
+
+    if os.getenv("PIPELINE_MODE", "once") == "daemon":
+        daemon = PipelineDaemon(
+            refresh,
+            source,
+            redis_client,
+            interval=float(os.getenv("PIPELINE_INTERVAL", "3600")),
+            jitter=float(os.getenv("PIPELINE_JITTER", "300")),
+            lock_ttl=float(os.getenv("PIPELINE_LOCK_TTL", "60")),
+        )
+        signal.signal(signal.SIGTERM, daemon.stop)
+        signal.signal(signal.SIGINT, daemon.stop)
+        daemon.serve()
+    else:
+        refresh()
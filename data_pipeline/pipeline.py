@@ -0,0 +1,253 @@
+"""
+Streaming extract, transform and load stages for the data pipeline.
+The stages are connected by bounded queues, so a slow stage applies
+backpressure to the stages before it and memory stays flat however large
+the source feed is.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
+from data_pipeline.handler import Handler, transform_chunk
+from data_pipeline.report import RunReport
+
+
+_DONE = object()
+
+
+class _Failure:
+    """
+    Carries an exception from a background stage to the load stage.
+    """
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+def _chunks(countries: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    """
+    Split the countries into lists of at most size documents.
+
+    Args:
+        countries (Iterable[dict]): The country documents.
+        size (int): The chunk size.
+
+    Returns:
+        Iterator[List[dict]]: The chunks.
+    """
+    iterator = iter(countries)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _timed_transform(
+    countries: List[dict], vectorized: bool
+) -> Tuple[List[dict], int, float]:
+    """
+    Transform a chunk and measure how long it took in the worker.
+
+    Returns:
+        Tuple[List[dict], int, float]: The transformed documents, the number
+            of failed documents and the transform time in seconds.
+    """
+    start = time.perf_counter()
+    transformed, failed = transform_chunk(countries, vectorized)
+    return transformed, failed, time.perf_counter() - start
+
+
+class StreamingPipeline:
+    """
+    Runs the extract, transform and load stages concurrently.
+
+    - Extract reads the source in a background thread and cuts it into chunks.
+    - Transform runs each chunk on a thread or process pool.
+    - Load writes the transformed documents, in source order, on the caller's thread.
+
+    At most queue_size chunks wait between two stages, so at most
+    2 * queue_size + workers chunks are in memory at any time.
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        chunk_size: int = 500,
+        workers: int = None,
+        executor: str = "thread",
+        queue_size: int = 4,
+        vectorized: bool = False,
+        report: RunReport = None,
+        join_timeout: float = 5.0,
+    ):
+        """
+        Initialize the StreamingPipeline.
+
+        Args:
+            handler (Handler): Handler used by the load stage.
+            chunk_size (int): Number of documents per chunk.
+            workers (int): Size of the transform pool. Defaults to the CPU count.
+            executor (str): 'thread' or 'process' transform pool.
+            queue_size (int): Maximum number of chunks waiting between stages.
+            vectorized (bool): Derive the numeric fields with numpy.
+            report (RunReport): Receives the stage timings and document counts.
+            join_timeout (float): Seconds to wait for a background stage to
+                stop once the run is over, e.g. a source blocked in a read.
+
+        Raises:
+            ValueError: If the executor is not valid.
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Invalid executor: {executor}")
+
+        self.handler = handler
+        self.chunk_size = max(1, chunk_size)
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.queue_size = max(1, queue_size)
+        self.vectorized = vectorized
+        self.report = report
+        self.join_timeout = join_timeout
+
+    def _record(self, stage: str, seconds: float):
+        if self.report:
+            self.report.add_stage_time(stage, seconds)
+
+    def _create_executor(self) -> Executor:
+        if self.executor == "process":
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    @staticmethod
+    def _put(target: queue.Queue, item: object, stop: threading.Event) -> bool:
+        """
+        Put an item on a bounded queue, giving up once the pipeline is stopped.
+
+        Returns:
+            bool: True if the item was queued, False if the pipeline stopped.
+        """
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _extract(
+        self, countries: Iterable[dict], chunks: queue.Queue, stop: threading.Event
+    ):
+        try:
+            iterator = _chunks(countries, self.chunk_size)
+            while True:
+                start = time.perf_counter()
+                chunk = next(iterator, None)
+                self._record("extract", time.perf_counter() - start)
+                if chunk is None:
+                    break
+                if not self._put(chunks, chunk, stop):
+                    return
+            self._put(chunks, _DONE, stop)
+        except Exception as error:
+            self._put(chunks, _Failure(error), stop)
+
+    def _transform(
+        self,
+        pool: Executor,
+        chunks: queue.Queue,
+        results: queue.Queue,
+        stop: threading.Event,
+    ):
+        try:
+            while not stop.is_set():
+                chunk = chunks.get()
+                if chunk is _DONE or isinstance(chunk, _Failure):
+                    self._put(results, chunk, stop)
+                    return
+                future = pool.submit(_timed_transform, chunk, self.vectorized)
+                if not self._put(results, future, stop):
+                    return
+        except Exception as error:
+            self._put(results, _Failure(error), stop)
+
+    def run(self, countries: Iterable[dict]) -> dict:
+        """
+        Run the pipeline over the countries.
+
+        Args:
+            countries (Iterable[dict]): The country documents from the source.
+
+        Returns:
+            dict: The number of documents per outcome
+                ('parsed', 'inserted', 'updated', 'unchanged', 'failed').
+
+        Raises:
+            Exception: If the source or the load stage fails.
+        """
+        counts = {"parsed": 0, "inserted": 0, "updated": 0, "unchanged": 0, "failed": 0}
+        chunks = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        with self._create_executor() as pool:
+            stages = [
+                threading.Thread(
+                    target=self._extract,
+                    args=(countries, chunks, stop),
+                    name="extract",
+                    daemon=True,
+                ),
+                threading.Thread(
+                    target=self._transform,
+                    name="transform",
+                    args=(pool, chunks, results, stop),
+                    daemon=True,
+                ),
+            ]
+            for stage in stages:
+                stage.start()
+
+            try:
+                while True:
+                    item = results.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, _Failure):
+                        raise item.error
+
+                    transformed, failed, seconds = item.result()
+                    self._record("transform", seconds)
+                    counts["parsed"] += len(transformed) + failed
+                    counts["failed"] += failed
+
+                    start = time.perf_counter()
+                    for country in transformed:
+                        try:
+                            counts[self.handler.load_country(country)] += 1
+                        except Exception as error:
+                            counts["failed"] += 1
+                            print(
+                                f"Couldn't load {country.get('country_name')}: {error}"
+                            )
+                    self._record("load", time.perf_counter() - start)
+            finally:
+                stop.set()
+                # Unblock a transform stage waiting on an empty queue
+                try:
+                    chunks.put_nowait(_DONE)
+                except queue.Full:
+                    pass
+                # The stages are daemon threads: one stuck in the source is
+                # abandoned rather than hanging the run
+                for stage in stages:
+                    stage.join(self.join_timeout)
+                    if stage.is_alive():
+                        print(f"Pipeline stage {stage.name} didn't stop, abandoning it")
+                if self.report:
+                    for outcome, count in counts.items():
+                        self.report.count(outcome, count)
+
+        return counts
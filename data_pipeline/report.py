@@ -0,0 +1,288 @@
+"""
+Instrumentation of a data pipeline run.
+It collects per-stage timers, document counters and Mongo / Redis round trips,
+and writes them as a JSON run report and a Prometheus textfile.
+"""
+
+import json
+import math
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from typing import List
+
+from internal.metrics.registry import Counter, Gauge, Histogram, Registry
+
+
+OUTCOMES = ["parsed", "inserted", "updated", "unchanged", "failed"]
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of sorted samples.
+    """
+    if not samples:
+        return 0.0
+    index = max(0, math.ceil(percent / 100 * len(samples)) - 1)
+    return samples[index]
+
+
+class _InstrumentedProxy:
+    """
+    Wraps an object and records a round trip for every public method call.
+    Redis pipelines are recorded once, when they are executed.
+    """
+
+    def __init__(self, target: object, report: "RunReport", system: str):
+        self._target = target
+        self._report = report
+        self._system = system
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+
+        if name == "pipeline":
+
+            @wraps(attribute)
+            def pipeline(*args, **kwargs):
+                pipe = attribute(*args, **kwargs)
+                return _InstrumentedPipeline(pipe, self._report, self._system)
+
+            return pipeline
+
+        @wraps(attribute)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                self._report.observe(self._system, name, time.perf_counter() - start)
+
+        return timed
+
+
+class _InstrumentedPipeline:
+    """
+    Wraps a Redis pipeline; only execute() goes over the network.
+    """
+
+    def __init__(self, pipe: object, report: "RunReport", system: str):
+        self._pipe = pipe
+        self._report = report
+        self._system = system
+
+    def __getattr__(self, name: str):
+        return getattr(self._pipe, name)
+
+    def execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._pipe.execute(*args, **kwargs)
+        finally:
+            self._report.observe(self._system, "pipeline", time.perf_counter() - start)
+
+
+class RunReport:
+    """
+    Collects the measurements of one pipeline run.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at = None
+        self.success = False
+        self.registry = Registry()
+
+        self.stage_seconds = Gauge(
+            "countries_pipeline_stage_duration_seconds",
+            "Time spent in each stage of the last pipeline run.",
+            ["stage"],
+            registry=self.registry,
+        )
+        self.documents = Counter(
+            "countries_pipeline_documents_total",
+            "Documents handled by the last pipeline run, by outcome.",
+            ["outcome"],
+            registry=self.registry,
+        )
+        self.bytes_fetched = Counter(
+            "countries_pipeline_fetched_bytes_total",
+            "Bytes read from the source by the last pipeline run.",
+            registry=self.registry,
+        )
+        self.round_trips = Histogram(
+            "countries_pipeline_round_trip_duration_seconds",
+            "Latency of the Mongo and Redis round trips of the last pipeline run.",
+            ["system", "operation"],
+            registry=self.registry,
+        )
+        self.run_seconds = Gauge(
+            "countries_pipeline_run_duration_seconds",
+            "Duration of the last pipeline run.",
+            registry=self.registry,
+        )
+        self.last_run = Gauge(
+            "countries_pipeline_last_run_timestamp_seconds",
+            "Unix time at which the last pipeline run finished.",
+            registry=self.registry,
+        )
+        self.last_success = Gauge(
+            "countries_pipeline_last_run_success",
+            "1 if the last pipeline run succeeded, 0 otherwise.",
+            registry=self.registry,
+        )
+
+        self._stages = {}
+        self._latencies = defaultdict(list)
+        self._operations = defaultdict(int)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a stage that runs as one block.
+
+        Args:
+            name (str): The name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - start)
+
+    def add_stage_time(self, name: str, seconds: float):
+        """
+        Add time to a stage; concurrent stages are timed piece by piece.
+
+        Args:
+            name (str): The name of the stage.
+            seconds (float): The time to add.
+        """
+        self._stages[name] = self._stages.get(name, 0.0) + seconds
+        self.stage_seconds.set(self._stages[name], stage=name)
+
+    def count(self, outcome: str, amount: int = 1):
+        """
+        Count documents with an outcome.
+
+        Args:
+            outcome (str): One of 'parsed', 'inserted', 'updated', 'unchanged', 'failed'.
+            amount (int): The number of documents.
+        """
+        self.documents.inc(amount, outcome=outcome)
+
+    def add_bytes(self, amount: int):
+        """
+        Count bytes read from the source.
+
+        Args:
+            amount (int): The number of bytes.
+        """
+        self.bytes_fetched.inc(amount)
+
+    def observe(self, system: str, operation: str, seconds: float):
+        """
+        Record a round trip to Mongo or Redis.
+
+        Args:
+            system (str): 'mongo' or 'redis'.
+            operation (str): The method that was called.
+            seconds (float): The latency of the round trip.
+        """
+        self.round_trips.observe(seconds, system=system, operation=operation)
+        self._latencies[system].append(seconds)
+        self._operations[(system, operation)] += 1
+
+    def instrument(self, target: object, system: str) -> object:
+        """
+        Wrap an object so that its method calls are recorded as round trips.
+
+        Args:
+            target (object): The database manager or Redis client.
+            system (str): 'mongo' or 'redis'.
+
+        Returns:
+            object: The instrumented object.
+        """
+        return _InstrumentedProxy(target, self, system)
+
+    def finish(self, success: bool):
+        """
+        Mark the end of the run.
+
+        Args:
+            success (bool): Whether the run succeeded.
+        """
+        self.finished_at = time.time()
+        self.success = success
+        self.run_seconds.set(self.finished_at - self.started_at)
+        self.last_run.set(self.finished_at)
+        self.last_success.set(1 if success else 0)
+
+    def to_dict(self) -> dict:
+        """
+        Build the JSON run report.
+
+        Returns:
+            dict: The run report.
+        """
+        round_trips = {}
+        for system, latencies in self._latencies.items():
+            samples = sorted(latencies)
+            round_trips[system] = {
+                "count": len(samples),
+                "total_seconds": sum(samples),
+                "p50_seconds": _percentile(samples, 50),
+                "p90_seconds": _percentile(samples, 90),
+                "p99_seconds": _percentile(samples, 99),
+                "max_seconds": samples[-1],
+                "operations": {
+                    operation: count
+                    for (name, operation), count in sorted(self._operations.items())
+                    if name == system
+                },
+            }
+
+        finished_at = self.finished_at or time.time()
+        return {
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": finished_at - self.started_at,
+            "success": self.success,
+            "stages": dict(self._stages),
+            "documents": {
+                outcome: int(self.documents.value(outcome=outcome))
+                for outcome in OUTCOMES
+            },
+            "bytes_fetched": int(self.bytes_fetched.value()),
+            "round_trips": round_trips,
+        }
+
+    def write(self, json_path: str = None, prometheus_path: str = None):
+        """
+        Write the JSON run report and the Prometheus textfile.
+        Files are replaced atomically, so a textfile collector never reads
+        a partial file.
+
+        Args:
+            json_path (str): The path of the JSON run report.
+            prometheus_path (str): The path of the Prometheus textfile.
+        """
+        if json_path:
+            self._write_atomic(json_path, json.dumps(self.to_dict(), indent=2))
+        if prometheus_path:
+            self._write_atomic(prometheus_path, self.registry.render())
+
+    @staticmethod
+    def _write_atomic(path: str, content: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
@@ -0,0 +1,360 @@
+"""
+Sources the data pipeline can extract country data from.
+A source yields country documents one at a time, so the rest of the pipeline
+never needs more than the document it is working on.
+"""
+
+import codecs
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Iterable, Iterator
+
+from data_pipeline.client import RestCountriesAPIClient
+
+
+DEFAULT_SNAPSHOT_PATH = "snapshots/countries.ndjson.gz"
+
+# Size of the chunks files are read in
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[dict]:
+    """
+    Parse a JSON array of objects incrementally, yielding every element as
+    soon as it is complete, so only one element is held in memory at a time.
+
+    Args:
+        chunks (Iterable[bytes]): The UTF-8 encoded array, in chunks of any size.
+
+    Returns:
+        Iterator[dict]: The elements of the array.
+
+    Raises:
+        ValueError: If the data is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer, position, started, done = "", 0, False, False
+
+    while True:
+        # Skip the whitespace and the separators between the elements
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array.")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if done:
+                    raise ValueError("Truncated JSON array.")
+            else:
+                # A number at the end of the buffer may go on in the next chunk
+                if end < len(buffer) or done:
+                    yield element
+                    buffer, position = buffer[end:], 0
+                    continue
+        if done:
+            raise ValueError("Truncated JSON array.")
+        chunk = next(chunks, None)
+        if chunk is None:
+            buffer += utf8.decode(b"", final=True)
+            done = True
+        else:
+            buffer += utf8.decode(chunk)
+
+
+def _read_chunks(f: BinaryIO) -> Iterator[bytes]:
+    while chunk := f.read(CHUNK_SIZE):
+        yield chunk
+
+
+class CountrySource(ABC):
+    """
+    Base class for country data sources.
+    """
+
+    # Number of bytes read from the underlying source by the last iteration
+    bytes_read = 0
+
+    @abstractmethod
+    def iter_countries(self) -> Iterator[dict]:
+        """
+        Iterate over the country documents of the source.
+
+        Returns:
+            Iterator[dict]: The country documents.
+        """
+
+    def fingerprint(self) -> str:
+        """
+        Identify the current data of the source, so an unchanged source can be
+        skipped. Equal fingerprints mean equal data.
+
+        Returns:
+            str: The fingerprint, or None if the source can't tell.
+        """
+        return None
+
+
+class RestCountriesSource(CountrySource):
+    """
+    Reads the countries from the live REST Countries API, parsing the response
+    as it streams in.
+    The fingerprint is the SHA-256 of the response. The data it fetched is
+    spooled to a temporary file for the next iteration, and its ETag makes the
+    next fingerprint a conditional request that doesn't download unchanged
+    data again.
+    """
+
+    def __init__(self, client: RestCountriesAPIClient = RestCountriesAPIClient):
+        self.client = client
+        self._spool = None
+        self._etag = None
+        self._fingerprint = None
+
+    def fingerprint(self) -> str:
+        chunks, etag = self.client.stream_countries(self._etag)
+        if chunks is None:
+            return self._fingerprint
+
+        spool = tempfile.TemporaryFile()
+        sha256 = hashlib.sha256()
+        try:
+            for chunk in chunks:
+                spool.write(chunk)
+                sha256.update(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        if self._spool:
+            self._spool.close()
+        self._spool, self._etag = spool, etag
+        self._fingerprint = sha256.hexdigest()
+        return self._fingerprint
+
+    def _counted(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def iter_countries(self) -> Iterator[dict]:
+        self.bytes_read = 0
+        spool, self._spool = self._spool, None
+        if spool is None:
+            chunks, _ = self.client.stream_countries()
+            yield from iter_json_array(self._counted(chunks))
+            return
+        with spool:
+            spool.seek(0)
+            yield from iter_json_array(self._counted(_read_chunks(spool)))
+
+
+class SnapshotSource(CountrySource):
+    """
+    Replays a gzip-compressed NDJSON snapshot, one line at a time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        """
+        Check if the snapshot file is available.
+
+        Returns:
+            bool: True if the snapshot exists, False otherwise.
+        """
+        return os.path.isfile(self.path)
+
+    def fingerprint(self) -> str:
+        sha256 = hashlib.sha256()
+        with open(self.path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def iter_countries(self) -> Iterator[dict]:
+        self.bytes_read = 0
+        with open(self.path, "rb") as raw, gzip.open(raw, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            self.bytes_read = raw.tell()
+
+
+class SnapshotWriter:
+    """
+    Writes country documents to a gzip-compressed NDJSON snapshot.
+    The snapshot is written to a temporary file first and then moved in place,
+    so a failed write never replaces the last good snapshot.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def tee(self, countries: Iterable[dict]) -> Iterator[dict]:
+        """
+        Pass the countries through, writing each to the snapshot on the way.
+        The snapshot only replaces the previous one once all countries went
+        through; if the iteration fails or stops early, it is discarded.
+        A snapshot that can't be written is skipped without interrupting
+        the countries.
+
+        Args:
+            countries (Iterable[dict]): The country documents to write.
+
+        Returns:
+            Iterator[dict]: The same country documents.
+        """
+        tmp_path = f"{self.path}.tmp"
+        f = None
+        try:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                f = gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6)
+            except OSError as error:
+                print(f"Couldn't write snapshot {self.path}: {error}")
+
+            for country in countries:
+                if f:
+                    try:
+                        f.write(json.dumps(country, separators=(",", ":")))
+                        f.write("\n")
+                    except OSError as error:
+                        print(f"Couldn't write snapshot {self.path}: {error}")
+                        f.close()
+                        f = None
+                yield country
+
+            if f:
+                try:
+                    f.close()
+                    f = None
+                    os.replace(tmp_path, self.path)
+                except OSError as error:
+                    print(f"Couldn't write snapshot {self.path}: {error}")
+        finally:
+            if f:
+                f.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def write(self, countries: Iterable[dict]) -> int:
+        """
+        Write the countries to the snapshot.
+
+        Args:
+            countries (Iterable[dict]): The country documents to write.
+
+        Returns:
+            int: The number of documents written.
+        """
+        return sum(1 for _ in self.tee(countries))
+
+
+class SnapshottingSource(CountrySource):
+    """
+    Reads the countries from a primary source and records a snapshot of every
+    successful fetch, as the documents stream through. If the primary source
+    fails before its first document, the last good snapshot is replayed
+    instead; a failure after that is raised, and the snapshot is kept.
+    """
+
+    def __init__(self, primary: CountrySource, snapshot_path: str):
+        self.primary = primary
+        self.snapshot = SnapshotSource(snapshot_path)
+        self.writer = SnapshotWriter(snapshot_path)
+
+    def fingerprint(self) -> str:
+        try:
+            return self.primary.fingerprint()
+        except Exception as error:
+            if not self.snapshot.exists():
+                raise
+            print(f"Primary source failed ({error}), using {self.snapshot.path}")
+            return self.snapshot.fingerprint()
+
+    def iter_countries(self) -> Iterator[dict]:
+        try:
+            countries = self.writer.tee(self.primary.iter_countries())
+            first = next(countries, None)
+        except Exception as error:
+            if not self.snapshot.exists():
+                raise
+            print(f"Primary source failed ({error}), replaying {self.snapshot.path}")
+            yield from self.snapshot.iter_countries()
+            self.bytes_read = self.snapshot.bytes_read
+            return
+
+        if first is not None:
+            yield first
+            yield from countries
+        self.bytes_read = self.primary.bytes_read
+
+
+class ReplaySource(CountrySource):
+    """
+    Replays the last good snapshot without contacting the primary source.
+    Only when no snapshot exists yet is the primary source used (and recorded).
+    """
+
+    def __init__(self, primary: CountrySource, snapshot_path: str):
+        self.snapshot = SnapshotSource(snapshot_path)
+        self.fallback = SnapshottingSource(primary, snapshot_path)
+
+    def fingerprint(self) -> str:
+        if self.snapshot.exists():
+            return self.snapshot.fingerprint()
+        return self.fallback.fingerprint()
+
+    def iter_countries(self) -> Iterator[dict]:
+        if self.snapshot.exists():
+            yield from self.snapshot.iter_countries()
+            self.bytes_read = self.snapshot.bytes_read
+        else:
+            yield from self.fallback.iter_countries()
+            self.bytes_read = self.fallback.bytes_read
+
+
+def build_source(mode: str = "live", snapshot_path: str = None) -> CountrySource:
+    """
+    Build the country source for the given mode.
+
+    Args:
+        mode (str): 'api' for the live API only, 'live' for the live API with
+            snapshots and fallback, 'replay' to replay the last good snapshot.
+        snapshot_path (str): The path of the snapshot file.
+
+    Returns:
+        CountrySource: The country source.
+
+    Raises:
+        ValueError: If the mode is not valid.
+    """
+    snapshot_path = snapshot_path or DEFAULT_SNAPSHOT_PATH
+    primary = RestCountriesSource()
+
+    match mode:
+        case "api":
+            return primary
+        case "live":
+            return SnapshottingSource(primary, snapshot_path)
+        case "replay":
+            return ReplaySource(primary, snapshot_path)
+        case _:
+            raise ValueError(f"Invalid pipeline source: {mode}")
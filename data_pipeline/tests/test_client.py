@@ -48,3 +48,20 @@ def test_fetch_countries_failure():
             Exception, match="Couldn't fetch data from the API: Internal Server Error"
         ):
             RestCountriesAPIClient.fetch_countries()
+
+
+def test_stream_countries_not_modified():
+    """
+    Test the stream_countries method returns no data when the ETag matches.
+    """
+    mock_response = Mock()
+    mock_response.status_code = 304
+
+    with patch(
+        "data_pipeline.client.requests.get", return_value=mock_response
+    ) as mock_get:
+        result = RestCountriesAPIClient.stream_countries('"v1"')
+
+    assert result == (None, '"v1"')
+    assert mock_get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+    assert mock_get.call_args.kwargs["stream"] is True
@@ -0,0 +1,191 @@
+"""
+This module contains tests for the data_pipeline.daemon module.
+"""
+
+import shutil
+import socket
+import subprocess
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import redis
+
+from benchmarks.fakes import FakeRedis
+from data_pipeline.daemon import (
+    FAILED,
+    LOST,
+    REFRESHED,
+    RELEASE_SCRIPT,
+    STANDBY,
+    UNCHANGED,
+    LeaseLock,
+    PipelineDaemon,
+)
+from internal.cache.cache import CACHE_TTL
+
+
+@pytest.fixture
+def redis_client():
+    client = FakeRedis()
+
+    # Stand-ins for the lease scripts, which are tested against Redis below
+    def register_script(script):
+        def run(keys, args):
+            if client.get(keys[0]) != args[0]:
+                return 0
+            if script == RELEASE_SCRIPT:
+                client.delete(keys[0])
+            return 1
+
+        return run
+
+    client.register_script = register_script
+    return client
+
+
+@pytest.fixture
+def source():
+    source = MagicMock()
+    source.fingerprint.return_value = "abc"
+    return source
+
+
+def test_only_one_replica_refreshes(redis_client, source):
+    # Arrange
+    refresh = MagicMock()
+    leader = PipelineDaemon(refresh, source, redis_client)
+    standby = PipelineDaemon(refresh, source, redis_client)
+    leader.lock.acquire()
+
+    # Act & Assert
+    assert standby.run_once() == STANDBY
+    refresh.assert_not_called()
+
+
+def test_unchanged_source_is_skipped(redis_client, source):
+    # Arrange
+    refresh = MagicMock()
+    daemon = PipelineDaemon(refresh, source, redis_client)
+
+    # Act
+    outcomes = [daemon.run_once(), daemon.run_once()]
+    source.fingerprint.return_value = "def"
+    outcomes.append(daemon.run_once())
+
+    # Assert
+    assert outcomes == [REFRESHED, UNCHANGED, REFRESHED]
+    assert refresh.call_count == 2
+    assert redis_client.get(PipelineDaemon.FINGERPRINT_KEY) == "def"
+
+
+def test_fingerprint_expires_before_the_published_data(redis_client, source):
+    # Arrange
+    redis_client.set = MagicMock(wraps=redis_client.set)
+    daemon = PipelineDaemon(MagicMock(), source, redis_client)
+
+    # Act
+    daemon.run_once()
+
+    # Assert
+    redis_client.set.assert_any_call(
+        PipelineDaemon.FINGERPRINT_KEY, "abc", ex=CACHE_TTL // 2
+    )
+
+
+def test_failed_refresh_is_retried(redis_client, source):
+    # Arrange
+    refresh = MagicMock(side_effect=[Exception("Mongo down"), {}])
+    daemon = PipelineDaemon(refresh, source, redis_client)
+
+    # Act & Assert: the fingerprint is only stored after a successful refresh
+    assert daemon.run_once() == FAILED
+    assert redis_client.get(PipelineDaemon.FINGERPRINT_KEY) is None
+    assert daemon.run_once() == REFRESHED
+
+
+def test_lost_lease_stops_the_refresh(redis_client, source):
+    # Arrange: another replica takes the lease over during the refresh
+    def refresh(lost):
+        redis_client.set("pipeline:lock", "other")
+        if lost.wait(5):
+            raise Exception("The run was cancelled before the views stage.")
+
+    daemon = PipelineDaemon(refresh, source, redis_client, lock_ttl=0.03)
+
+    # Act
+    outcome = daemon.run_once()
+
+    # Assert: the fingerprint isn't stored and the new holder keeps the lease
+    assert outcome == LOST
+    assert redis_client.get(PipelineDaemon.FINGERPRINT_KEY) is None
+    assert redis_client.get("pipeline:lock") == "other"
+
+
+def test_serve_stops_after_the_current_run(redis_client, source):
+    # Arrange: the stop signal arrives during the first run
+    daemon = PipelineDaemon(MagicMock(), source, redis_client, interval=3600)
+    daemon.refresh.side_effect = lambda lost: daemon.stop()
+
+    # Act
+    daemon.serve()
+
+    # Assert
+    daemon.refresh.assert_called_once()
+
+
+def test_next_delay_is_jittered(redis_client, source):
+    daemon = PipelineDaemon(MagicMock(), source, redis_client, interval=60, jitter=10)
+
+    delays = [daemon.next_delay() for _ in range(200)]
+
+    assert all(50 <= delay <= 70 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def redis_server():
+    if shutil.which("redis-server") is None:
+        pytest.skip("redis-server is not installed")
+    port = _free_port()
+    server = subprocess.Popen(
+        ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL,
+    )
+    client = redis.StrictRedis(port=port, decode_responses=True)
+    try:
+        for _ in range(100):
+            try:
+                client.ping()
+                break
+            except redis.ConnectionError:
+                time.sleep(0.05)
+        yield client
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def test_lease_lock_against_redis(redis_server):
+    # Arrange
+    first = LeaseLock(redis_server, "lock", ttl=0.2)
+    second = LeaseLock(redis_server, "lock", ttl=0.2)
+
+    # Act & Assert: only the owner can renew or release the lease
+    assert first.acquire()
+    assert not second.acquire()
+    assert not second.renew()
+    assert not second.release()
+    assert first.renew()
+    time.sleep(0.3)
+    assert not first.renew()
+    assert second.acquire()
+    assert not first.release()
+    assert second.release()
+    assert redis_server.get("lock") is None
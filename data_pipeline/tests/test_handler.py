@@ -1,6 +1,6 @@
 from unittest.mock import MagicMock
 import pytest
-from data_pipeline.handler import Handler
+from data_pipeline.handler import Handler, transform_chunk
 
 
 @pytest.fixture
@@ -139,3 +139,35 @@ def test_process_countries_key_error(handler):
 
     with pytest.raises(KeyError, match="Couldn't process country: 'area'"):
         handler.process_countries(countries)
+
+
+def test_process_countries_zero_area(handler, mock_db_manager, mock_cache_manager):
+    countries = [
+        {
+            "name": {"common": "CountryE"},
+            "population": 0,
+            "area": 0,
+        }
+    ]
+
+    mock_cache_manager.get_dict_data.return_value = None
+    mock_db_manager.get_country.return_value = None
+
+    handler.process_countries(countries)
+
+    added = mock_db_manager.add_country.call_args.args[1]
+    assert added["population_density"] is None
+
+
+def test_transform_chunk_skips_invalid_countries():
+    countries = [
+        {"name": {"common": "CountryF"}, "population": 100, "area": 4},
+        {"name": {"common": "CountryG"}, "population": 100},
+        {"name": {"common": "CountryH"}, "population": 100, "area": 0},
+    ]
+
+    transformed, failed = transform_chunk(countries)
+
+    assert failed == 1
+    assert [c["country_name"] for c in transformed] == ["CountryF", "CountryH"]
+    assert [c["population_density"] for c in transformed] == [25.0, None]
@@ -0,0 +1,37 @@
+"""
+This module contains tests for the data_pipeline.main module.
+"""
+
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from data_pipeline.main import DataPipelineOrchestrator, RunCancelled
+
+
+def test_cancelled_run_publishes_nothing():
+    # Arrange: the lease is lost while the countries are loaded
+    cancelled = threading.Event()
+    source = MagicMock()
+    source.bytes_read = 0
+
+    def iter_countries():
+        cancelled.set()
+        return iter([])
+
+    source.iter_countries.side_effect = iter_countries
+    db_manager, cache_manager, storage = MagicMock(), MagicMock(), MagicMock()
+    orchestrator = DataPipelineOrchestrator(
+        db_manager, cache_manager, source, storage=storage, cancelled=cancelled
+    )
+
+    # Act
+    with pytest.raises(RunCancelled, match="before the graph stage"):
+        orchestrator.main()
+
+    # Assert
+    db_manager.set_graph.assert_not_called()
+    cache_manager.set_sorted_views.assert_not_called()
+    storage.write.assert_not_called()
+    assert orchestrator.report.to_dict()["success"] is False
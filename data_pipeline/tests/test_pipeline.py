@@ -0,0 +1,106 @@
+"""
+This module contains tests for the data_pipeline.pipeline module.
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from data_pipeline.pipeline import StreamingPipeline
+
+
+def _countries(count):
+    return (
+        {"name": {"common": f"Country{i}"}, "population": i * 10, "area": i}
+        for i in range(count)
+    )
+
+
+@pytest.fixture
+def handler():
+    handler = MagicMock()
+    handler.load_country.return_value = "inserted"
+    return handler
+
+
+def test_run_loads_every_country_in_order(handler):
+    counts = StreamingPipeline(handler, chunk_size=7, workers=3, queue_size=2).run(
+        _countries(100)
+    )
+
+    assert counts == {
+        "parsed": 100,
+        "inserted": 100,
+        "updated": 0,
+        "unchanged": 0,
+        "failed": 0,
+    }
+    loaded = [
+        call.args[0]["country_name"] for call in handler.load_country.call_args_list
+    ]
+    assert loaded == [f"Country{i}" for i in range(100)]
+
+
+def test_run_counts_failed_countries(handler):
+    countries = [{"name": {"common": "CountryA"}, "population": 1}]
+
+    counts = StreamingPipeline(handler).run(countries)
+
+    assert counts["failed"] == 1
+    handler.load_country.assert_not_called()
+
+
+def test_run_with_process_pool(handler):
+    counts = StreamingPipeline(
+        handler, chunk_size=10, workers=2, executor="process"
+    ).run(_countries(25))
+
+    assert counts["inserted"] == 25
+
+
+def test_run_raises_source_errors(handler):
+    def failing_source():
+        yield {"name": {"common": "CountryA"}, "population": 1, "area": 1}
+        raise Exception("Source failed")
+
+    with pytest.raises(Exception, match="Source failed"):
+        StreamingPipeline(handler, chunk_size=1).run(failing_source())
+
+
+def test_run_counts_load_failures(handler):
+    handler.load_country.side_effect = ["inserted", Exception("Mongo error")] * 5
+
+    counts = StreamingPipeline(handler, chunk_size=3).run(_countries(10))
+
+    assert counts["inserted"] == 5
+    assert counts["failed"] == 5
+
+
+def test_run_doesnt_wait_for_a_blocked_source(handler):
+    # Arrange: the source blocks after the first chunk, and the transform fails
+    release = threading.Event()
+
+    def blocking_source():
+        yield from _countries(1)
+        release.wait()
+
+    pipeline = StreamingPipeline(handler, chunk_size=1, join_timeout=0.1)
+
+    # Act
+    start = time.monotonic()
+    with patch(
+        "data_pipeline.pipeline.transform_chunk", side_effect=Exception("Bad chunk")
+    ):
+        with pytest.raises(Exception, match="Bad chunk"):
+            pipeline.run(blocking_source())
+    release.set()
+
+    # Assert
+    assert time.monotonic() - start < 2
+
+
+def test_invalid_executor(handler):
+    with pytest.raises(ValueError, match="Invalid executor: fiber"):
+        StreamingPipeline(handler, executor="fiber")
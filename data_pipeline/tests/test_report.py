@@ -0,0 +1,65 @@
+"""
+This module contains tests for the data_pipeline.report module.
+"""
+
+import json
+from unittest.mock import MagicMock
+
+from data_pipeline.report import RunReport
+
+
+def test_instrument_records_round_trips():
+    report = RunReport()
+    db_manager = report.instrument(MagicMock(), "mongo")
+    redis_client = report.instrument(MagicMock(), "redis")
+
+    db_manager.get_country("CountryA")
+    db_manager.get_country("CountryB")
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.set("a", "1")
+    pipe.set("b", "2")
+    pipe.execute()
+
+    round_trips = report.to_dict()["round_trips"]
+    assert round_trips["mongo"]["count"] == 2
+    assert round_trips["mongo"]["operations"] == {"get_country": 2}
+    assert round_trips["redis"]["operations"] == {"pipeline": 1}
+
+
+def test_report_counts_documents_and_stages():
+    report = RunReport()
+
+    report.count("parsed", 3)
+    report.count("inserted", 2)
+    report.count("failed")
+    report.add_bytes(1024)
+    report.add_stage_time("load", 0.5)
+    report.add_stage_time("load", 0.25)
+    report.finish(success=True)
+
+    result = report.to_dict()
+    assert result["documents"] == {
+        "parsed": 3,
+        "inserted": 2,
+        "updated": 0,
+        "unchanged": 0,
+        "failed": 1,
+    }
+    assert result["bytes_fetched"] == 1024
+    assert result["stages"] == {"load": 0.75}
+    assert result["success"] is True
+
+
+def test_write_report_files(tmp_path):
+    report = RunReport()
+    report.count("inserted", 250)
+    report.finish(success=True)
+
+    json_path = tmp_path / "reports" / "run.json"
+    prometheus_path = tmp_path / "reports" / "run.prom"
+    report.write(str(json_path), str(prometheus_path))
+
+    assert json.loads(json_path.read_text())["documents"]["inserted"] == 250
+    metrics = prometheus_path.read_text()
+    assert 'countries_pipeline_documents_total{outcome="inserted"} 250' in metrics
+    assert "countries_pipeline_last_run_success 1" in metrics
@@ -0,0 +1,154 @@
+"""
+This module contains tests for the data_pipeline.source module.
+"""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from data_pipeline.source import (
+    ReplaySource,
+    RestCountriesSource,
+    SnapshotSource,
+    SnapshotWriter,
+    SnapshottingSource,
+    build_source,
+    iter_json_array,
+)
+
+
+COUNTRIES = [
+    {"name": {"common": "Country1"}, "population": 1000, "area": 10},
+    {"name": {"common": "Country2"}, "population": 2000, "area": 20},
+]
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "snapshots" / "countries.ndjson.gz")
+
+
+def test_snapshot_round_trip(snapshot_path):
+    count = SnapshotWriter(snapshot_path).write(iter(COUNTRIES))
+
+    assert count == 2
+    assert list(SnapshotSource(snapshot_path).iter_countries()) == COUNTRIES
+
+
+def test_live_source_fingerprint_uses_the_etag():
+    # Arrange
+    client = MagicMock()
+    client.stream_countries.side_effect = [
+        (iter([b'[{"name": {"com', b'mon": "Country1"}}]']), '"v1"'),
+        (None, '"v1"'),
+    ]
+    source = RestCountriesSource(client)
+
+    # Act
+    first = source.fingerprint()
+    countries = list(source.iter_countries())
+    second = source.fingerprint()
+
+    # Assert: the fetched data is reused, and not downloaded again if unchanged
+    assert first == second and len(first) == 64
+    assert countries == [{"name": {"common": "Country1"}}]
+    assert source.bytes_read == 34
+    client.stream_countries.assert_called_with('"v1"')
+
+
+def test_live_source_parses_the_stream_incrementally():
+    # Arrange: the stream fails after the first country
+    def chunks():
+        yield b'[{"name": {"common": "Country1"}}, '
+        raise Exception("Connection reset")
+
+    client = MagicMock()
+    client.stream_countries.return_value = (chunks(), None)
+    countries = RestCountriesSource(client).iter_countries()
+
+    # Act & Assert
+    assert next(countries) == {"name": {"common": "Country1"}}
+    with pytest.raises(Exception, match="Connection reset"):
+        next(countries)
+
+
+def test_iter_json_array_across_chunks():
+    raw = json.dumps(COUNTRIES).encode("utf-8")
+
+    chunks = [raw[i : i + 3] for i in range(0, len(raw), 3)]
+
+    assert list(iter_json_array(chunks)) == COUNTRIES
+    assert list(iter_json_array([b"[1", b"2, 3]"])) == [12, 3]
+    with pytest.raises(ValueError, match="Truncated"):
+        list(iter_json_array([raw[:-1]]))
+
+
+def test_snapshot_fingerprint(snapshot_path):
+    SnapshotWriter(snapshot_path).write(COUNTRIES)
+    first = SnapshotSource(snapshot_path).fingerprint()
+    SnapshotWriter(snapshot_path).write(COUNTRIES[:1])
+
+    assert SnapshotSource(snapshot_path).fingerprint() != first
+
+
+def test_snapshotting_source_writes_snapshot(snapshot_path):
+    primary = MagicMock()
+    primary.iter_countries.return_value = iter(COUNTRIES)
+
+    result = list(SnapshottingSource(primary, snapshot_path).iter_countries())
+
+    assert result == COUNTRIES
+    assert list(SnapshotSource(snapshot_path).iter_countries()) == COUNTRIES
+
+
+def test_snapshotting_source_falls_back_to_snapshot(snapshot_path):
+    SnapshotWriter(snapshot_path).write(COUNTRIES)
+    primary = MagicMock()
+    primary.iter_countries.side_effect = Exception("API down")
+
+    result = list(SnapshottingSource(primary, snapshot_path).iter_countries())
+
+    assert result == COUNTRIES
+
+
+def test_snapshotting_source_without_snapshot_raises(snapshot_path):
+    primary = MagicMock()
+    primary.iter_countries.side_effect = Exception("API down")
+
+    with pytest.raises(Exception, match="API down"):
+        list(SnapshottingSource(primary, snapshot_path).iter_countries())
+
+
+def test_snapshotting_source_keeps_snapshot_on_failure_midway(snapshot_path):
+    # Arrange
+    SnapshotWriter(snapshot_path).write(COUNTRIES)
+
+    def countries():
+        yield COUNTRIES[0]
+        raise Exception("API down")
+
+    primary = MagicMock()
+    primary.iter_countries.return_value = countries()
+
+    # Act
+    with pytest.raises(Exception, match="API down"):
+        list(SnapshottingSource(primary, snapshot_path).iter_countries())
+
+    # Assert: the partial fetch didn't replace the last good snapshot
+    assert list(SnapshotSource(snapshot_path).iter_countries()) == COUNTRIES
+
+
+def test_replay_source_skips_primary(snapshot_path):
+    SnapshotWriter(snapshot_path).write(COUNTRIES)
+    primary = MagicMock()
+
+    result = list(ReplaySource(primary, snapshot_path).iter_countries())
+
+    assert result == COUNTRIES
+    primary.iter_countries.assert_not_called()
+
+
+def test_build_source_invalid_mode():
+    with pytest.raises(ValueError, match="Invalid pipeline source: bogus"):
+        build_source("bogus")
@@ -0,0 +1,98 @@
+"""
+This module contains tests for the data_pipeline.warmer module.
+"""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from data_pipeline.warmer import CacheWarmer
+
+
+COUNTRY = {
+    "country_name": "CountryA",
+    "population_density": 20.0,
+    "area": 50000,
+    "population": 1000000,
+    "region": "RegionA",
+    "capital": ["CapitalA"],
+}
+
+
+@pytest.fixture
+def mock_db_manager():
+    db_manager = MagicMock()
+    db_manager.get_countries.return_value = [COUNTRY]
+    db_manager.get_images.return_value = [
+        {
+            "_id": 1,
+            "country_name": "CountryA",
+            "image_id": "img123",
+            "title": "Title",
+            "description": "Description",
+        }
+    ]
+    return db_manager
+
+
+@pytest.fixture
+def mock_cache_manager():
+    cache_manager = MagicMock()
+    cache_manager.incr_many.side_effect = lambda keys: [7] * len(keys)
+    return cache_manager
+
+
+def test_warm_writes_every_view(mock_db_manager, mock_cache_manager, tmp_path):
+    image_path = tmp_path / "CountryA" / "images" / "img123.jpg"
+    image_path.parent.mkdir(parents=True)
+    image_path.write_bytes(b"test_image_data")
+
+    warmer = CacheWarmer(mock_db_manager, mock_cache_manager, str(tmp_path))
+    result = warmer.warm()
+
+    assert result == {"country": 1, "images": 1}
+
+    images = mock_cache_manager.set_many.call_args.args[0]
+    mock_cache_manager.incr_many.assert_called_once_with(
+        ["images:{CountryA}:generation"]
+    )
+    assert json.loads(images["images:{CountryA}:generation=7:limit=20:cursor="]) == {
+        "images": [
+            {
+                "image_id": "img123",
+                "title": "Title",
+                "description": "Description",
+                "file": "dGVzdF9pbWFnZV9kYXRh",
+            }
+        ],
+        "next_cursor": None,
+    }
+
+    details = mock_cache_manager.set_dict_many.call_args.args[0]
+    assert details["country:{CountryA}"]["region"] == "RegionA"
+
+
+def test_warm_tolerates_missing_fields(mock_cache_manager, tmp_path):
+    # Arrange
+    db_manager = MagicMock()
+    db_manager.get_countries.return_value = [{"country_name": "CountryB"}]
+    db_manager.get_images.return_value = []
+
+    # Act
+    result = CacheWarmer(db_manager, mock_cache_manager, str(tmp_path)).warm()
+
+    # Assert
+    assert result == {"country": 1, "images": 1}
+    details = mock_cache_manager.set_dict_many.call_args.args[0]
+    assert details["country:{CountryB}"]["population"] is None
+    db_manager.get_images.assert_called_once_with("CountryB", 21)
+
+
+def test_warm_skips_images_without_assets(
+    mock_db_manager, mock_cache_manager, tmp_path
+):
+    warmer = CacheWarmer(mock_db_manager, mock_cache_manager, str(tmp_path / "none"))
+
+    assert warmer.warm_images([COUNTRY]) == 0
+    mock_cache_manager.set_many.assert_not_called()
@@ -0,0 +1,151 @@
+"""
+Warms the backend's cache after the data is loaded.
+It materializes every country's details and the image galleries into Redis,
+so the first request after a deploy is a cache hit. The country lists are
+served from the sorted views the pipeline publishes.
+"""
+
+import base64
+import json
+
+from internal.db.manager import NoSQLDatabaseManager
+from internal.db.model import COUNTRY_FIELDS, IMAGES_PAGE_SIZE
+from internal.cache.cache import CacheManager
+from internal.cache.keys import (
+    country_key,
+    images_generation_key,
+    images_page_key,
+)
+from internal.storage.base import ObjectStorage
+from internal.storage.keys import image_key
+from internal.storage.local import LocalStorage
+
+
+class CacheWarmer:
+    """
+    Writes the entries the backend reads into the cache, using pipelined writes.
+    """
+
+    def __init__(
+        self,
+        db_manager: NoSQLDatabaseManager,
+        cache_manager: CacheManager,
+        assets_dir: str = "/assets",
+        storage: ObjectStorage = None,
+        batch_size: int = 50,
+    ):
+        """
+        Initialize the CacheWarmer.
+
+        Args:
+            db_manager (NoSQLDatabaseManager): Database manager instance.
+            cache_manager (CacheManager): Cache manager instance.
+            assets_dir (str): Directory the backend stores the image files in.
+            storage (ObjectStorage): The storage of the image files; defaults
+                to the files under assets_dir.
+            batch_size (int): The number of gallery pages written at once.
+        """
+        self.db_manager = db_manager
+        self.cache_manager = cache_manager
+        self.assets_dir = assets_dir
+        self.storage = storage or LocalStorage(assets_dir)
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _extract_country_data(country: dict) -> dict:
+        return {field: country.get(field) for field in COUNTRY_FIELDS}
+
+    def warm_country_details(self, countries: list) -> int:
+        """
+        Warm the details of every country.
+
+        Args:
+            countries (list): All countries in the database.
+
+        Returns:
+            int: The number of entries written.
+        """
+        details = {
+            country_key(country["country_name"]): self._extract_country_data(country)
+            for country in countries
+        }
+
+        self.cache_manager.set_dict_many(details)
+        return len(details)
+
+    def warm_images(self, countries: list) -> int:
+        """
+        Warm the first page of every country's image gallery, including empty
+        galleries. Galleries are skipped when the image files are not reachable
+        from here, since a gallery without its files would be wrong rather than cold.
+        The generation of every gallery is incremented first, so the warmed
+        pages replace whatever was cached. The galleries are read one country
+        at a time through the (country_name, _id) index, and the pages are
+        written in batches, so only a batch of pages is held in memory.
+
+        Args:
+            countries (list): All countries in the database.
+
+        Returns:
+            int: The number of entries written.
+        """
+        if not self.storage.reachable():
+            print("Image storage not reachable, skipping images")
+            return 0
+
+        names = [country["country_name"] for country in countries]
+        generations = self.cache_manager.incr_many(
+            [images_generation_key(name) for name in names]
+        )
+        if generations is None:
+            return 0
+
+        written = 0
+        pages = {}
+        for name, generation in zip(names, generations):
+            # One more than a page tells if there is a next page
+            documents = self.db_manager.get_images(name, IMAGES_PAGE_SIZE + 1)
+            page = documents[:IMAGES_PAGE_SIZE]
+            images = []
+            for image in page:
+                try:
+                    file = self.storage.get(image_key(name, image["image_id"]))
+                except FileNotFoundError:
+                    continue
+                images.append(
+                    {
+                        "image_id": image["image_id"],
+                        "title": image["title"],
+                        "description": image["description"],
+                        "file": base64.b64encode(file).decode("utf-8"),
+                    }
+                )
+            next_cursor = (
+                str(page[-1]["_id"]) if len(documents) > IMAGES_PAGE_SIZE else None
+            )
+            pages[images_page_key(name, generation, IMAGES_PAGE_SIZE)] = json.dumps(
+                {"images": images, "next_cursor": next_cursor}
+            )
+            if len(pages) >= self.batch_size:
+                self.cache_manager.set_many(pages)
+                written += len(pages)
+                pages = {}
+
+        if pages:
+            self.cache_manager.set_many(pages)
+            written += len(pages)
+        return written
+
+    def warm(self) -> dict:
+        """
+        Warm all cache entries.
+
+        Returns:
+            dict: The number of entries written per kind.
+        """
+        countries = self.db_manager.get_countries(0, "country_name", 1)
+
+        return {
+            "country": self.warm_country_details(countries),
+            "images": self.warm_images(countries),
+        }
@@ -2,16 +2,24 @@ import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { useParams, useNavigate } from 'react-router-dom';
 
+const IMAGES_PAGE_SIZE = 20;
+const JOB_POLL_INTERVAL_MS = 500;
+const JOB_POLL_ATTEMPTS = 60;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 const CountryDetailsPage = () => {
   const { countryName } = useParams();
   const navigate = useNavigate();
 
   const [countryInfo, setCountryInfo] = useState(null);
   const [images, setImages] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState({
     info: false,
     images: false,
     upload: false,
+    more: false,
   });
   const [error, setError] = useState({
     info: null,
@@ -54,15 +62,29 @@ const CountryDetailsPage = () => {
     fetchCountryInfo();
   }, [apiUrl, countryName]);
 
-  // Fetch country images
+  // Fetch a page of country images; without a cursor, the first page
+  const fetchImagesPage = async (cursor = null) => {
+    const params = { limit: IMAGES_PAGE_SIZE };
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    const response = await axios.get(`${apiUrl}/countries/${countryName}/images`, { params });
+    return {
+      images: response.data.images || [],
+      nextCursor: response.data.next_cursor || null,
+    };
+  };
+
+  // Fetch the first page of country images
   useEffect(() => {
     const fetchCountryImages = async () => {
       setLoading((prev) => ({ ...prev, images: true }));
       setError((prev) => ({ ...prev, images: null }));
 
       try {
-        const response = await axios.get(`${apiUrl}/countries/${countryName}/images`);
-        setImages(response.data.images || []);
+        const page = await fetchImagesPage();
+        setImages(page.images);
+        setNextCursor(page.nextCursor);
       } catch (err) {
         setError((prev) => ({ ...prev, images: 'Failed to fetch country images' }));
         console.error('Error fetching country images:', err);
@@ -72,8 +94,42 @@ const CountryDetailsPage = () => {
     };
 
     fetchCountryImages();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [apiUrl, countryName]);
 
+  // Append the next page of country images
+  const loadMoreImages = async () => {
+    setLoading((prev) => ({ ...prev, more: true }));
+    setError((prev) => ({ ...prev, images: null }));
+
+    try {
+      const page = await fetchImagesPage(nextCursor);
+      setImages((prev) => [...prev, ...page.images]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      setError((prev) => ({ ...prev, images: 'Failed to fetch more images' }));
+      console.error('Error fetching more images:', err);
+    } finally {
+      setLoading((prev) => ({ ...prev, more: false }));
+    }
+  };
+
+  // Wait for the background processing of an upload to finish
+  const waitForJob = async (jobId) => {
+    for (let attempt = 0; attempt < JOB_POLL_ATTEMPTS; attempt++) {
+      const response = await axios.get(`${apiUrl}/jobs/${jobId}`);
+      const { state, error } = response.data.job;
+      if (state === 'succeeded') {
+        return;
+      }
+      if (state === 'failed') {
+        throw new Error(error);
+      }
+      await sleep(JOB_POLL_INTERVAL_MS);
+    }
+    throw new Error('Image processing timed out');
+  };
+
   // Handle image upload
   const handleImageUpload = async (e) => {
     e.preventDefault();
@@ -91,15 +147,19 @@ const CountryDetailsPage = () => {
       setLoading((prev) => ({ ...prev, upload: true }));
       setError((prev) => ({ ...prev, upload: null }));
 
-      await axios.post(`${apiUrl}/countries/${countryName}/images`, formData, {
+      // The key makes a retried upload return the first upload's job
+      const response = await axios.post(`${apiUrl}/countries/${countryName}/images`, formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
+          'Idempotency-Key': crypto.randomUUID(),
         },
       });
+      await waitForJob(response.data.job_id);
 
-      // Refresh images after upload
-      const response = await axios.get(`${apiUrl}/countries/${countryName}/images`);
-      setImages(response.data.images || []);
+      // Refresh images after upload, starting over from the first page
+      const page = await fetchImagesPage();
+      setImages(page.images);
+      setNextCursor(page.nextCursor);
       setNewImage(null);
       setNewImageTitle('');
       setNewImageDescription('');
@@ -220,6 +280,13 @@ const CountryDetailsPage = () => {
                 <p>{image.description || 'No description available'}</p>
               </div>
             ))}
+            {nextCursor && (
+              <div style={{ width: '100%', textAlign: 'center' }}>
+                <button onClick={loadMoreImages} disabled={loading.more}>
+                  {loading.more ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </div>
         ) : (
           <div>No images available for {countryName}</div>
@@ -3,6 +3,23 @@ This module provides functions to interact with a Redis cache.
 It includes functions to set and get data in the cache.
 """
 
+import json
+import logging
+from typing import Callable, List, Optional
+
+from internal.metrics.registry import Counter
+
+logger = logging.getLogger(__name__)
+
+
+CACHE_TTL = 60 * 60 * 24  # 1 day
+
+CACHE_REQUESTS = Counter(
+    "countries_cache_requests_total",
+    "Cache operations, by operation and result (hit, miss, ok or error).",
+    ["operation", "result"],
+)
+
 
 class CacheManager:
     """
@@ -30,15 +47,43 @@ class CacheManager:
             bool: True if the operation was successful, False otherwise.
         """
         try:
-            self.client.set(key, value, ex=60 * 60 * 24)  # Set expiration to 1 day
+            self.client.set(key, value, ex=CACHE_TTL)
+            CACHE_REQUESTS.inc(operation="set", result="ok")
+            return True
+        except Exception as e:
+            CACHE_REQUESTS.inc(operation="set", result="error")
+            logger.error(f"Error setting data in cache: {e}")
+            return False
+
+    def set_many(self, items: dict, batch_size: int = 500) -> bool:
+        """
+        Set many values in Redis cache, pipelining the writes in batches.
+
+        Args:
+            items (dict): The values to be stored, by key.
+            batch_size (int): The number of writes sent per round trip.
+
+        Returns:
+            bool: True if the operation was successful, False otherwise.
+        """
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for index, (key, value) in enumerate(items.items(), start=1):
+                pipe.set(key, value, ex=CACHE_TTL)
+                if index % batch_size == 0:
+                    pipe.execute()
+            pipe.execute()
+            CACHE_REQUESTS.inc(operation="set_many", result="ok")
             return True
         except Exception as e:
-            print(f"Error setting data in cache: {e}")
+            CACHE_REQUESTS.inc(operation="set_many", result="error")
+            logger.error(f"Error setting data in cache: {e}")
             return False
 
     def set_dict_data(self, key: str, value: dict) -> bool:
         """
         Set a dictionary in Redis cache with a specified key and value.
+        Each value is stored JSON-encoded, so it keeps its type.
 
         Args:
             key (str): The key under which the dictionary will be stored.
@@ -48,10 +93,37 @@ class CacheManager:
             bool: True if the operation was successful, False otherwise.
         """
         try:
-            self.client.hset(key, mapping=value)
+            self.client.hset(key, mapping=self._encode_dict(value))
+            CACHE_REQUESTS.inc(operation="set_dict", result="ok")
             return True
         except Exception as e:
-            print(f"Error setting dictionary data in cache: {e}")
+            CACHE_REQUESTS.inc(operation="set_dict", result="error")
+            logger.error(f"Error setting dictionary data in cache: {e}")
+            return False
+
+    def set_dict_many(self, items: dict, batch_size: int = 500) -> bool:
+        """
+        Set many dictionaries in Redis cache, pipelining the writes in batches.
+
+        Args:
+            items (dict): The dictionaries to be stored, by key.
+            batch_size (int): The number of writes sent per round trip.
+
+        Returns:
+            bool: True if the operation was successful, False otherwise.
+        """
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for index, (key, value) in enumerate(items.items(), start=1):
+                pipe.hset(key, mapping=self._encode_dict(value))
+                if index % batch_size == 0:
+                    pipe.execute()
+            pipe.execute()
+            CACHE_REQUESTS.inc(operation="set_dict_many", result="ok")
+            return True
+        except Exception as e:
+            CACHE_REQUESTS.inc(operation="set_dict_many", result="error")
+            logger.error(f"Error setting dictionary data in cache: {e}")
             return False
 
     def get_dict_data(self, key: str) -> dict:
@@ -62,13 +134,17 @@ class CacheManager:
             key (str): The key for which the dictionary is to be retrieved.
 
         Returns:
-            dict: The dictionary associated with the key, or None if an error occurs.
+            dict: The dictionary associated with the key, or None if it is not
+                cached or an error occurs.
         """
         try:
-            value = self.client.hget(key)
+            value = self.client.hgetall(key)
+            value = self._decode_dict(value) if value else None
+            CACHE_REQUESTS.inc(operation="get_dict", result="hit" if value else "miss")
             return value
         except Exception as e:
-            print(f"Error getting dictionary data from cache: {e}")
+            CACHE_REQUESTS.inc(operation="get_dict", result="error")
+            logger.error(f"Error getting dictionary data from cache: {e}")
             return None
 
     def get_data(self, key: str) -> any:
@@ -83,7 +159,154 @@ class CacheManager:
         """
         try:
             value = self.client.get(key)
+            CACHE_REQUESTS.inc(
+                operation="get", result="miss" if value is None else "hit"
+            )
             return value
         except Exception as e:
-            print(f"Error getting data from cache: {e}")
+            CACHE_REQUESTS.inc(operation="get", result="error")
+            logger.error(f"Error getting data from cache: {e}")
             return None
+
+    def incr(self, key: str) -> int:
+        """
+        Atomically increment a counter in Redis cache. Counters don't expire.
+
+        Args:
+            key (str): The key of the counter.
+
+        Returns:
+            int: The new value, or None if an error occurs.
+        """
+        try:
+            value = self.client.incr(key)
+            CACHE_REQUESTS.inc(operation="incr", result="ok")
+            return value
+        except Exception as e:
+            CACHE_REQUESTS.inc(operation="incr", result="error")
+            logger.error(f"Error incrementing counter in cache: {e}")
+            return None
+
+    def incr_many(self, keys: list, batch_size: int = 500) -> list:
+        """
+        Atomically increment many counters, pipelining the increments in batches.
+
+        Args:
+            keys (list): The keys of the counters.
+            batch_size (int): The number of increments sent per round trip.
+
+        Returns:
+            list: The new values, or None if an error occurs.
+        """
+        try:
+            values = []
+            pipe = self.client.pipeline(transaction=False)
+            for index, key in enumerate(keys, start=1):
+                pipe.incr(key)
+                if index % batch_size == 0:
+                    values.extend(pipe.execute())
+            values.extend(pipe.execute())
+            CACHE_REQUESTS.inc(operation="incr_many", result="ok")
+            return values
+        except Exception as e:
+            CACHE_REQUESTS.inc(operation="incr_many", result="error")
+            logger.error(f"Error incrementing counters in cache: {e}")
+            return None
+
+    def set_sorted_views(self, records_key: str, records: dict, views: dict) -> bool:
+        """
+        Replace sorted sets whose members point at records in a hash.
+        The writes are sent as one transaction, so a reader sees either the old
+        or the new views; members and records that are not given anymore are
+        removed.
+
+        Args:
+            records_key (str): The key of the hash of the records.
+            records (dict): The records by name; each is stored JSON-encoded.
+            views (dict): The scores of the members of every sorted set, by key.
+
+        Returns:
+            bool: True if the operation was successful, False otherwise.
+        """
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key in views:
+                pipe.zrange(key, 0, -1)
+            pipe.hkeys(records_key)
+            *members, names = pipe.execute()
+
+            pipe = self.client.pipeline(transaction=True)
+            for (key, scores), current in zip(views.items(), members):
+                stale = [member for member in current if member not in scores]
+                if stale:
+                    pipe.zrem(key, *stale)
+                if scores:
+                    pipe.zadd(key, scores)
+                pipe.expire(key, CACHE_TTL)
+            stale = [name for name in names if name not in records]
+            if stale:
+                pipe.hdel(records_key, *stale)
+            if records:
+                pipe.hset(records_key, mapping=self._encode_dict(records))
+            pipe.expire(records_key, CACHE_TTL)
+            pipe.execute()
+            CACHE_REQUESTS.inc(operation="set_views", result="ok")
+            return True
+        except Exception as e:
+            CACHE_REQUESTS.inc(operation="set_views", result="error")
+            logger.error(f"Error setting sorted views in cache: {e}")
+            return False
+
+    def get_sorted_page(
+        self,
+        view_key: str,
+        records_key: str,
+        start: int,
+        stop: int,
+        desc: bool = False,
+        record_of: Callable[[str], str] = None,
+    ) -> Optional[List[dict]]:
+        """
+        Get a range of a sorted set view, as the records its members point at.
+
+        Args:
+            view_key (str): The key of the sorted set.
+            records_key (str): The key of the hash of the records.
+            start (int): The rank of the first member.
+            stop (int): The rank of the last member, -1 for the last one.
+            desc (bool): Rank the members from the highest score.
+            record_of (Callable[[str], str]): Maps a member to the name of its
+                record; the member is the name by default.
+
+        Returns:
+            Optional[List[dict]]: The records, or None if the view is not
+                cached, a record is missing or an error occurs.
+        """
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.zcard(view_key)
+            pipe.zrange(view_key, start, stop, desc=desc)
+            size, members = pipe.execute()
+            if not size:
+                CACHE_REQUESTS.inc(operation="get_view", result="miss")
+                return None
+
+            names = [record_of(member) if record_of else member for member in members]
+            values = self.client.hmget(records_key, names) if names else []
+            if any(value is None for value in values):
+                CACHE_REQUESTS.inc(operation="get_view", result="miss")
+                return None
+            CACHE_REQUESTS.inc(operation="get_view", result="hit")
+            return [json.loads(value) for value in values]
+        except Exception as e:
+            CACHE_REQUESTS.inc(operation="get_view", result="error")
+            logger.error(f"Error getting sorted view from cache: {e}")
+            return None
+
+    @staticmethod
+    def _encode_dict(value: dict) -> dict:
+        return {field: json.dumps(item, default=str) for field, item in value.items()}
+
+    @staticmethod
+    def _decode_dict(value: dict) -> dict:
+        return {field: json.loads(item) for field, item in value.items()}
@@ -2,10 +2,17 @@
 Redis client for connecting to a Redis server.
 This module provides a simple interface to connect to a Redis server using the redis-py library.
 It includes a connection to a Redis server running on localhost at port 6379.
+When REDIS_NODES lists several nodes, the keys are sharded over them instead.
+Connecting and every command time out after REDIS_SOCKET_TIMEOUT seconds, so a
+hung server fails the calls instead of blocking them.
 """
 
+import os
+
 import redis
 
+from internal.cache.sharding import ShardedRedis, parse_nodes
+
 
 class RedisClient:
     """
@@ -13,9 +20,41 @@ class RedisClient:
     It uses the redis-py library to establish the connection.
     """
 
-    def __init__(self, host="redis", port=6379, decode_responses=True):
+    def __init__(
+        self,
+        host="redis",
+        port=6379,
+        decode_responses=True,
+        nodes=None,
+        socket_timeout=None,
+    ):
+        """
+        Initialize the RedisClient.
+
+        Args:
+            host (str): The host of the Redis server.
+            port (int): The port of the Redis server.
+            decode_responses (bool): Decode the responses to strings.
+            nodes (str): Comma-separated host:port pairs of several Redis nodes
+                to shard the keys over; defaults to the REDIS_NODES variable.
+            socket_timeout (float): Seconds to connect or run a command;
+                defaults to the REDIS_SOCKET_TIMEOUT variable, or 2.
+        """
+        timeout = socket_timeout or float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))
+        nodes = parse_nodes(nodes or os.getenv("REDIS_NODES", ""))
+        if len(nodes) > 1:
+            self.redis_client = ShardedRedis.from_nodes(
+                nodes, decode_responses, socket_timeout=timeout
+            )
+            return
+        if nodes:
+            host, port = nodes[0]
         self.redis_client = redis.StrictRedis(
-            host=host, port=port, decode_responses=decode_responses
+            host=host,
+            port=port,
+            decode_responses=decode_responses,
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
         )
 
     def get_client(self):
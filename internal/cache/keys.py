@@ -0,0 +1,124 @@
+"""
+Builds the keys under which the API responses are cached.
+The backend and the data pipeline's cache warmer share these builders,
+so a warmed entry is exactly the entry the backend looks up.
+The keys of a country share the '{country name}' hash tag, so they are
+stored on the same node when the cache is sharded.
+"""
+
+from typing import List
+
+from internal.db.model import COUNTRY_FIELDS
+
+
+def _fields_suffix(fields: List[str] = None) -> str:
+    """
+    Key suffix of a field selection; empty for the default fields, so the
+    default views keep their keys.
+
+    Args:
+        fields (List[str]): The normalized field selection, or None.
+
+    Returns:
+        str: The key suffix.
+    """
+    if not fields or list(fields) == COUNTRY_FIELDS:
+        return ""
+    return f":fields={','.join(fields)}"
+
+
+def countries_key(
+    limit: int, sort_by: str, order_by: int, fields: List[str] = None, offset: int = 0
+) -> str:
+    """
+    Key of a list of countries.
+
+    Args:
+        limit (int): The maximum number of countries.
+        sort_by (str): The field to sort by.
+        order_by (int): The sort order.
+        fields (List[str]): The normalized field selection, None for the default.
+        offset (int): The number of countries skipped; lists from the start
+            keep their keys.
+
+    Returns:
+        str: The cache key.
+    """
+    return (
+        f"countries:limit={limit}:sort_by={sort_by}:order_by={order_by}"
+        f"{f':offset={offset}' if offset else ''}{_fields_suffix(fields)}"
+    )
+
+
+def countries_view_key(sort_by: str) -> str:
+    """
+    Key of the sorted set that orders the countries by a field.
+    The views and the records share the '{countries}' hash tag, so a page can
+    be read from one node.
+
+    Args:
+        sort_by (str): The field the countries are sorted by.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"countries:{{countries}}:view:{sort_by}"
+
+
+def countries_records_key() -> str:
+    """
+    Key of the hash of every country's record, by country name.
+
+    Returns:
+        str: The cache key.
+    """
+    return "countries:{countries}:records"
+
+
+def country_key(country_name: str, fields: List[str] = None) -> str:
+    """
+    Key of a country's details.
+
+    Args:
+        country_name (str): The name of the country.
+        fields (List[str]): The normalized field selection, None for the default.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"country:{{{country_name}}}{_fields_suffix(fields)}"
+
+
+def images_generation_key(country_name: str) -> str:
+    """
+    Key of the generation counter of a country's image gallery.
+    It is incremented on every upload, which retires the cached pages.
+
+    Args:
+        country_name (str): The name of the country.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"images:{{{country_name}}}:generation"
+
+
+def images_page_key(
+    country_name: str, generation: int, limit: int, cursor: str = None
+) -> str:
+    """
+    Key of a page of a country's image gallery.
+
+    Args:
+        country_name (str): The name of the country.
+        generation (int): The generation of the gallery.
+        limit (int): The page size.
+        cursor (str): The cursor the page starts after, None for the first page.
+
+    Returns:
+        str: The cache key.
+    """
+    return (
+        f"images:{{{country_name}}}:generation={generation}:limit={limit}"
+        f":cursor={cursor or ''}"
+    )
@@ -0,0 +1,348 @@
+"""
+Spreads the cache over several Redis nodes with consistent hashing.
+Every key is stored on one node, picked on a hash ring by the key's hash tag:
+the part between the first '{' and the following '}', as in Redis Cluster, or
+the whole key if it has none. Keys that share a tag, such as a country and the
+pages of its gallery, are stored on the same node, so they can be used together
+in a pipeline or a script. Adding a node only moves the keys of its share of
+the ring.
+"""
+
+import bisect
+import hashlib
+from typing import Dict, List, Tuple
+
+import redis
+
+# Commands whose first argument is their only key
+SINGLE_KEY_COMMANDS = frozenset(
+    [
+        "get",
+        "set",
+        "setex",
+        "getex",
+        "expire",
+        "pexpire",
+        "ttl",
+        "pttl",
+        "incr",
+        "incrby",
+        "decr",
+        "hset",
+        "hget",
+        "hgetall",
+        "hkeys",
+        "hmget",
+        "hdel",
+        "hincrby",
+        "rpush",
+        "rpushx",
+        "lpush",
+        "lrange",
+        "ltrim",
+        "llen",
+        "zadd",
+        "zrem",
+        "zcard",
+        "zscore",
+        "zrange",
+        "zrangebyscore",
+        "zrangebylex",
+    ]
+)
+
+
+def hash_tag(key: str) -> str:
+    """
+    The part of a key that selects its node.
+
+    Args:
+        key (str): The key.
+
+    Returns:
+        str: The hash tag of the key, or the key itself if it has none.
+    """
+    start = key.find("{")
+    if start != -1:
+        end = key.find("}", start + 1)
+        if end > start + 1:
+            return key[start + 1 : end]
+    return key
+
+
+def parse_nodes(nodes: str) -> List[Tuple[str, int]]:
+    """
+    Parse a list of Redis nodes such as 'redis-0:6379,redis-1:6379'.
+
+    Args:
+        nodes (str): Comma-separated host:port pairs; the port defaults to 6379.
+
+    Returns:
+        List[Tuple[str, int]]: The hosts and ports.
+
+    Raises:
+        ValueError: If a port is not a number.
+    """
+    parsed = []
+    for node in nodes.split(","):
+        node = node.strip()
+        if not node:
+            continue
+        host, _, port = node.partition(":")
+        parsed.append((host, int(port or 6379)))
+    return parsed
+
+
+class HashRing:
+    """
+    A consistent hash ring, with virtual points to balance the nodes.
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = 160):
+        """
+        Initialize the HashRing.
+
+        Args:
+            nodes (List[str]): The names of the nodes.
+            replicas (int): The virtual points of every node.
+
+        Raises:
+            ValueError: If there are no nodes.
+        """
+        if not nodes:
+            raise ValueError("The hash ring needs at least one node.")
+        points = sorted(
+            (self._hash(f"{node}#{index}"), node)
+            for node in nodes
+            for index in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def node(self, key: str) -> str:
+        """
+        The node that stores a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            str: The name of the node.
+        """
+        index = bisect.bisect(self._hashes, self._hash(hash_tag(key)))
+        return self._nodes[index % len(self._nodes)]
+
+
+class ShardedPipeline:
+    """
+    Queues commands like a Redis pipeline and sends them in one round trip
+    per node, returning the results in the order of the commands.
+    """
+
+    def __init__(self, sharded: "ShardedRedis", transaction: bool = False):
+        self.sharded = sharded
+        self.transaction = transaction
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        if name not in SINGLE_KEY_COMMANDS:
+            raise AttributeError(f"Unsupported command in a sharded pipeline: {name}")
+
+        def queue(key, *args, **kwargs):
+            self._commands.append((self.sharded.node(key), name, key, args, kwargs))
+            return self
+
+        return queue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._commands = []
+
+    def execute(self) -> list:
+        """
+        Send the queued commands. A transaction is only atomic per node.
+
+        Returns:
+            list: The results of the commands.
+        """
+        commands, self._commands = self._commands, []
+        by_node: Dict[str, List[int]] = {}
+        for index, (node, *_) in enumerate(commands):
+            by_node.setdefault(node, []).append(index)
+
+        results = [None] * len(commands)
+        for node, indexes in by_node.items():
+            pipe = self.sharded.clients[node].pipeline(transaction=self.transaction)
+            for index in indexes:
+                _, name, key, args, kwargs = commands[index]
+                getattr(pipe, name)(key, *args, **kwargs)
+            for index, result in zip(indexes, pipe.execute()):
+                results[index] = result
+        return results
+
+
+class ShardedScript:
+    """
+    A Lua script that runs on the node of its keys.
+    """
+
+    def __init__(self, sharded: "ShardedRedis", script: str):
+        self.sharded = sharded
+        self.script = script
+        self._scripts = {}
+
+    def __call__(self, keys: List[str] = (), args: List = (), client=None):
+        nodes = {self.sharded.node(key) for key in keys}
+        if len(nodes) != 1:
+            raise ValueError("The keys of a script must share one hash tag.")
+        node = nodes.pop()
+        if node not in self._scripts:
+            self._scripts[node] = self.sharded.clients[node].register_script(
+                self.script
+            )
+        return self._scripts[node](keys=keys, args=args)
+
+
+class ShardedRedis:
+    """
+    A Redis client that spreads the keys over several nodes.
+    It supports the single-key commands, the multi-key commands below,
+    pipelines and scripts.
+    """
+
+    def __init__(self, clients: Dict[str, redis.StrictRedis], replicas: int = 160):
+        """
+        Initialize the ShardedRedis.
+
+        Args:
+            clients (Dict[str, redis.StrictRedis]): A client per node, by a
+                stable node name such as 'host:port'.
+            replicas (int): The virtual points of every node on the hash ring.
+        """
+        self.clients = clients
+        self.ring = HashRing(list(clients), replicas)
+
+    @classmethod
+    def from_nodes(
+        cls,
+        nodes: List[Tuple[str, int]],
+        decode_responses: bool = True,
+        socket_timeout: float = None,
+    ) -> "ShardedRedis":
+        """
+        Connect to a list of Redis nodes.
+
+        Args:
+            nodes (List[Tuple[str, int]]): The hosts and ports, see parse_nodes.
+            decode_responses (bool): Decode the responses to strings.
+            socket_timeout (float): Seconds to connect or run a command, None
+                to wait forever.
+
+        Returns:
+            ShardedRedis: The client.
+        """
+        return cls(
+            {
+                f"{host}:{port}": redis.StrictRedis(
+                    host=host,
+                    port=port,
+                    decode_responses=decode_responses,
+                    socket_timeout=socket_timeout,
+                    socket_connect_timeout=socket_timeout,
+                )
+                for host, port in nodes
+            }
+        )
+
+    def node(self, key: str) -> str:
+        """
+        The node that stores a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            str: The name of the node.
+        """
+        return self.ring.node(key)
+
+    def client(self, key: str) -> redis.StrictRedis:
+        """
+        The client of the node that stores a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            redis.StrictRedis: The client.
+        """
+        return self.clients[self.node(key)]
+
+    def __getattr__(self, name: str):
+        if name not in SINGLE_KEY_COMMANDS:
+            raise AttributeError(f"Unsupported command on a sharded client: {name}")
+
+        def command(key, *args, **kwargs):
+            return getattr(self.client(key), name)(key, *args, **kwargs)
+
+        return command
+
+    def _group(self, keys: List[str]) -> Dict[str, List[int]]:
+        by_node: Dict[str, List[int]] = {}
+        for index, key in enumerate(keys):
+            by_node.setdefault(self.node(key), []).append(index)
+        return by_node
+
+    def mget(self, keys: List[str]) -> list:
+        """
+        Get many keys, with one round trip per node.
+        """
+        values = [None] * len(keys)
+        for node, indexes in self._group(keys).items():
+            found = self.clients[node].mget([keys[index] for index in indexes])
+            for index, value in zip(indexes, found):
+                values[index] = value
+        return values
+
+    def delete(self, *keys: str) -> int:
+        """
+        Delete keys, with one round trip per node.
+        """
+        return sum(
+            self.clients[node].delete(*[keys[index] for index in indexes])
+            for node, indexes in self._group(list(keys)).items()
+        )
+
+    def exists(self, *keys: str) -> int:
+        """
+        Count the existing keys, with one round trip per node.
+        """
+        return sum(
+            self.clients[node].exists(*[keys[index] for index in indexes])
+            for node, indexes in self._group(list(keys)).items()
+        )
+
+    def pipeline(self, transaction: bool = False) -> ShardedPipeline:
+        return ShardedPipeline(self, transaction)
+
+    def register_script(self, script: str) -> ShardedScript:
+        return ShardedScript(self, script)
+
+    def ping(self) -> bool:
+        """
+        Ping every node.
+
+        Returns:
+            bool: True if every node answered.
+        """
+        return all(client.ping() for client in self.clients.values())
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
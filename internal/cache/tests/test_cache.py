@@ -56,3 +56,70 @@ def test_get_data_failure():
     # Assert
     mock_client.get.assert_called_once_with("test_key")
     assert result is None
+
+
+def test_set_many_pipelines_writes():
+    # Arrange
+    mock_client = MagicMock()
+    pipe = mock_client.pipeline.return_value
+    cache_manager = CacheManager(client=mock_client)
+
+    # Act
+    result = cache_manager.set_many({"a": "1", "b": "2", "c": "3"}, batch_size=2)
+
+    # Assert
+    assert result is True
+    assert pipe.set.call_count == 3
+    assert pipe.execute.call_count == 2
+
+
+def test_dict_data_round_trip():
+    # Arrange
+    mock_client = MagicMock()
+    cache_manager = CacheManager(client=mock_client)
+
+    # Act
+    cache_manager.set_dict_data("test_key", {"population": 1000, "region": "A"})
+    mock_client.hgetall.return_value = mock_client.hset.call_args.kwargs["mapping"]
+    result = cache_manager.get_dict_data("test_key")
+
+    # Assert
+    assert result == {"population": 1000, "region": "A"}
+
+
+def test_get_dict_data_missing():
+    # Arrange
+    mock_client = MagicMock()
+    mock_client.hgetall.return_value = {}
+    cache_manager = CacheManager(client=mock_client)
+
+    # Act
+    result = cache_manager.get_dict_data("test_key")
+
+    # Assert
+    assert result is None
+
+
+def test_incr_many_pipelines_increments():
+    # Arrange
+    mock_client = MagicMock()
+    pipe = mock_client.pipeline.return_value
+    pipe.execute.side_effect = [[1, 2], [3]]
+    cache_manager = CacheManager(client=mock_client)
+
+    # Act
+    result = cache_manager.incr_many(["a", "b", "c"], batch_size=2)
+
+    # Assert
+    assert result == [1, 2, 3]
+    assert pipe.incr.call_count == 3
+
+
+def test_incr_failure():
+    # Arrange
+    mock_client = MagicMock()
+    mock_client.incr.side_effect = Exception("Redis error")
+    cache_manager = CacheManager(client=mock_client)
+
+    # Act & Assert
+    assert cache_manager.incr("a") is None
@@ -9,11 +9,17 @@ def test_redis_client_initialization(mock_strict_redis):
     mock_strict_redis.return_value = mock_redis_instance
 
     # Act
-    client = RedisClient(host="test_host", port=1234, decode_responses=False)
+    client = RedisClient(
+        host="test_host", port=1234, decode_responses=False, socket_timeout=0.5
+    )
 
     # Assert
     mock_strict_redis.assert_called_once_with(
-        host="test_host", port=1234, decode_responses=False
+        host="test_host",
+        port=1234,
+        decode_responses=False,
+        socket_timeout=0.5,
+        socket_connect_timeout=0.5,
     )
     assert client.redis_client == mock_redis_instance
 
@@ -0,0 +1,157 @@
+import shutil
+import socket
+import subprocess
+import time
+from unittest.mock import patch
+
+import pytest
+import redis
+
+from benchmarks.fakes import FakeRedis
+from internal.cache.cache import CacheManager
+from internal.cache.client import RedisClient
+from internal.cache.keys import country_key, images_generation_key, images_page_key
+from internal.cache.sharding import HashRing, ShardedRedis, hash_tag, parse_nodes
+
+
+def _sharded(count: int = 3) -> ShardedRedis:
+    return ShardedRedis({f"node-{index}": FakeRedis() for index in range(count)})
+
+
+def test_hash_tag():
+    assert hash_tag("country:{France}") == "France"
+    assert hash_tag("images:{France}:generation=1") == "France"
+    assert hash_tag("countries:limit=10") == "countries:limit=10"
+    assert hash_tag("empty:{}:tag") == "empty:{}:tag"
+
+
+def test_parse_nodes():
+    assert parse_nodes("redis-0:6379, redis-1:6380,redis-2") == [
+        ("redis-0", 6379),
+        ("redis-1", 6380),
+        ("redis-2", 6379),
+    ]
+
+
+def test_adding_a_node_moves_only_its_share_of_the_keys():
+    # Arrange
+    keys = [f"country:{{Country{index}}}" for index in range(3000)]
+    ring = HashRing(["a", "b", "c"])
+    grown = HashRing(["a", "b", "c", "d"])
+
+    # Act
+    before = {key: ring.node(key) for key in keys}
+    after = {key: grown.node(key) for key in keys}
+
+    # Assert: every node gets a fair share, and keys only move to the new node
+    shares = [list(before.values()).count(node) for node in "abc"]
+    assert min(shares) > 700
+    moved = [key for key in keys if before[key] != after[key]]
+    assert all(after[key] == "d" for key in moved)
+    assert 500 < len(moved) < 1000
+
+
+def test_keys_of_a_country_share_a_node():
+    # Arrange
+    sharded = _sharded()
+    keys = [
+        country_key("France"),
+        country_key("France", ["capital"]),
+        images_generation_key("France"),
+        images_page_key("France", 3, 20, "abc"),
+    ]
+
+    # Act
+    nodes = {sharded.node(key) for key in keys}
+
+    # Assert
+    assert len(nodes) == 1
+
+
+def test_pipeline_is_split_by_node_and_keeps_the_order():
+    # Arrange
+    sharded = _sharded()
+    cache_manager = CacheManager(sharded)
+    items = {f"key{index}": f"value{index}" for index in range(100)}
+
+    # Act
+    cache_manager.set_many(items, batch_size=7)
+    generations = cache_manager.incr_many(["a", "b", "a", "c", "a"])
+
+    # Assert
+    assert generations == [1, 1, 2, 1, 3]
+    assert all(cache_manager.get_data(key) == value for key, value in items.items())
+    sizes = [client.exists(*items) for client in sharded.clients.values()]
+    assert all(size > 10 for size in sizes)
+    assert sharded.delete(*items) == 100
+    assert sharded.exists(*items) == 0
+
+
+def test_unsupported_command_fails():
+    with pytest.raises(AttributeError):
+        _sharded().keys("*")
+
+
+@patch.dict("os.environ", {"REDIS_NODES": "redis-0:6379,redis-1:6379"})
+def test_redis_client_shards_over_redis_nodes():
+    # Act
+    client = RedisClient().get_client()
+
+    # Assert
+    assert isinstance(client, ShardedRedis)
+    assert sorted(client.clients) == ["redis-0:6379", "redis-1:6379"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def redis_nodes():
+    if shutil.which("redis-server") is None:
+        pytest.skip("redis-server is not installed")
+    ports = [_free_port() for _ in range(3)]
+    servers = [
+        subprocess.Popen(
+            ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"],
+            stdout=subprocess.DEVNULL,
+        )
+        for port in ports
+    ]
+    try:
+        for port in ports:
+            client = redis.StrictRedis(port=port)
+            for _ in range(100):
+                try:
+                    client.ping()
+                    break
+                except redis.ConnectionError:
+                    time.sleep(0.05)
+        yield ",".join(f"127.0.0.1:{port}" for port in ports)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+def test_sharded_cache_against_redis_servers(redis_nodes):
+    # Arrange
+    sharded = RedisClient(nodes=redis_nodes).get_client()
+    cache_manager = CacheManager(sharded)
+    countries = {country_key(f"Country{index}"): {"n": index} for index in range(50)}
+    script = sharded.register_script("return redis.call('INCRBY', KEYS[1], ARGV[1])")
+
+    # Act
+    cache_manager.set_dict_many(countries)
+    cache_manager.set_many({f"view{index}": str(index) for index in range(50)})
+
+    # Assert
+    assert sharded.ping()
+    assert cache_manager.get_dict_data(country_key("Country7")) == {"n": 7}
+    assert sharded.mget(["view3", "missing", "view42"]) == ["3", None, "42"]
+    assert script(keys=[images_generation_key("Country7")], args=[5]) == 5
+    assert all(client.dbsize() > 0 for client in sharded.clients.values())
+    with pytest.raises(ValueError):
+        script(keys=[f"key{index}" for index in range(20)], args=[1])
@@ -0,0 +1,63 @@
+"""
+This module contains tests for the internal.cache.views module.
+"""
+
+from benchmarks.fakes import FakeRedis
+from internal.cache.cache import CacheManager
+from internal.cache.keys import countries_records_key, countries_view_key
+from internal.cache.views import build_views, member_name, view_range
+
+COUNTRIES = [
+    {"country_name": "Chad", "region": "Africa", "population": 3, "area": 9},
+    {"country_name": "Aruba", "region": "Americas", "population": 1, "area": None},
+    {"country_name": "Benin", "region": "Africa", "population": 2, "area": 5},
+]
+
+
+def page(cache_manager, sort_by, offset=0, limit=0, desc=False):
+    start, stop = view_range(offset, limit)
+    records = cache_manager.get_sorted_page(
+        countries_view_key(sort_by),
+        countries_records_key(),
+        start,
+        stop,
+        desc=desc,
+        record_of=member_name,
+    )
+    return None if records is None else [r["country_name"] for r in records]
+
+
+def test_views_serve_any_page():
+    # Arrange
+    cache_manager = CacheManager(FakeRedis())
+
+    # Act
+    assert cache_manager.set_sorted_views(
+        countries_records_key(), *build_views(COUNTRIES)
+    )
+
+    # Assert
+    assert page(cache_manager, "country_name") == ["Aruba", "Benin", "Chad"]
+    assert page(cache_manager, "population", limit=2, desc=True) == ["Chad", "Benin"]
+    assert page(cache_manager, "region", offset=1, limit=1) == ["Chad"]
+    # A missing value sorts first, as in MongoDB
+    assert page(cache_manager, "area") == ["Aruba", "Benin", "Chad"]
+    assert page(cache_manager, "area", offset=5, limit=2) == []
+
+
+def test_views_drop_removed_countries():
+    # Arrange
+    client = FakeRedis()
+    cache_manager = CacheManager(client)
+    cache_manager.set_sorted_views(countries_records_key(), *build_views(COUNTRIES))
+
+    # Act
+    cache_manager.set_sorted_views(countries_records_key(), *build_views(COUNTRIES[:2]))
+
+    # Assert
+    assert page(cache_manager, "region") == ["Chad", "Aruba"]
+    assert client.hkeys(countries_records_key()) == ["Chad", "Aruba"]
+
+
+def test_missing_view_is_a_miss():
+    assert page(CacheManager(FakeRedis()), "population") is None
@@ -0,0 +1,91 @@
+"""
+Sorted set views of the countries.
+The data pipeline publishes a sorted set per sort field and a hash of the
+countries' records, and the backend reads any page of the countries, in any
+order, with a ZRANGE of a view and an HMGET of the records it points at.
+Numeric fields are the scores of their view, with -inf for a missing value so
+that it sorts first, as in MongoDB. Text fields are ordered lexicographically:
+every member of their view has the score 0 and starts with the field's value.
+"""
+
+from typing import Iterable, Tuple
+
+from internal.cache.keys import countries_view_key
+from internal.db.model import SELECTABLE_COUNTRY_FIELDS
+
+NUMERIC_VIEW_FIELDS = ["population", "area", "population_density"]
+TEXT_VIEW_FIELDS = ["country_name", "region"]
+VIEW_FIELDS = TEXT_VIEW_FIELDS + NUMERIC_VIEW_FIELDS
+
+# Separates the value of a text field from the country name in a member
+SEPARATOR = "\x00"
+
+
+def view_member(country: dict, sort_by: str) -> Tuple[str, float]:
+    """
+    The member of a country in a view and its score.
+
+    Args:
+        country (dict): The country.
+        sort_by (str): The field of the view.
+
+    Returns:
+        Tuple[str, float]: The member and its score.
+    """
+    name = country["country_name"]
+    value = country.get(sort_by)
+    if sort_by in NUMERIC_VIEW_FIELDS:
+        return name, float("-inf") if value is None else float(value)
+    if sort_by == "country_name":
+        return name, 0.0
+    return f"{value or ''}{SEPARATOR}{name}", 0.0
+
+
+def member_name(member: str) -> str:
+    """
+    The name of the country of a member of a view.
+
+    Args:
+        member (str): The member.
+
+    Returns:
+        str: The country name.
+    """
+    return member.rpartition(SEPARATOR)[2]
+
+
+def build_views(countries: Iterable[dict]) -> Tuple[dict, dict]:
+    """
+    Build the records and the views of the countries.
+
+    Args:
+        countries (Iterable[dict]): The countries.
+
+    Returns:
+        Tuple[dict, dict]: The records by country name, and the scores of
+            every view's members by key.
+    """
+    records = {}
+    views = {countries_view_key(field): {} for field in VIEW_FIELDS}
+    for country in countries:
+        records[country["country_name"]] = {
+            field: country.get(field) for field in SELECTABLE_COUNTRY_FIELDS
+        }
+        for field in VIEW_FIELDS:
+            member, score = view_member(country, field)
+            views[countries_view_key(field)][member] = score
+    return records, views
+
+
+def view_range(offset: int, limit: int) -> Tuple[int, int]:
+    """
+    The ranks of the first and last members of a page.
+
+    Args:
+        offset (int): The number of countries skipped.
+        limit (int): The number of countries, 0 for all of them.
+
+    Returns:
+        Tuple[int, int]: The start and stop ranks, as taken by ZRANGE.
+    """
+    return offset, offset + limit - 1 if limit else -1
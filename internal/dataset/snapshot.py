@@ -0,0 +1,209 @@
+"""
+A compact, memory-mappable snapshot of the served country data.
+The data pipeline publishes it after every load, and the backend serves the
+country endpoints from it while MongoDB is down or still warming up.
+
+The file is little-endian binary:
+
+- a header: magic, format version, number of countries, creation time, size
+  and SHA-256 digest of the body;
+- for every sort field, the indexes of the records in ascending order, as
+  32-bit integers, with missing values first as in MongoDB;
+- the offsets of the records, as 64-bit integers, one more than there are
+  records;
+- the records, JSON-encoded, ordered by country name.
+
+A reader maps the file, checks its digest once on opening, hashing the mapped
+pages in place, and then decodes only the records it returns.
+"""
+
+import hashlib
+import json
+import mmap
+import struct
+import time
+from typing import Iterable, List, Optional
+
+from internal.db.model import SELECTABLE_COUNTRY_FIELDS, SORT_FIELDS
+
+MAGIC = b"CTRYSNAP"
+
+# Incremented on every incompatible change of the layout
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sHHIdQ32s")
+INDEX = struct.Struct("<I")
+OFFSET = struct.Struct("<Q")
+
+
+def _sort_key(value) -> tuple:
+    # Missing values first, as MongoDB sorts null before numbers and strings
+    return (0,) if value is None else (1, value)
+
+
+def encode_dataset(countries: Iterable[dict], created_at: float = None) -> bytes:
+    """
+    Encode the countries as a snapshot.
+
+    Args:
+        countries (Iterable[dict]): The countries; the selectable fields are kept.
+        created_at (float): The time of the data, now by default.
+
+    Returns:
+        bytes: The snapshot.
+    """
+    records = sorted(
+        (
+            {field: country.get(field) for field in SELECTABLE_COUNTRY_FIELDS}
+            for country in countries
+        ),
+        key=lambda record: record["country_name"],
+    )
+    encoded = [
+        json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+        for record in records
+    ]
+
+    body = bytearray()
+    for field in SORT_FIELDS:
+        # Stable, so ties stay ordered by name
+        order = sorted(
+            range(len(records)), key=lambda index: _sort_key(records[index][field])
+        )
+        for index in order:
+            body += INDEX.pack(index)
+    offset = 0
+    for record in encoded:
+        body += OFFSET.pack(offset)
+        offset += len(record)
+    body += OFFSET.pack(offset)
+    for record in encoded:
+        body += record
+
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        0,
+        len(records),
+        time.time() if created_at is None else created_at,
+        len(body),
+        hashlib.sha256(body).digest(),
+    )
+    return header + bytes(body)
+
+
+class DatasetSnapshot:
+    """
+    Reads a snapshot through a memory map of its file.
+    """
+
+    def __init__(self, path: str, source_version: str = None):
+        """
+        Open a snapshot and check its header and digest.
+
+        Args:
+            path (str): The path of the file.
+            source_version (str): The version of the storage object the file
+                was read from.
+
+        Raises:
+            ValueError: If the file is not a snapshot of a supported format
+                version, or is corrupt.
+        """
+        self.source_version = source_version
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._check()
+        except Exception:
+            self._map.close()
+            raise
+
+    def _check(self):
+        if len(self._map) < HEADER.size:
+            raise ValueError("Not a dataset snapshot.")
+        magic, version, _, count, created_at, size, digest = HEADER.unpack_from(
+            self._map
+        )
+        if magic != MAGIC:
+            raise ValueError("Not a dataset snapshot.")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported dataset snapshot version: {version}.")
+        if len(self._map) != HEADER.size + size:
+            raise ValueError("Truncated dataset snapshot.")
+        # Hashed through a view, as a slice of the map would copy the body
+        with memoryview(self._map) as view, view[HEADER.size :] as body:
+            if hashlib.sha256(body).digest() != digest:
+                raise ValueError("Corrupt dataset snapshot.")
+
+        self.count = count
+        self.created_at = created_at
+        self.version = digest.hex()[:16]
+        self._orders = HEADER.size
+        self._offsets = self._orders + len(SORT_FIELDS) * count * INDEX.size
+        self._records = self._offsets + (count + 1) * OFFSET.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        self._map.close()
+
+    def _record(self, index: int) -> dict:
+        position = self._offsets + index * OFFSET.size
+        start = OFFSET.unpack_from(self._map, position)[0]
+        end = OFFSET.unpack_from(self._map, position + OFFSET.size)[0]
+        return json.loads(self._map[self._records + start : self._records + end])
+
+    def get_countries(
+        self, limit: int, sort_by: str, order_by: int, offset: int = 0
+    ) -> List[dict]:
+        """
+        Get a page of the countries.
+
+        Args:
+            limit (int): The maximum number of countries, 0 for all of them.
+            sort_by (str): The field to sort by.
+            order_by (int): 1 for ascending and -1 for descending.
+            offset (int): The number of countries to skip.
+
+        Returns:
+            List[dict]: The countries.
+
+        Raises:
+            ValueError: If the countries can't be sorted by the field.
+        """
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"Invalid sort field: {sort_by}.")
+        start = offset
+        stop = self.count if not limit else min(offset + limit, self.count)
+        order = self._orders + SORT_FIELDS.index(sort_by) * self.count * INDEX.size
+        countries = []
+        for rank in range(start, stop):
+            if order_by == -1:
+                rank = self.count - 1 - rank
+            index = INDEX.unpack_from(self._map, order + rank * INDEX.size)[0]
+            countries.append(self._record(index))
+        return countries
+
+    def get_country(self, country_name: str) -> Optional[dict]:
+        """
+        Get a country by name, with a binary search of the records.
+
+        Args:
+            country_name (str): The name of the country.
+
+        Returns:
+            Optional[dict]: The country, or None if it is not in the snapshot.
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            record = self._record(middle)
+            if record["country_name"] < country_name:
+                low = middle + 1
+            elif record["country_name"] > country_name:
+                high = middle
+            else:
+                return record
+        return None
@@ -0,0 +1,85 @@
+"""
+This module contains tests for the internal.dataset.snapshot module.
+"""
+
+import struct
+
+import pytest
+
+from internal.dataset.snapshot import HEADER, DatasetSnapshot, encode_dataset
+
+COUNTRIES = [
+    {"country_name": "Chad", "region": "Africa", "population": 3, "area": 9},
+    {"country_name": "Aruba", "region": "Americas", "population": 1, "area": None},
+    {"country_name": "Benin", "region": "Africa", "population": 2, "area": 5},
+]
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = tmp_path / "countries.bin"
+    path.write_bytes(encode_dataset(COUNTRIES, created_at=1700000000.0))
+    return path
+
+
+def names(countries):
+    return [country["country_name"] for country in countries]
+
+
+def test_snapshot_pages(snapshot_path):
+    # Arrange
+    snapshot = DatasetSnapshot(str(snapshot_path))
+
+    # Act & Assert
+    assert len(snapshot) == 3
+    assert snapshot.created_at == 1700000000.0
+    assert names(snapshot.get_countries(0, "country_name", 1)) == [
+        "Aruba",
+        "Benin",
+        "Chad",
+    ]
+    assert names(snapshot.get_countries(2, "population", -1)) == ["Chad", "Benin"]
+    assert names(snapshot.get_countries(1, "region", 1, offset=1)) == ["Chad"]
+    # A missing value sorts first, as in MongoDB
+    assert names(snapshot.get_countries(0, "area", 1)) == ["Aruba", "Benin", "Chad"]
+    assert snapshot.get_countries(5, "area", 1, offset=3) == []
+    with pytest.raises(ValueError):
+        snapshot.get_countries(1, "capital", 1)
+
+
+def test_snapshot_lookup(snapshot_path):
+    snapshot = DatasetSnapshot(str(snapshot_path))
+
+    assert snapshot.get_country("Benin")["area"] == 5
+    assert snapshot.get_country("Benin")["capital"] is None
+    assert snapshot.get_country("Atlantis") is None
+
+
+def test_snapshot_version_follows_the_data(snapshot_path, tmp_path):
+    other = tmp_path / "other.bin"
+    other.write_bytes(encode_dataset(COUNTRIES[:2]))
+
+    assert DatasetSnapshot(str(snapshot_path)).version != (
+        DatasetSnapshot(str(other)).version
+    )
+
+
+def test_invalid_snapshots_are_rejected(snapshot_path):
+    # Arrange
+    data = bytearray(snapshot_path.read_bytes())
+
+    # Act & Assert: a flipped byte, an unknown format version and a truncation
+    corrupt = data[:-1] + b"!"
+    snapshot_path.write_bytes(bytes(corrupt))
+    with pytest.raises(ValueError, match="Corrupt"):
+        DatasetSnapshot(str(snapshot_path))
+
+    newer = data[:]
+    struct.pack_into("<H", newer, 8, 99)
+    snapshot_path.write_bytes(bytes(newer))
+    with pytest.raises(ValueError, match="version"):
+        DatasetSnapshot(str(snapshot_path))
+
+    snapshot_path.write_bytes(bytes(data[: HEADER.size + 4]))
+    with pytest.raises(ValueError, match="Truncated"):
+        DatasetSnapshot(str(snapshot_path))
@@ -4,14 +4,38 @@ Contains the core functionality of the database.
 
 import sys
 import os
+from functools import wraps
 from typing import List
 
+from bson import ObjectId
+from pymongo import MongoClient, ReturnDocument, UpdateOne
 from pymongo.cursor import Cursor
 
 # Add the project root directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from internal.db.setup import NoSQLBackend
+from internal.metrics.registry import Histogram
+
+
+MONGO_LATENCY = Histogram(
+    "countries_mongo_operation_duration_seconds",
+    "Latency of the MongoDB operations, by method.",
+    ["method"],
+)
+
+
+def _timed(f):
+    """
+    Record the latency of a database method in MONGO_LATENCY.
+    """
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        with MONGO_LATENCY.time(method=f.__name__):
+            return f(*args, **kwargs)
+
+    return wrapper
 
 
 class NoSQLDatabaseManager(NoSQLBackend):
@@ -21,9 +45,10 @@ class NoSQLDatabaseManager(NoSQLBackend):
 
     KEY_COUNTRY = "country_name"
 
-    def __init__(self, connection_string: str):
-        super().__init__(connection_string)
+    def __init__(self, connection_string: str, client: MongoClient = None):
+        super().__init__(connection_string, client)
 
+    @_timed
     def add_country(self, key: str, value: dict) -> object:
         """
         Add a country to the NoSQL database.
@@ -37,6 +62,7 @@ class NoSQLDatabaseManager(NoSQLBackend):
         """
         return self.db.countries.insert_one({self.KEY_COUNTRY: key, **value})
 
+    @_timed
     def update_country(self, key: str, value: dict) -> object:
         """
         Update a country in the NoSQL database.
@@ -50,7 +76,15 @@ class NoSQLDatabaseManager(NoSQLBackend):
         """
         return self.db.countries.update_one({self.KEY_COUNTRY: key}, {"$set": value})
 
-    def get_countries(self, limit: int, sort_by: str, order_by: int) -> List[Cursor]:
+    @_timed
+    def get_countries(
+        self,
+        limit: int,
+        sort_by: str,
+        order_by: int,
+        fields: List[str] = None,
+        offset: int = 0,
+    ) -> List[Cursor]:
         """
         Get a list of countries from the NoSQL database.
 
@@ -58,45 +92,322 @@ class NoSQLDatabaseManager(NoSQLBackend):
             limit: maximum number of countries to return
             sort_by: field to sort by
             order_by: sort order - asc or desc
+            fields: fields to return, None for the whole documents
+            offset: number of countries to skip
 
         Returns:
             countries: list of countries
         """
-        return list(self.db.countries.find().limit(limit).sort(sort_by, order_by))
+        return list(
+            self.db.countries.find({}, self._projection(fields))
+            .skip(offset)
+            .limit(limit)
+            .sort(sort_by, order_by)
+        )
 
-    def get_country(self, key: str) -> dict:
+    @_timed
+    def get_country(self, key: str, fields: List[str] = None) -> dict:
         """
         Get a country from the NoSQL database.
 
         Args:
             key: key of the country - name of the country
+            fields: fields to return, None for the whole document
 
         Returns:
             country: country object
         """
-        return self.db.countries.find_one({self.KEY_COUNTRY: key})
+        return self.db.countries.find_one(
+            {self.KEY_COUNTRY: key}, self._projection(fields)
+        )
+
+    @staticmethod
+    def _projection(fields: List[str] = None) -> dict:
+        """
+        Build the projection that returns only the given fields.
 
+        Args:
+            fields: fields to return, None for all of them
+
+        Returns:
+            projection: the projection, or None
+        """
+        if not fields:
+            return None
+        return {"_id": 0, **{field: 1 for field in fields}}
+
+    @_timed
     def add_image(self, key: str, value: dict) -> object:
         """
         Add an image to the NoSQL database.
+        Adding the same image again is a no-op, so the write can be retried.
 
         Args:
-            key: key of the country - name of the country
+            key: key of the image - id of the image
             value: value of the image - image object
 
+        Returns:
+            result: result of the upsert operation
+        """
+        return self.db.images.update_one(
+            {"image_id": key},
+            {"$setOnInsert": {self.KEY_COUNTRY: key, **value}},
+            upsert=True,
+        )
+
+    @_timed
+    def add_images(self, images: List[dict]) -> object:
+        """
+        Add many images to the NoSQL database in one round trip.
+
+        Args:
+            images: the image objects, each with its image_id and country_name
+
         Returns:
             result: result of the insert operation
         """
-        return self.db.images.insert_one({self.KEY_COUNTRY: key, **value})
+        return self.db.images.insert_many([dict(image) for image in images])
 
-    def get_images(self, key: str) -> List[Cursor]:
+    @_timed
+    def get_images(
+        self, key: str, limit: int = 0, after: ObjectId = None
+    ) -> List[Cursor]:
         """
-        Get a list of images from the NoSQL database.
+        Get a page of images from the NoSQL database, in upload order.
+        The (country_name, _id) index serves the query and the sort.
 
         Args:
             key: key of the country - name of the country
+            limit: maximum number of images to return, 0 for all
+            after: return only the images uploaded after the image with this _id
 
         Returns:
             images: list of images
         """
-        return list(self.db.images.find({self.KEY_COUNTRY: key}))
+        query = {self.KEY_COUNTRY: key}
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        return list(self.db.images.find(query).sort("_id", 1).limit(limit))
+
+    @_timed
+    def add_job(self, job: dict) -> object:
+        """
+        Add a background job to the NoSQL database.
+
+        Args:
+            job: the job, with a unique job_id and an optional idempotency_key
+
+        Returns:
+            result: result of the insert operation
+
+        Raises:
+            DuplicateKeyError: if a job with the same idempotency key exists
+        """
+        return self.db.jobs.insert_one(dict(job))
+
+    @_timed
+    def get_job(self, job_id: str = None, idempotency_key: str = None) -> dict:
+        """
+        Get a background job by id or by idempotency key.
+
+        Args:
+            job_id: id of the job
+            idempotency_key: idempotency key the job was submitted with
+
+        Returns:
+            job: the job, or None
+        """
+        query = {"job_id": job_id} if job_id else {"idempotency_key": idempotency_key}
+        return self.db.jobs.find_one(query, {"_id": 0})
+
+    @_timed
+    def update_job(self, job_id: str, fields: dict) -> object:
+        """
+        Update the fields of a background job.
+
+        Args:
+            job_id: id of the job
+            fields: the fields to set
+
+        Returns:
+            result: result of the update operation
+        """
+        return self.db.jobs.update_one({"job_id": job_id}, {"$set": fields})
+
+    @_timed
+    def get_jobs(self, states: List[str], limit: int = 0) -> List[dict]:
+        """
+        Get the background jobs in some states, oldest first.
+
+        Args:
+            states: the states of the jobs
+            limit: maximum number of jobs to return, 0 for all
+
+        Returns:
+            jobs: list of jobs
+        """
+        return list(
+            self.db.jobs.find({"state": {"$in": states}}, {"_id": 0})
+            .sort("created_at", 1)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def _claimable(states: List[str], leased_states: List[str], now: float) -> dict:
+        # A missing lease, from before leases were recorded, counts as expired
+        return {
+            "$or": [
+                {"state": {"$in": states}},
+                {"state": {"$in": leased_states}, "lease_until": {"$lt": now}},
+                {"state": {"$in": leased_states}, "lease_until": None},
+            ]
+        }
+
+    @_timed
+    def claim_job(
+        self,
+        job_id: str,
+        states: List[str],
+        leased_states: List[str],
+        now: float,
+        fields: dict,
+    ) -> dict:
+        """
+        Atomically update a background job that is in one of the states, or in
+        one of the leased states with an expired lease, and count an attempt.
+
+        Args:
+            job_id: id of the job
+            states: the states the job can be claimed in
+            leased_states: the states it can be claimed in once its lease expired
+            now: the current time, compared to the lease_until field
+            fields: the fields to set, e.g. the new state and lease
+
+        Returns:
+            job: the updated job, or None if it can't be claimed
+        """
+        return self.db.jobs.find_one_and_update(
+            {"job_id": job_id, **self._claimable(states, leased_states, now)},
+            {"$set": fields, "$inc": {"attempts": 1}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @_timed
+    def get_claimable_jobs(
+        self, states: List[str], leased_states: List[str], now: float, limit: int = 0
+    ) -> List[dict]:
+        """
+        Get the background jobs that claim_job would claim, oldest first.
+
+        Args:
+            states: the states the jobs can be claimed in
+            leased_states: the states they can be claimed in once their lease expired
+            now: the current time, compared to the lease_until field
+            limit: maximum number of jobs to return, 0 for all
+
+        Returns:
+            jobs: list of jobs
+        """
+        return list(
+            self.db.jobs.find(self._claimable(states, leased_states, now), {"_id": 0})
+            .sort("created_at", 1)
+            .limit(limit)
+        )
+
+    @_timed
+    def set_graph(self, name: str, graph: dict) -> object:
+        """
+        Store a precomputed graph, replacing the previous one.
+
+        Args:
+            name: name of the graph
+            graph: the graph document
+
+        Returns:
+            result: result of the upsert operation
+        """
+        return self.db.graphs.update_one(
+            {"name": name}, {"$set": {"name": name, **graph}}, upsert=True
+        )
+
+    @_timed
+    def get_graph(self, name: str) -> dict:
+        """
+        Get a precomputed graph.
+
+        Args:
+            name: name of the graph
+
+        Returns:
+            graph: the graph document, or None
+        """
+        return self.db.graphs.find_one({"name": name}, {"_id": 0})
+
+    @_timed
+    def record_metrics(self, period: str, points: List[dict]) -> object:
+        """
+        Append a point to the history bucket of every country for a period,
+        creating the buckets that don't exist yet, in one bulk write.
+
+        Args:
+            period: the period of the buckets, see internal.history.series
+            points: the points, each with its country_name, time 't' and metrics
+
+        Returns:
+            result: result of the bulk write, or None if there are no points
+        """
+        if not points:
+            return None
+        requests = [
+            UpdateOne(
+                {self.KEY_COUNTRY: point[self.KEY_COUNTRY], "period": period},
+                {
+                    "$push": {
+                        "points": {
+                            k: v for k, v in point.items() if k != self.KEY_COUNTRY
+                        }
+                    },
+                    "$inc": {"count": 1},
+                },
+                upsert=True,
+            )
+            for point in points
+        ]
+        return self.db.metrics_history.bulk_write(requests, ordered=False)
+
+    @_timed
+    def get_metrics_history(self, key: str, since: str = None) -> List[dict]:
+        """
+        Get the history buckets of a country, oldest first.
+        The (country_name, period) index serves the query and the sort.
+
+        Args:
+            key: key of the country - name of the country
+            since: return only the buckets of this period and later
+
+        Returns:
+            buckets: list of buckets, with their points
+        """
+        query = {self.KEY_COUNTRY: key}
+        if since:
+            query["period"] = {"$gte": since}
+        return list(self.db.metrics_history.find(query, {"_id": 0}).sort("period", 1))
+
+    def iter_countries(self, fields: List[str] = None, batch_size: int = 500) -> Cursor:
+        """
+        Iterate over all countries in the NoSQL database, in insertion order.
+        Documents are fetched from the server in batches, as the cursor advances.
+
+        Args:
+            fields: fields to return, None for the whole documents
+            batch_size: number of documents fetched per round trip
+
+        Returns:
+            countries: cursor over the countries, without their _id
+        """
+        return (
+            self.db.countries.find({}, self._projection(fields) or {"_id": 0})
+            .sort("_id", 1)
+            .batch_size(batch_size)
+        )
@@ -8,3 +8,97 @@ COLLECTIONS = [
     "countries",
     "images",
 ]
+
+# Collections that must keep every document, so they are not capped
+UNCAPPED_COLLECTIONS = [
+    "jobs",
+    "graphs",
+    "metrics_history",
+]
+
+# Secondary indexes as (keys, options), by collection
+INDEXES = {
+    "images": [
+        # Pages of a country's gallery, in upload order
+        ([("country_name", 1), ("_id", 1)], {}),
+        ([("image_id", 1)], {}),
+    ],
+    "jobs": [
+        ([("job_id", 1)], {"unique": True}),
+        ([("idempotency_key", 1)], {"unique": True, "sparse": True}),
+        ([("state", 1), ("created_at", 1)], {}),
+    ],
+    "graphs": [
+        ([("name", 1)], {"unique": True}),
+    ],
+    "metrics_history": [
+        # A bucket per country and month; serves the trend queries
+        ([("country_name", 1), ("period", 1)], {"unique": True}),
+    ],
+}
+
+# Name of the stored land border graph
+BORDER_GRAPH = "borders"
+
+# Fields of a country that are served by the API by default
+COUNTRY_FIELDS = [
+    "country_name",
+    "population_density",
+    "area",
+    "population",
+    "region",
+]
+
+# Fields of a country a client may select; selections are returned in this order
+SELECTABLE_COUNTRY_FIELDS = COUNTRY_FIELDS + [
+    "subregion",
+    "capital",
+    "languages",
+    "currencies",
+    "flags",
+    "timezones",
+    "continents",
+    "latlng",
+    "cca2",
+    "cca3",
+]
+
+# Fields the countries can be sorted by
+SORT_FIELDS = COUNTRY_FIELDS
+
+# Sort orders: 1 for ascending and -1 for descending
+SORT_ORDERS = [1, -1]
+
+# Default number of countries returned by the list endpoint
+DEFAULT_LIMIT = 250
+
+# Default and maximum number of images in a page of a gallery
+IMAGES_PAGE_SIZE = 20
+MAX_IMAGES_PAGE_SIZE = 100
+
+# Maximum number of images in a bulk upload
+MAX_BULK_IMAGES = 50
+
+# Default and maximum number of countries returned by a nearest-country query
+GEO_NEAREST_DEFAULT = 5
+MAX_GEO_NEAREST = 50
+
+# Maximum number of borders crossed by a neighbourhood query
+MAX_BORDER_HOPS = 10
+
+# Formats of the country export, and the number of countries per batch
+EXPORT_FORMATS = ["ndjson", "columnar"]
+EXPORT_BATCH_SIZE = 500
+
+# Content type of the export in each format; both are a JSON value per line
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "columnar": "application/vnd.countries.columnar+x-ndjson",
+}
+
+# Metrics of a country recorded in its history by every pipeline run
+HISTORY_METRICS = ["population", "area", "population_density"]
+
+# Default and maximum number of points of a trend
+TREND_POINTS = 50
+MAX_TREND_POINTS = 1000
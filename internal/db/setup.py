@@ -2,11 +2,19 @@
 Creates the database and the tables.
 """
 
+import logging
 import time
 
 from pymongo import MongoClient
 
-from internal.db.model import COLLECTIONS, DATABASE_NAME
+from internal.db.model import (
+    COLLECTIONS,
+    DATABASE_NAME,
+    INDEXES,
+    UNCAPPED_COLLECTIONS,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class NoSQLBackend:
@@ -14,8 +22,8 @@ class NoSQLBackend:
     NoSQLBackend is used to setup the database and the collections.
     """
 
-    def __init__(self, connection_string: str):
-        self.client = None
+    def __init__(self, connection_string: str, client: MongoClient = None):
+        self.client = client
         self.db = None
         self.connection_string = connection_string
         self._setup_session(connection_string)
@@ -32,7 +40,7 @@ class NoSQLBackend:
             None
         """
 
-        if self.client:
+        if self.client is not None:
             return
 
         self.client = MongoClient(connection_string)
@@ -56,10 +64,12 @@ class NoSQLBackend:
         for attempt in range(retry):
             try:
                 self.client.admin.command("ping")
-                print("Connected to MongoDB!")
+                logger.info("Connected to MongoDB!")
                 break
             except Exception:
-                print(f"Attempt {attempt + 1} failed. Retrying in {5} seconds...")
+                logger.warning(
+                    f"Attempt {attempt + 1} failed. Retrying in {5} seconds..."
+                )
                 time.sleep(attempt * 5)
         else:
             raise Exception("Couldn't connect to MongoDB after retries!")
@@ -68,9 +78,19 @@ class NoSQLBackend:
         self.db = self.client[DATABASE_NAME]
 
         # Access a collection (it will be created if it doesn't exist)
+        existing = set(self.db.list_collection_names())
         for collection in COLLECTIONS:
-            if collection not in self.db.list_collection_names():
+            if collection not in existing:
                 self.db.create_collection(collection, capped=True, size=5242880)
-                print(f"Created collection: {collection}")
+                logger.info(f"Created collection: {collection}")
             else:
-                print(f"Collection already exists: {collection}")
+                logger.info(f"Collection already exists: {collection}")
+        for collection in UNCAPPED_COLLECTIONS:
+            if collection not in existing:
+                self.db.create_collection(collection)
+                logger.info(f"Created collection: {collection}")
+
+        # Create the indexes; this is a no-op for existing ones
+        for collection, indexes in INDEXES.items():
+            for keys, options in indexes:
+                self.db[collection].create_index(keys, **options)
@@ -0,0 +1,161 @@
+"""
+In-process spatial index of the countries' coordinates.
+Nearest-country queries search a k-d tree of points on the unit sphere, where
+the straight-line distance orders the points like the great-circle distance.
+Bounding-box queries search a k-d tree of (latitude, longitude) pairs. Queries
+are quantized and their results kept in a small LRU cache.
+"""
+
+import math
+from collections import OrderedDict
+from typing import List, Tuple
+
+from internal.geo.kdtree import KDTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Queries are rounded to this many degrees, about 1 km at the equator
+QUANTUM_DEGREES = 0.01
+
+
+def to_unit_vector(lat: float, lng: float) -> Tuple[float, float, float]:
+    """
+    Convert a latitude and longitude to a point on the unit sphere.
+
+    Args:
+        lat (float): The latitude in degrees.
+        lng (float): The longitude in degrees.
+
+    Returns:
+        Tuple[float, float, float]: The point.
+    """
+    phi, lam = math.radians(lat), math.radians(lng)
+    return (
+        math.cos(phi) * math.cos(lam),
+        math.cos(phi) * math.sin(lam),
+        math.sin(phi),
+    )
+
+
+def quantize(value: float, quantum: float = QUANTUM_DEGREES) -> float:
+    """
+    Round a coordinate to the query quantum.
+
+    Args:
+        value (float): The coordinate in degrees.
+        quantum (float): The quantum in degrees.
+
+    Returns:
+        float: The rounded coordinate.
+    """
+    return round(round(value / quantum) * quantum, 6)
+
+
+class GeoIndex:
+    """
+    Answers nearest-country and bounding-box queries over the countries.
+    """
+
+    def __init__(self, countries: List[dict], cache_size: int = 4096):
+        """
+        Build the GeoIndex.
+
+        Args:
+            countries (List[dict]): The countries, with 'country_name' and
+                'latlng'; countries without coordinates are left out.
+            cache_size (int): The number of query results kept.
+        """
+        self.countries = [
+            {"country_name": country["country_name"], "latlng": country["latlng"]}
+            for country in countries
+            if len(country.get("latlng") or []) == 2
+        ]
+        self._sphere = KDTree(
+            [to_unit_vector(*country["latlng"]) for country in self.countries]
+        )
+        self._plane = KDTree([country["latlng"] for country in self.countries])
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.countries)
+
+    def _cached(self, key: tuple, compute):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        result = compute()
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def nearest(self, lat: float, lng: float, k: int = 5) -> List[dict]:
+        """
+        Find the k countries nearest to a point.
+
+        Args:
+            lat (float): The latitude of the point in degrees.
+            lng (float): The longitude of the point in degrees.
+            k (int): The number of countries.
+
+        Returns:
+            List[dict]: The countries with their great-circle distance in
+                'distance_km', nearest first.
+        """
+        lat, lng = quantize(lat), quantize(lng)
+        return self._cached(
+            ("nearest", lat, lng, k), lambda: self._nearest(lat, lng, k)
+        )
+
+    def _nearest(self, lat: float, lng: float, k: int) -> List[dict]:
+        results = []
+        for squared, index in self._sphere.nearest(to_unit_vector(lat, lng), k):
+            # The chord length gives the central angle
+            angle = 2 * math.asin(min(math.sqrt(squared) / 2, 1.0))
+            results.append(
+                {
+                    **self.countries[index],
+                    "distance_km": round(angle * EARTH_RADIUS_KM, 3),
+                }
+            )
+        return results
+
+    def within(
+        self, south: float, west: float, north: float, east: float
+    ) -> List[dict]:
+        """
+        Find the countries inside a bounding box. A box whose west edge is
+        east of its east edge crosses the antimeridian.
+
+        Args:
+            south (float): The southern latitude in degrees.
+            west (float): The western longitude in degrees.
+            north (float): The northern latitude in degrees.
+            east (float): The eastern longitude in degrees.
+
+        Returns:
+            List[dict]: The countries, by name.
+
+        Raises:
+            ValueError: If the south edge is north of the north edge.
+        """
+        if south > north:
+            raise ValueError("The south edge must not be north of the north edge.")
+        box = tuple(quantize(value) for value in (south, west, north, east))
+        return self._cached(("within",) + box, lambda: self._within(*box))
+
+    def _within(
+        self, south: float, west: float, north: float, east: float
+    ) -> List[dict]:
+        if west <= east:
+            spans = [(west, east)]
+        else:
+            spans = [(west, 180.0), (-180.0, east)]
+        indexes = set()
+        for low, high in spans:
+            indexes.update(self._plane.within((south, low), (north, high)))
+        return sorted(
+            (self.countries[index] for index in indexes),
+            key=lambda country: country["country_name"],
+        )
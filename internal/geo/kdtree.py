@@ -0,0 +1,118 @@
+"""
+A static k-d tree over points of any dimension, for nearest-neighbour and
+box queries. It is built once from the dataset and never modified.
+"""
+
+import heapq
+from typing import List, Sequence, Tuple
+
+
+class KDTree:
+    """
+    A balanced k-d tree. Nodes are stored in flat lists, built by splitting
+    the points at the median of each axis in turn.
+    """
+
+    def __init__(self, points: Sequence[Sequence[float]]):
+        """
+        Build the KDTree.
+
+        Args:
+            points (Sequence[Sequence[float]]): The points, all of the same
+                dimension; results refer to them by their index.
+        """
+        self.points = [tuple(point) for point in points]
+        self.dimensions = len(self.points[0]) if self.points else 0
+        self._index: List[int] = []
+        self._axis: List[int] = []
+        self._left: List[int] = []
+        self._right: List[int] = []
+        self._root = self._build(list(range(len(self.points))), 0)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _build(self, indexes: List[int], depth: int) -> int:
+        if not indexes:
+            return -1
+        axis = depth % self.dimensions
+        indexes.sort(key=lambda index: self.points[index][axis])
+        median = len(indexes) // 2
+        node = len(self._index)
+        self._index.append(indexes[median])
+        self._axis.append(axis)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._left[node] = self._build(indexes[:median], depth + 1)
+        self._right[node] = self._build(indexes[median + 1 :], depth + 1)
+        return node
+
+    def nearest(self, point: Sequence[float], k: int = 1) -> List[Tuple[float, int]]:
+        """
+        Find the k points nearest to a point, by Euclidean distance.
+
+        Args:
+            point (Sequence[float]): The query point.
+            k (int): The number of points to return.
+
+        Returns:
+            List[Tuple[float, int]]: The squared distances and indexes of the
+                nearest points, nearest first.
+        """
+        # Max-heap of the best candidates so far, as (-distance, index)
+        best: List[Tuple[float, int]] = []
+        # Nodes to visit, with the squared distance to their side of the split
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            # The subtree can only hold a better point if its side of the
+            # split is closer than the worst candidate
+            if node == -1 or (len(best) == k and bound >= -best[0][0]):
+                continue
+            index = self._index[node]
+            candidate = self.points[index]
+            distance = sum((a - b) ** 2 for a, b in zip(point, candidate))
+            if len(best) < k:
+                heapq.heappush(best, (-distance, index))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, index))
+
+            axis = self._axis[node]
+            offset = point[axis] - candidate[axis]
+            near, far = (
+                (self._left[node], self._right[node])
+                if offset < 0
+                else (self._right[node], self._left[node])
+            )
+            stack.append((far, max(bound, offset * offset)))
+            stack.append((near, bound))
+
+        return sorted((-distance, index) for distance, index in best)
+
+    def within(self, low: Sequence[float], high: Sequence[float]) -> List[int]:
+        """
+        Find the points inside an axis-aligned box, bounds included.
+
+        Args:
+            low (Sequence[float]): The lower corner of the box.
+            high (Sequence[float]): The upper corner of the box.
+
+        Returns:
+            List[int]: The indexes of the points in the box.
+        """
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node == -1:
+                continue
+            index = self._index[node]
+            point = self.points[index]
+            if all(lo <= value <= hi for lo, value, hi in zip(low, point, high)):
+                found.append(index)
+            axis = self._axis[node]
+            if low[axis] <= point[axis]:
+                stack.append(self._left[node])
+            if point[axis] <= high[axis]:
+                stack.append(self._right[node])
+        return found
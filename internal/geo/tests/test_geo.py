@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from internal.geo.index import GeoIndex, quantize
+from internal.geo.kdtree import KDTree
+
+CITIES = [
+    {"country_name": "France", "latlng": [46.0, 2.0]},
+    {"country_name": "United Kingdom", "latlng": [54.0, -2.0]},
+    {"country_name": "Spain", "latlng": [40.0, -4.0]},
+    {"country_name": "Japan", "latlng": [36.0, 138.0]},
+    {"country_name": "Fiji", "latlng": [-18.0, 179.0]},
+    {"country_name": "Samoa", "latlng": [-13.58, -172.33]},
+    {"country_name": "Antarctica", "latlng": []},
+]
+
+
+def test_kdtree_matches_brute_force():
+    # Arrange
+    rng = random.Random(7)
+    points = [(rng.random(), rng.random(), rng.random()) for _ in range(500)]
+    tree = KDTree(points)
+
+    for _ in range(50):
+        query = (rng.random(), rng.random(), rng.random())
+        low = [rng.random() * 0.6 for _ in range(3)]
+        high = [value + 0.3 for value in low]
+
+        # Act
+        nearest = [index for _, index in tree.nearest(query, 7)]
+        within = tree.within(low, high)
+
+        # Assert
+        distances = sorted(
+            (sum((a - b) ** 2 for a, b in zip(query, point)), index)
+            for index, point in enumerate(points)
+        )
+        assert nearest == [index for _, index in distances[:7]]
+        assert sorted(within) == [
+            index
+            for index, point in enumerate(points)
+            if all(lo <= value <= hi for lo, value, hi in zip(low, point, high))
+        ]
+
+
+def test_nearest_countries_by_great_circle_distance():
+    # Arrange
+    index = GeoIndex(CITIES)
+
+    # Act
+    result = index.nearest(48.85, 2.35, 3)
+
+    # Assert
+    assert len(index) == 6
+    assert [country["country_name"] for country in result] == [
+        "France",
+        "United Kingdom",
+        "Spain",
+    ]
+    assert result[0]["distance_km"] == pytest.approx(318, abs=1)
+
+
+def test_nearest_across_the_antimeridian():
+    # Fiji is nearer to Samoa than any country on the same side of 180°
+    result = GeoIndex(CITIES).nearest(-13.58, -172.33, 2)
+
+    assert [country["country_name"] for country in result] == ["Samoa", "Fiji"]
+
+
+def test_within_bounding_box():
+    # Arrange
+    index = GeoIndex(CITIES)
+
+    # Act
+    europe = index.within(35.0, -10.0, 60.0, 30.0)
+    pacific = index.within(-20.0, 170.0, 0.0, -170.0)
+
+    # Assert
+    assert [c["country_name"] for c in europe] == ["France", "Spain", "United Kingdom"]
+    assert [c["country_name"] for c in pacific] == ["Fiji", "Samoa"]
+    with pytest.raises(ValueError):
+        index.within(10.0, 0.0, -10.0, 10.0)
+
+
+def test_queries_are_quantized_and_cached():
+    # Arrange
+    index = GeoIndex(CITIES, cache_size=1)
+
+    # Act
+    first = index.nearest(48.851, 2.349, 1)
+    second = index.nearest(48.849, 2.351, 1)
+    index.nearest(0.0, 0.0, 1)
+    third = index.nearest(48.851, 2.349, 1)
+
+    # Assert
+    assert quantize(48.851) == quantize(48.849) == 48.85
+    assert second is first
+    assert third is not first and third == first
@@ -0,0 +1,199 @@
+"""
+Land border graph of the countries in compressed sparse row (CSR) form.
+Countries are numbered in name order; the neighbors of country i are
+targets[offsets[i]:offsets[i + 1]]. The data pipeline builds the graph from
+the 'borders' cca3 codes and stores it as one document; the backend loads it
+and answers neighborhood and path queries with breadth-first searches over
+the arrays, without a database lookup per hop.
+"""
+
+from array import array
+from collections import deque
+from typing import Dict, List, Optional
+
+# Version of the stored document layout
+GRAPH_VERSION = 1
+
+
+class BorderGraph:
+    """
+    An undirected graph of the countries' land borders.
+    """
+
+    def __init__(self, names: List[str], offsets: List[int], targets: List[int]):
+        """
+        Initialize the BorderGraph.
+
+        Args:
+            names (List[str]): The country names, by index.
+            offsets (List[int]): Where the neighbors of every country start in
+                the targets, plus the total number of targets.
+            targets (List[int]): The indexes of the neighbors.
+
+        Raises:
+            ValueError: If the arrays are inconsistent.
+        """
+        if len(offsets) != len(names) + 1 or offsets[-1] != len(targets):
+            raise ValueError("Inconsistent border graph arrays.")
+        self.names = list(names)
+        self.offsets = array("i", offsets)
+        self.targets = array("i", targets)
+        self._index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def build(cls, countries: List[dict]) -> "BorderGraph":
+        """
+        Build the graph from country documents. Borders with unknown codes are
+        dropped, and every border is made symmetric.
+
+        Args:
+            countries (List[dict]): The countries, with 'country_name', 'cca3'
+                and 'borders'.
+
+        Returns:
+            BorderGraph: The graph.
+        """
+        countries = sorted(countries, key=lambda country: country["country_name"])
+        names = [country["country_name"] for country in countries]
+        by_code = {
+            country["cca3"]: index
+            for index, country in enumerate(countries)
+            if country.get("cca3")
+        }
+        adjacency = [set() for _ in countries]
+        for index, country in enumerate(countries):
+            for code in country.get("borders") or []:
+                neighbor = by_code.get(code)
+                if neighbor is not None and neighbor != index:
+                    adjacency[index].add(neighbor)
+                    adjacency[neighbor].add(index)
+
+        offsets, targets = [0], []
+        for neighbors in adjacency:
+            targets.extend(sorted(neighbors))
+            offsets.append(len(targets))
+        return cls(names, offsets, targets)
+
+    @classmethod
+    def from_document(cls, document: dict) -> "BorderGraph":
+        """
+        Load a graph stored with to_document.
+
+        Args:
+            document (dict): The stored graph.
+
+        Returns:
+            BorderGraph: The graph.
+
+        Raises:
+            ValueError: If the document has another layout version.
+        """
+        if document.get("version") != GRAPH_VERSION:
+            raise ValueError(
+                f"Unsupported border graph version: {document.get('version')}"
+            )
+        return cls(document["names"], document["offsets"], document["targets"])
+
+    def to_document(self) -> dict:
+        """
+        Describe the graph as a document to store.
+
+        Returns:
+            dict: The layout version and the arrays.
+        """
+        return {
+            "version": GRAPH_VERSION,
+            "names": self.names,
+            "offsets": self.offsets.tolist(),
+            "targets": self.targets.tolist(),
+        }
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def _neighbors(self, index: int) -> array:
+        return self.targets[self.offsets[index] : self.offsets[index + 1]]
+
+    def neighbors(self, name: str) -> List[str]:
+        """
+        The countries that share a land border with a country.
+
+        Args:
+            name (str): The name of the country.
+
+        Returns:
+            List[str]: The names of the neighbors.
+
+        Raises:
+            KeyError: If the country is unknown.
+        """
+        return [self.names[i] for i in self._neighbors(self._index[name])]
+
+    def within_hops(self, name: str, hops: int) -> List[dict]:
+        """
+        The countries reachable over at most a number of land borders.
+
+        Args:
+            name (str): The name of the country.
+            hops (int): The maximum number of borders crossed.
+
+        Returns:
+            List[dict]: The countries with their distance in 'hops', nearest
+                first; the country itself is not included.
+
+        Raises:
+            KeyError: If the country is unknown.
+        """
+        start = self._index[name]
+        distance = array("i", [-1]) * len(self.names)
+        distance[start] = 0
+        queue = deque([start])
+        found = []
+        while queue:
+            current = queue.popleft()
+            if distance[current] == hops:
+                continue
+            for neighbor in self._neighbors(current):
+                if distance[neighbor] == -1:
+                    distance[neighbor] = distance[current] + 1
+                    found.append(neighbor)
+                    queue.append(neighbor)
+        return [{"country_name": self.names[i], "hops": distance[i]} for i in found]
+
+    def shortest_path(self, source: str, target: str) -> Optional[List[str]]:
+        """
+        A shortest land path between two countries.
+
+        Args:
+            source (str): The name of the first country.
+            target (str): The name of the last country.
+
+        Returns:
+            List[str]: The countries along the path, both ends included, or
+                None if there is no land path.
+
+        Raises:
+            KeyError: If a country is unknown.
+        """
+        start, end = self._index[source], self._index[target]
+        # parent[i] is -2 until i is reached; the start has no parent
+        parent = array("i", [-2]) * len(self.names)
+        parent[start] = -1
+        queue = deque([start])
+        while queue and parent[end] == -2:
+            current = queue.popleft()
+            for neighbor in self._neighbors(current):
+                if parent[neighbor] == -2:
+                    parent[neighbor] = current
+                    queue.append(neighbor)
+        if parent[end] == -2:
+            return None
+        path = []
+        node = end
+        while node != -1:
+            path.append(self.names[node])
+            node = parent[node]
+        return path[::-1]
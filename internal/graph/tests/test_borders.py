@@ -0,0 +1,65 @@
+import pytest
+
+from internal.graph.borders import BorderGraph
+
+COUNTRIES = [
+    {"country_name": "France", "cca3": "FRA", "borders": ["ESP", "DEU", "BEL"]},
+    {"country_name": "Spain", "cca3": "ESP", "borders": ["FRA", "PRT"]},
+    {"country_name": "Portugal", "cca3": "PRT", "borders": ["ESP"]},
+    # Borders are made symmetric: Germany doesn't list Belgium here
+    {"country_name": "Germany", "cca3": "DEU", "borders": ["FRA", "POL"]},
+    {"country_name": "Belgium", "cca3": "BEL", "borders": ["FRA", "DEU", "XXX"]},
+    {"country_name": "Poland", "cca3": "POL", "borders": ["DEU"]},
+    {"country_name": "Iceland", "cca3": "ISL", "borders": []},
+]
+
+
+@pytest.fixture
+def graph():
+    return BorderGraph.build(COUNTRIES)
+
+
+def test_build_csr_arrays(graph):
+    assert graph.names == sorted(country["country_name"] for country in COUNTRIES)
+    assert len(graph.offsets) == len(graph) + 1
+    assert len(graph.targets) == 12  # 6 borders, both ways
+    assert graph.neighbors("Germany") == ["Belgium", "France", "Poland"]
+    assert graph.neighbors("Iceland") == []
+
+
+def test_within_hops(graph):
+    assert graph.within_hops("Portugal", 2) == [
+        {"country_name": "Spain", "hops": 1},
+        {"country_name": "France", "hops": 2},
+    ]
+    assert len(graph.within_hops("Portugal", 10)) == 5
+
+
+def test_shortest_path(graph):
+    assert graph.shortest_path("Portugal", "Poland") == [
+        "Portugal",
+        "Spain",
+        "France",
+        "Germany",
+        "Poland",
+    ]
+    assert graph.shortest_path("Spain", "Spain") == ["Spain"]
+    assert graph.shortest_path("France", "Iceland") is None
+    with pytest.raises(KeyError):
+        graph.shortest_path("France", "Atlantis")
+
+
+def test_document_round_trip(graph):
+    # Act
+    loaded = BorderGraph.from_document(graph.to_document())
+
+    # Assert
+    assert loaded.names == graph.names
+    assert loaded.shortest_path("Poland", "Spain") == [
+        "Poland",
+        "Germany",
+        "France",
+        "Spain",
+    ]
+    with pytest.raises(ValueError):
+        BorderGraph.from_document({**graph.to_document(), "version": 0})
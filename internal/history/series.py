@@ -0,0 +1,112 @@
+"""
+Time series of the countries' metrics, such as their population.
+Every pipeline run records one point per country and metric. The points are
+stored in buckets, one document per country and calendar month, so a country's
+whole history is read with a few index lookups instead of one per point.
+Long series are downsampled for display by averaging equal slices of time.
+"""
+
+import math
+import time
+from typing import Dict, List, Tuple
+
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+
+# Shorter series have no annual growth: compounding hours of change over a
+# year is meaningless, and overflows
+MIN_ANNUAL_SPAN = SECONDS_PER_YEAR / 12
+
+
+def period_of(timestamp: float) -> str:
+    """
+    The bucket of a point in time: its calendar month in UTC.
+
+    Args:
+        timestamp (float): Seconds since the epoch.
+
+    Returns:
+        str: The period, such as '2025-04'; periods sort chronologically.
+    """
+    return time.strftime("%Y-%m", time.gmtime(timestamp))
+
+
+def flatten(buckets: List[dict], metric: str) -> List[Tuple[float, float]]:
+    """
+    The points of a metric in a list of buckets, oldest first.
+
+    Args:
+        buckets (List[dict]): The buckets, with their 'points'.
+        metric (str): The metric.
+
+    Returns:
+        List[Tuple[float, float]]: The (timestamp, value) pairs; points
+            without a value for the metric are skipped.
+    """
+    points = [
+        (point["t"], point[metric])
+        for bucket in buckets
+        for point in bucket["points"]
+        if point.get(metric) is not None
+    ]
+    points.sort(key=lambda point: point[0])
+    return points
+
+
+def downsample(
+    points: List[Tuple[float, float]], max_points: int
+) -> List[Tuple[float, float]]:
+    """
+    Reduce a series to at most max_points by splitting its time range into
+    equal slices and averaging the points of every slice. The first and the
+    last point are kept as they are.
+
+    Args:
+        points (List[Tuple[float, float]]): The (timestamp, value) pairs, oldest first.
+        max_points (int): The maximum number of points.
+
+    Returns:
+        List[Tuple[float, float]]: The downsampled series.
+    """
+    if len(points) <= max_points:
+        return list(points)
+    if max_points < 3:
+        return [points[0], points[-1]][:max_points]
+
+    first, last, inner = points[0], points[-1], points[1:-1]
+    slices = max_points - 2
+    start, width = inner[0][0], (inner[-1][0] - inner[0][0]) / slices or 1.0
+    sums: Dict[int, List[float]] = {}
+    for t, value in inner:
+        index = min(int((t - start) / width), slices - 1)
+        total = sums.setdefault(index, [0.0, 0.0, 0])
+        total[0] += t
+        total[1] += value
+        total[2] += 1
+    averaged = [(t / count, value / count) for t, value, count in sums.values()]
+    return [first] + sorted(averaged) + [last]
+
+
+def growth_rates(points: List[Tuple[float, float]]) -> dict:
+    """
+    The growth of a series between its first and its last point.
+
+    Args:
+        points (List[Tuple[float, float]]): The (timestamp, value) pairs, oldest first.
+
+    Returns:
+        dict: 'total', the relative change, and 'annual', the compound
+            annual growth rate; None when the series is too short or starts at 0,
+            and 'annual' is also None when it spans less than MIN_ANNUAL_SPAN.
+    """
+    if len(points) < 2 or not points[0][1]:
+        return {"total": None, "annual": None}
+    (t0, v0), (t1, v1) = points[0], points[-1]
+    total = v1 / v0 - 1
+    annual = None
+    if t1 - t0 >= MIN_ANNUAL_SPAN and v1 / v0 > 0:
+        years = (t1 - t0) / SECONDS_PER_YEAR
+        try:
+            annual = math.expm1(math.log(v1 / v0) / years)
+        except OverflowError:
+            pass
+    return {"total": total, "annual": annual}
@@ -0,0 +1,107 @@
+import calendar
+from unittest.mock import MagicMock
+
+import pytest
+
+from backend.handler import RequestHandler
+from benchmarks.fakes import FakeMongoClient
+from data_pipeline.main import DataPipelineOrchestrator
+from internal.db.manager import NoSQLDatabaseManager
+from internal.history.series import (
+    MIN_ANNUAL_SPAN,
+    SECONDS_PER_YEAR,
+    downsample,
+    flatten,
+    growth_rates,
+    period_of,
+)
+
+
+def _utc(year: int, month: int, day: int = 1) -> float:
+    return float(calendar.timegm((year, month, day, 0, 0, 0)))
+
+
+def test_period_of():
+    assert period_of(_utc(2025, 1, 31) + 86399) == "2025-01"
+    assert period_of(_utc(2025, 2)) == "2025-02"
+
+
+def test_flatten_skips_missing_values():
+    buckets = [
+        {"points": [{"t": 3, "population": 30}, {"t": 2, "population": None}]},
+        {"points": [{"t": 1, "population": 10}]},
+    ]
+
+    assert flatten(buckets, "population") == [(1, 10), (3, 30)]
+
+
+def test_downsample_averages_slices_and_keeps_the_ends():
+    # Arrange
+    points = [(float(t), float(t * 10)) for t in range(101)]
+
+    # Act
+    sampled = downsample(points, 12)
+
+    # Assert
+    assert len(sampled) == 12
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert [t for t, _ in sampled] == sorted(t for t, _ in sampled)
+    assert all(value == t * 10 for t, value in sampled)
+    assert downsample(points[:5], 12) == points[:5]
+
+
+def test_growth_rates():
+    points = [(0.0, 100.0), (SECONDS_PER_YEAR, 105.0), (2 * SECONDS_PER_YEAR, 121.0)]
+
+    growth = growth_rates(points)
+
+    assert growth["total"] == pytest.approx(0.21)
+    assert growth["annual"] == pytest.approx(0.1)
+    assert growth_rates(points[:1]) == {"total": None, "annual": None}
+    assert growth_rates([(0.0, 0.0), (1.0, 5.0)]) == {"total": None, "annual": None}
+
+
+def test_growth_rates_of_a_short_series():
+    growth = growth_rates([(0.0, 100.0), (3600.0, 110.0)])
+
+    assert growth["total"] == pytest.approx(0.1)
+    assert growth["annual"] is None
+
+
+def test_growth_rates_too_large_to_annualise():
+    growth = growth_rates([(0.0, 1.0), (MIN_ANNUAL_SPAN, 1e300)])
+
+    assert growth["total"] == pytest.approx(1e300)
+    assert growth["annual"] is None
+
+
+def test_pipeline_runs_are_bucketed_and_served_as_a_trend():
+    # Arrange
+    db_manager = NoSQLDatabaseManager("memory://", FakeMongoClient())
+    db_manager.bootstrap()
+    country = {"country_name": "CountryA", "population": 100, "area": 10.0}
+    db_manager.add_country("CountryA", dict(country))
+    orchestrator = DataPipelineOrchestrator(db_manager, MagicMock(), MagicMock())
+    runs = [_utc(2025, 1, 1), _utc(2025, 1, 15), _utc(2025, 2, 1), _utc(2026, 1, 1)]
+
+    # Act: the population grows 10% by the last run
+    for index, timestamp in enumerate(runs):
+        population = 110 if index == len(runs) - 1 else 100 + index
+        db_manager.update_country("CountryA", {"population": population})
+        orchestrator.record_history(timestamp)
+    trend = RequestHandler(db_manager, MagicMock()).get_trend("CountryA", points=3)
+
+    # Assert: a bucket per month, not a document per point
+    buckets = db_manager.get_metrics_history("CountryA")
+    assert [(b["period"], b["count"]) for b in buckets] == [
+        ("2025-01", 2),
+        ("2025-02", 1),
+        ("2026-01", 1),
+    ]
+    assert db_manager.get_metrics_history("CountryA", "2025-02")[0]["period"] == (
+        "2025-02"
+    )
+    assert trend["count"] == 4
+    assert [point["value"] for point in trend["series"]] == [100, 101.5, 110]
+    assert trend["growth"]["total"] == pytest.approx(0.1)
+    assert trend["growth"]["annual"] == pytest.approx(0.1, abs=0.001)
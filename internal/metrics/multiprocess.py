@@ -0,0 +1,102 @@
+"""
+Metrics of a prefork server, whose workers each keep their own registry.
+Every worker writes a dump of its registry to a file of its own in a shared
+directory, periodically and whenever it serves a scrape, and the worker that
+serves a scrape renders the sum of all the files. The counters and histograms
+of workers that exited are kept, so the totals never go down; their gauges are
+dropped.
+"""
+
+import glob
+import json
+import logging
+import os
+from typing import List
+
+from internal.metrics.registry import REGISTRY, Registry
+
+logger = logging.getLogger(__name__)
+
+# The directory shared by the workers, set by the master before the fork
+DIRECTORY_ENV = "METRICS_MULTIPROC_DIR"
+
+
+def _alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def clear(directory: str):
+    """
+    Remove the dumps of a previous run of the server.
+
+    Args:
+        directory (str): The shared directory.
+    """
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+def write(directory: str, registry: Registry = REGISTRY):
+    """
+    Write the dump of this process's registry, replacing the previous one.
+
+    Args:
+        directory (str): The shared directory.
+        registry (Registry): The registry.
+    """
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry.dump(), f)
+    os.replace(tmp_path, path)
+
+
+def read(directory: str, registry: Registry = REGISTRY) -> List[dict]:
+    """
+    Read the dumps of all the processes, without the gauges of those that
+    exited.
+
+    Args:
+        directory (str): The shared directory.
+        registry (Registry): The registry the dumps were made of.
+
+    Returns:
+        List[dict]: The dumps.
+    """
+    gauges = {metric.name for metric in registry._metrics if metric.type == "gauge"}
+    dumps = []
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                dump = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Couldn't read the metrics in {path}: {e}")
+            continue
+        pid = int(os.path.basename(path).split(".")[0])
+        if not _alive(pid):
+            dump = {name: dump[name] for name in dump if name not in gauges}
+        dumps.append(dump)
+    return dumps
+
+
+def render(directory: str, registry: Registry = REGISTRY) -> str:
+    """
+    Render the sum of the metrics of all the processes.
+
+    Args:
+        directory (str): The shared directory.
+        registry (Registry): The registry of this process.
+
+    Returns:
+        str: The rendered metrics.
+    """
+    write(directory, registry)
+    return registry.render(read(directory, registry))
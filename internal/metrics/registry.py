@@ -0,0 +1,304 @@
+"""
+Minimal metrics primitives rendered in the Prometheus text exposition format.
+Recording a value is a dictionary update under a lock, which keeps the cost
+low enough to leave the metrics on in production.
+"""
+
+import bisect
+import copy
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return f"{{{pairs}}}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _copy(value):
+    # Histograms keep a list of counts per sample
+    return list(value) if isinstance(value, list) else value
+
+
+def _add(value, other):
+    if isinstance(value, list):
+        return [a + b for a, b in zip(value, other)]
+    return value + other
+
+
+class Registry:
+    """
+    A collection of metrics that are rendered together.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric"):
+        """
+        Register a metric.
+
+        Args:
+            metric (_Metric): The metric to register.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered.
+        """
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics.append(metric)
+
+    def dump(self) -> Dict[str, list]:
+        """
+        Get the values of all the metrics, to be merged by another process.
+
+        Returns:
+            Dict[str, list]: The label values and value of every sample, by
+                metric name.
+        """
+        return {metric.name: metric.dump() for metric in list(self._metrics)}
+
+    def render(self, dumps: List[Dict[str, list]] = None) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            dumps (List[Dict[str, list]]): Dumps of the registry in several
+                processes, rendered as the sum of their values instead of the
+                values of this process.
+
+        Returns:
+            str: The rendered metrics.
+        """
+        lines = []
+        for metric in list(self._metrics):
+            if dumps is not None:
+                metric = metric.merged(dump.get(metric.name, []) for dump in dumps)
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(
+                    f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    """
+    Base class of the metrics, keeping one value per combination of labels.
+    """
+
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        registry: Registry = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        try:
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError as error:
+            raise ValueError(f"Missing label {error} for metric {self.name}")
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        """
+        Iterate over the samples of the metric.
+
+        Returns:
+            Iterator[Tuple[str, Dict[str, str], float]]: The name suffix, the
+                labels and the value of every sample.
+        """
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield "", self._labels(key), value
+
+    def dump(self) -> list:
+        """
+        Get the values of the metric, to be merged by another process.
+
+        Returns:
+            list: The label values and value of every sample.
+        """
+        with self._lock:
+            return [[list(key), _copy(value)] for key, value in self._values.items()]
+
+    def merged(self, dumps: Iterable[list]) -> "_Metric":
+        """
+        Sum the dumps of the metric in several processes.
+
+        Args:
+            dumps (Iterable[list]): The dumps.
+
+        Returns:
+            _Metric: An unregistered copy of the metric holding the sums.
+        """
+        metric = copy.copy(self)
+        metric._values = {}
+        metric._lock = threading.Lock()
+        for dump in dumps:
+            for key, value in dump:
+                key = tuple(key)
+                if key in metric._values:
+                    value = _add(metric._values[key], value)
+                metric._values[key] = _copy(value)
+        return metric
+
+    def value(self, **labels) -> float:
+        """
+        Get the current value for the labels.
+
+        Returns:
+            float: The value, or 0 if nothing was recorded.
+        """
+        return self._values.get(self._key(labels), 0)
+
+
+class Counter(_Metric):
+    """
+    A value that only goes up.
+    """
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down.
+    """
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """
+    Counts observations in cumulative buckets.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        registry: Registry = REGISTRY,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # One count per bucket plus +Inf, then the sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the duration of the block in seconds.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        """
+        Get the number of observations for the labels.
+
+        Returns:
+            int: The number of observations.
+        """
+        state = self._values.get(self._key(labels))
+        return sum(state[:-1]) if state else 0
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        for key, state in values.items():
+            labels = self._labels(key)
+            cumulative = 0
+            bounds: List[float] = list(self.buckets) + [float("inf")]
+            for bound, count in zip(bounds, state[:-1]):
+                cumulative += count
+                yield "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield "_sum", labels, state[-1]
+            yield "_count", labels, cumulative
@@ -0,0 +1,70 @@
+import json
+
+from internal.metrics import multiprocess
+from internal.metrics.registry import Counter, Gauge, Histogram, Registry
+
+
+def _registry():
+    registry = Registry()
+    Counter("requests_total", "Requests.", ["route"], registry=registry)
+    Gauge("in_flight", "In flight.", registry=registry)
+    Histogram("latency", "Latency.", registry=registry, buckets=(0.1, 1))
+    return registry
+
+
+def test_render_sums_the_workers(tmp_path, monkeypatch):
+    # Arrange
+    registry = _registry()
+    requests, in_flight, latency = registry._metrics
+    other = _registry()
+    other._metrics[0].inc(2, route="/countries")
+    other._metrics[1].inc()
+    other._metrics[2].observe(0.5)
+    monkeypatch.setattr(multiprocess, "_alive", lambda pid: True)
+    (tmp_path / "1.json").write_text(json.dumps(other.dump()))
+    requests.inc(route="/countries")
+    requests.inc(route="/health")
+    in_flight.inc()
+    latency.observe(0.05)
+
+    # Act
+    rendered = multiprocess.render(str(tmp_path), registry)
+
+    # Assert
+    assert 'requests_total{route="/countries"} 3' in rendered
+    assert 'requests_total{route="/health"} 1' in rendered
+    assert "in_flight 2" in rendered
+    assert 'latency_bucket{le="0.1"} 1' in rendered
+    assert 'latency_bucket{le="1"} 2' in rendered
+    assert "latency_count 2" in rendered
+    # The registry itself is left as it was
+    assert requests.value(route="/countries") == 1
+
+
+def test_render_drops_the_gauges_of_exited_workers(tmp_path, monkeypatch):
+    # Arrange
+    registry = _registry()
+    other = _registry()
+    other._metrics[0].inc(route="/countries")
+    other._metrics[1].inc(5)
+    (tmp_path / "1.json").write_text(json.dumps(other.dump()))
+    monkeypatch.setattr(multiprocess, "_alive", lambda pid: pid != 1)
+
+    # Act
+    rendered = multiprocess.render(str(tmp_path), registry)
+
+    # Assert
+    assert 'requests_total{route="/countries"} 1' in rendered
+    assert "in_flight 0" not in rendered
+    assert "in_flight 5" not in rendered
+
+
+def test_clear_removes_the_dumps(tmp_path):
+    # Arrange
+    multiprocess.write(str(tmp_path), _registry())
+
+    # Act
+    multiprocess.clear(str(tmp_path))
+
+    # Assert
+    assert list(tmp_path.iterdir()) == []
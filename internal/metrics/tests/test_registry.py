@@ -0,0 +1,72 @@
+import pytest
+
+from internal.metrics.registry import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_renders_labels():
+    # Arrange
+    registry = Registry()
+    counter = Counter("requests_total", "Requests.", ["route"], registry=registry)
+
+    # Act
+    counter.inc(route="/countries")
+    counter.inc(2, route="/countries")
+
+    # Assert
+    assert registry.render() == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="/countries"} 3\n'
+    )
+
+
+def test_gauge_goes_up_and_down():
+    # Arrange
+    gauge = Gauge("in_flight", "In flight.", registry=None)
+
+    # Act
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    # Assert
+    assert gauge.value() == 1
+
+
+def test_histogram_renders_cumulative_buckets():
+    # Arrange
+    registry = Registry()
+    histogram = Histogram("latency", "Latency.", registry=registry, buckets=(0.1, 1))
+
+    # Act
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    # Assert
+    rendered = registry.render()
+    assert 'latency_bucket{le="0.1"} 1' in rendered
+    assert 'latency_bucket{le="1"} 2' in rendered
+    assert 'latency_bucket{le="+Inf"} 3' in rendered
+    assert "latency_sum 5.55" in rendered
+    assert "latency_count 3" in rendered
+    assert histogram.count() == 3
+
+
+def test_missing_label_raises():
+    # Arrange
+    counter = Counter("errors_total", "Errors.", ["kind"], registry=None)
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="Missing label 'kind'"):
+        counter.inc()
+
+
+def test_duplicate_metric_raises():
+    # Arrange
+    registry = Registry()
+    Counter("errors_total", "Errors.", registry=registry)
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="Metric already registered: errors_total"):
+        Counter("errors_total", "Errors.", registry=registry)
@@ -0,0 +1,140 @@
+"""
+The interface of the object storage that holds the image files.
+Objects are addressed by a key such as 'France/images/<image_id>.jpg', written
+from a stream of chunks and read back as one, so an image never has to be held
+in memory whole. Clients can be handed a signed URL that lets them download an
+object for a limited time without going through the API.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, Union
+
+# Size of the chunks objects are read in
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Seconds a signed URL stays valid by default
+DEFAULT_URL_EXPIRY = 15 * 60
+
+
+def as_chunks(data: Union[bytes, Iterable[bytes]]) -> Iterable[bytes]:
+    """
+    Accept either the whole content or a stream of chunks.
+
+    Args:
+        data (Union[bytes, Iterable[bytes]]): The content.
+
+    Returns:
+        Iterable[bytes]: The chunks of the content.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return [bytes(data)]
+    return data
+
+
+class ObjectStorage(ABC):
+    """
+    Stores objects by key.
+    """
+
+    @abstractmethod
+    def write(self, key: str, data: Union[bytes, Iterable[bytes]]) -> int:
+        """
+        Write an object, replacing any object with the same key. The object
+        only becomes visible once it is completely written.
+
+        Args:
+            key (str): The key of the object.
+            data (Union[bytes, Iterable[bytes]]): The content, whole or in chunks.
+
+        Returns:
+            int: The size of the object in bytes.
+        """
+
+    @abstractmethod
+    def read(self, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Read an object as a stream of chunks.
+
+        Args:
+            key (str): The key of the object.
+            chunk_size (int): The size of the chunks.
+
+        Returns:
+            Iterator[bytes]: The chunks of the object.
+
+        Raises:
+            FileNotFoundError: If there is no such object.
+        """
+
+    def get(self, key: str) -> bytes:
+        """
+        Read a whole object.
+
+        Args:
+            key (str): The key of the object.
+
+        Returns:
+            bytes: The content of the object.
+
+        Raises:
+            FileNotFoundError: If there is no such object.
+        """
+        return b"".join(self.read(key))
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """
+        Check whether an object exists.
+
+        Args:
+            key (str): The key of the object.
+
+        Returns:
+            bool: True if it exists.
+        """
+
+    @abstractmethod
+    def version(self, key: str) -> str:
+        """
+        Identify the current content of an object, without reading it.
+
+        Args:
+            key (str): The key of the object.
+
+        Returns:
+            str: A version that changes whenever the object is replaced.
+
+        Raises:
+            FileNotFoundError: If there is no such object.
+        """
+
+    @abstractmethod
+    def delete(self, key: str):
+        """
+        Delete an object; deleting a missing object is a no-op.
+
+        Args:
+            key (str): The key of the object.
+        """
+
+    @abstractmethod
+    def signed_url(self, key: str, expires_in: int = DEFAULT_URL_EXPIRY) -> str:
+        """
+        Build a URL that downloads an object without other credentials.
+
+        Args:
+            key (str): The key of the object.
+            expires_in (int): Seconds until the URL stops working.
+
+        Returns:
+            str: The URL.
+        """
+
+    @abstractmethod
+    def reachable(self) -> bool:
+        """
+        Check whether the storage can be used from this process.
+
+        Returns:
+            bool: True if it can.
+        """
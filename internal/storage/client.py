@@ -0,0 +1,52 @@
+"""
+Object storage for the image files, selected by the environment.
+STORAGE_BACKEND=local (the default) keeps the files under ASSETS_DIR;
+STORAGE_BACKEND=s3 keeps them in the S3_BUCKET bucket of the service at
+S3_ENDPOINT_URL, or of AWS if it is not set.
+"""
+
+import os
+
+from internal.storage.base import ObjectStorage
+from internal.storage.local import LocalStorage
+from internal.storage.s3 import S3Storage
+
+
+class StorageClient:
+    """
+    A class to create the object storage of the image files.
+    """
+
+    def __init__(self, backend: str = None, assets_dir: str = None):
+        """
+        Initialize the StorageClient.
+
+        Args:
+            backend (str): 'local' or 's3'; defaults to the STORAGE_BACKEND variable.
+            assets_dir (str): The directory of the local storage; defaults to
+                the ASSETS_DIR variable, or /assets.
+
+        Raises:
+            ValueError: If the backend is unknown, or the bucket is not set.
+        """
+        backend = backend or os.getenv("STORAGE_BACKEND", "local")
+        if backend == "local":
+            self.storage = LocalStorage(
+                assets_dir or os.getenv("ASSETS_DIR", "/assets"),
+                os.getenv("STORAGE_PUBLIC_URL", ""),
+                os.getenv("STORAGE_SIGNING_SECRET"),
+            )
+        elif backend == "s3":
+            bucket = os.getenv("S3_BUCKET")
+            if not bucket:
+                raise ValueError("S3_BUCKET environment variable is not set.")
+            self.storage = S3Storage(
+                bucket,
+                endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+                part_size=int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))),
+            )
+        else:
+            raise ValueError(f"Unknown storage backend: {backend}.")
+
+    def get_storage(self) -> ObjectStorage:
+        return self.storage
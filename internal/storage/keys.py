@@ -0,0 +1,32 @@
+"""
+Keys of the objects in the object storage.
+"""
+
+
+def image_key(country_name: str, image_id: str) -> str:
+    """
+    The key of an image file, the same as its path under the assets directory.
+
+    Args:
+        country_name (str): The name of the country.
+        image_id (str): The ID of the image.
+
+    Returns:
+        str: The key.
+    """
+    return f"{country_name}/images/{image_id}.jpg"
+
+
+def dataset_key(format_version: int) -> str:
+    """
+    The key of the snapshot of the country data. Every format version has
+    its own key, so backends keep reading the version they understand while
+    a new one rolls out.
+
+    Args:
+        format_version (int): The format version of the snapshot.
+
+    Returns:
+        str: The key.
+    """
+    return f"datasets/countries.v{format_version}.bin"
@@ -0,0 +1,134 @@
+"""
+Object storage on a local or mounted file system.
+Signed URLs point at the API's /storage route, which checks their HMAC
+signature and expiry before serving the file.
+"""
+
+import hashlib
+import hmac
+import os
+import time
+from typing import Iterable, Iterator, Union
+from urllib.parse import quote, urlencode
+
+from internal.storage.base import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_URL_EXPIRY,
+    ObjectStorage,
+    as_chunks,
+)
+
+
+class LocalStorage(ObjectStorage):
+    """
+    Stores every object as a file under a root directory.
+    """
+
+    def __init__(self, root: str, base_url: str = "", secret: str = None):
+        """
+        Initialize the LocalStorage.
+
+        Args:
+            root (str): The directory of the objects.
+            base_url (str): The public URL of the API, prefixed to signed URLs.
+            secret (str): The key signed URLs are signed with; a random one,
+                valid in this process only, if not given.
+        """
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        self.secret = (secret or os.urandom(32).hex()).encode()
+
+    def path(self, key: str) -> str:
+        """
+        The path of the file of an object.
+
+        Args:
+            key (str): The key of the object.
+
+        Returns:
+            str: The path.
+
+        Raises:
+            ValueError: If the key points outside of the root directory.
+        """
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid key: {key}.")
+        return path
+
+    def write(self, key: str, data: Union[bytes, Iterable[bytes]]) -> int:
+        # Written to a temporary file that is flushed to disk and then renamed,
+        # so a crash never leaves a partial object behind
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        size = 0
+        with open(tmp_path, "wb") as f:
+            for chunk in as_chunks(data):
+                f.write(chunk)
+                size += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        # Persist the rename itself
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return size
+
+    def read(self, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        # Opened here, so a missing file fails the call rather than the iteration
+        f = open(self.path(key), "rb")
+        return self._chunks(f, chunk_size)
+
+    @staticmethod
+    def _chunks(f, chunk_size: int) -> Iterator[bytes]:
+        with f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def version(self, key: str) -> str:
+        stat = os.stat(self.path(key))
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def _signature(self, key: str, expires: int) -> str:
+        message = f"{key}\n{expires}".encode()
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def signed_url(self, key: str, expires_in: int = DEFAULT_URL_EXPIRY) -> str:
+        expires = int(time.time()) + expires_in
+        query = urlencode(
+            {"expires": expires, "signature": self._signature(key, expires)}
+        )
+        return f"{self.base_url}/storage/{quote(key)}?{query}"
+
+    def verify(self, key: str, expires: int, signature: str) -> bool:
+        """
+        Check a signed URL.
+
+        Args:
+            key (str): The key of the object.
+            expires (int): The expiry time of the URL, in seconds since the epoch.
+            signature (str): The signature of the URL.
+
+        Returns:
+            bool: True if the signature is valid and the URL has not expired.
+        """
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(key, expires), signature)
+
+    def reachable(self) -> bool:
+        return os.path.isdir(self.root)
@@ -0,0 +1,167 @@
+"""
+Object storage in an S3-compatible service, such as AWS S3 or MinIO.
+Objects larger than a part are written with a multipart upload, one part at a
+time, and signed URLs are S3 presigned URLs, so clients download the images
+from the storage service directly. Requires boto3.
+"""
+
+import logging
+from itertools import chain
+from typing import Iterable, Iterator, Union
+
+from internal.storage.base import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_URL_EXPIRY,
+    ObjectStorage,
+    as_chunks,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover - boto3 is optional
+    boto3 = None
+    ClientError = Exception
+
+# S3 rejects parts below 5 MiB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3Storage(ObjectStorage):
+    """
+    Stores every object in an S3 bucket.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        client=None,
+        endpoint_url: str = None,
+        part_size: int = 8 * 1024 * 1024,
+    ):
+        """
+        Initialize the S3Storage.
+
+        Args:
+            bucket (str): The name of the bucket.
+            client: A boto3 S3 client; one is created from the environment's
+                AWS credentials if not given.
+            endpoint_url (str): The URL of an S3-compatible service, None for AWS.
+            part_size (int): The size of the parts of a multipart upload.
+
+        Raises:
+            ValueError: If the part size is below the S3 minimum.
+            RuntimeError: If no client is given and boto3 is not installed.
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"The part size must be at least {MIN_PART_SIZE} bytes.")
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("boto3 is required for the S3 storage.")
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.client = client
+        self.part_size = part_size
+
+    @staticmethod
+    def _missing(error: ClientError) -> bool:
+        code = error.response.get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def _parts(self, data: Union[bytes, Iterable[bytes]]) -> Iterator[bytes]:
+        buffer = bytearray()
+        for chunk in as_chunks(data):
+            buffer += chunk
+            while len(buffer) >= self.part_size:
+                yield bytes(buffer[: self.part_size])
+                del buffer[: self.part_size]
+        if buffer:
+            yield bytes(buffer)
+
+    def write(self, key: str, data: Union[bytes, Iterable[bytes]]) -> int:
+        parts = self._parts(data)
+        first = next(parts, b"")
+        second = next(parts, None)
+        if second is None:
+            # Small enough for a single request
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=first)
+            return len(first)
+
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)[
+            "UploadId"
+        ]
+        try:
+            uploaded, size = [], 0
+            for number, part in enumerate(chain([first, second], parts), start=1):
+                uploaded.append(self._upload_part(key, upload_id, number, part))
+                size += len(part)
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": uploaded},
+            )
+        except BaseException:
+            # Don't leave the uploaded parts behind, they are billed
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            raise
+        return size
+
+    def _upload_part(self, key: str, upload_id: str, number: int, part: bytes):
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=number,
+            Body=part,
+        )
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    def read(self, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+        return response["Body"].iter_chunks(chunk_size)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if self._missing(e):
+                return False
+            raise
+        return True
+
+    def version(self, key: str) -> str:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+        return response["ETag"]
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def signed_url(self, key: str, expires_in: int = DEFAULT_URL_EXPIRY) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires_in,
+        )
+
+    def reachable(self) -> bool:
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+        except Exception as e:
+            logger.warning(f"S3 bucket {self.bucket} not reachable: {e}")
+            return False
+        return True
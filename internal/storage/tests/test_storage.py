@@ -0,0 +1,148 @@
+import os
+import time
+import uuid
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from internal.storage.client import StorageClient
+from internal.storage.local import LocalStorage
+from internal.storage.s3 import MIN_PART_SIZE, S3Storage, boto3
+
+
+def _chunks(size: int, chunk_size: int = 1024 * 1024):
+    data = os.urandom(size)
+    return data, [data[i : i + chunk_size] for i in range(0, size, chunk_size)]
+
+
+def test_local_storage_writes_and_reads_in_chunks(tmp_path):
+    # Arrange
+    storage = LocalStorage(str(tmp_path))
+    data, chunks = _chunks(300_000, 65_536)
+
+    # Act
+    size = storage.write("CountryA/images/a.jpg", iter(chunks))
+
+    # Assert
+    assert size == len(data)
+    assert list(storage.read("CountryA/images/a.jpg", 100_000))[0] == data[:100_000]
+    assert storage.get("CountryA/images/a.jpg") == data
+    assert not list(tmp_path.rglob("*.tmp"))
+    version = storage.version("CountryA/images/a.jpg")
+    storage.write("CountryA/images/a.jpg", b"other")
+    assert storage.version("CountryA/images/a.jpg") != version
+    storage.delete("CountryA/images/a.jpg")
+    storage.delete("CountryA/images/a.jpg")
+    assert not storage.exists("CountryA/images/a.jpg")
+    with pytest.raises(FileNotFoundError):
+        storage.read("CountryA/images/a.jpg")
+
+
+def test_local_storage_rejects_keys_outside_the_root(tmp_path):
+    with pytest.raises(ValueError, match="Invalid key"):
+        LocalStorage(str(tmp_path / "assets")).write("../escape.jpg", b"data")
+
+
+def test_local_storage_signed_urls(tmp_path):
+    # Arrange
+    storage = LocalStorage(str(tmp_path), "https://api.example.com/", "secret")
+
+    # Act
+    url = urlsplit(storage.signed_url("Côte/images/a.jpg", expires_in=60))
+    query = {name: value[0] for name, value in parse_qs(url.query).items()}
+    expires, signature = int(query["expires"]), query["signature"]
+
+    # Assert
+    assert url.path == "/storage/C%C3%B4te/images/a.jpg"
+    assert storage.verify("Côte/images/a.jpg", expires, signature)
+    assert not storage.verify("Côte/images/b.jpg", expires, signature)
+    assert not storage.verify("Côte/images/a.jpg", expires + 1, signature)
+    assert not LocalStorage(str(tmp_path), secret="other").verify(
+        "Côte/images/a.jpg", expires, signature
+    )
+    assert not storage.verify("Côte/images/a.jpg", int(time.time()) - 1, signature)
+
+
+def test_storage_client_requires_a_bucket(monkeypatch):
+    monkeypatch.setenv("STORAGE_BACKEND", "s3")
+    monkeypatch.delenv("S3_BUCKET", raising=False)
+
+    with pytest.raises(ValueError, match="S3_BUCKET"):
+        StorageClient()
+
+
+@pytest.fixture
+def s3_client():
+    # An S3-compatible service such as MinIO at S3_TEST_ENDPOINT, or else
+    # moto's in-process server if it is installed
+    if boto3 is None:
+        pytest.skip("boto3 is not installed")
+    endpoint, server = os.getenv("S3_TEST_ENDPOINT"), None
+    if not endpoint:
+        moto_server = pytest.importorskip("moto.server")
+        server = moto_server.ThreadedMotoServer(port=0, verbose=False)
+        server.start()
+        host, port = server.get_host_and_port()
+        endpoint = f"http://{host}:{port}"
+    client = boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id=os.getenv("S3_TEST_ACCESS_KEY", "test"),
+        aws_secret_access_key=os.getenv("S3_TEST_SECRET_KEY", "test"),
+        region_name="us-east-1",
+    )
+    try:
+        yield client
+    finally:
+        if server:
+            server.stop()
+
+
+def test_s3_storage(s3_client):
+    # Arrange
+    bucket = f"countries-test-{uuid.uuid4().hex[:8]}"
+    s3_client.create_bucket(Bucket=bucket)
+    storage = S3Storage(bucket, s3_client, part_size=MIN_PART_SIZE)
+    large, chunks = _chunks(2 * MIN_PART_SIZE + 1000)
+
+    # Act
+    small_size = storage.write("CountryA/images/small.jpg", b"small")
+    large_size = storage.write("CountryA/images/large.jpg", iter(chunks))
+
+    # Assert: the large image was uploaded in three parts
+    assert (small_size, large_size) == (5, len(large))
+    assert storage.get("CountryA/images/small.jpg") == b"small"
+    assert storage.get("CountryA/images/large.jpg") == large
+    head = s3_client.head_object(Bucket=bucket, Key="CountryA/images/large.jpg")
+    assert head["ETag"].strip('"').endswith("-3")
+    assert storage.exists("CountryA/images/large.jpg")
+    assert storage.version("CountryA/images/large.jpg") == head["ETag"]
+    assert storage.reachable()
+    url = storage.signed_url("CountryA/images/small.jpg", expires_in=60)
+    assert "Signature" in url or "X-Amz-Signature" in url
+    storage.delete("CountryA/images/large.jpg")
+    assert not storage.exists("CountryA/images/large.jpg")
+    with pytest.raises(FileNotFoundError):
+        storage.read("CountryA/images/large.jpg")
+    with pytest.raises(FileNotFoundError):
+        storage.version("CountryA/images/large.jpg")
+
+
+def test_s3_storage_aborts_a_failed_multipart_upload(s3_client):
+    # Arrange
+    bucket = f"countries-test-{uuid.uuid4().hex[:8]}"
+    s3_client.create_bucket(Bucket=bucket)
+    storage = S3Storage(bucket, s3_client, part_size=MIN_PART_SIZE)
+    _, chunks = _chunks(2 * MIN_PART_SIZE)
+
+    def failing_upload():
+        yield from chunks
+        raise ConnectionError("client went away")
+
+    # Act
+    with pytest.raises(ConnectionError):
+        storage.write("CountryA/images/a.jpg", failing_upload())
+
+    # Assert
+    assert not storage.exists("CountryA/images/a.jpg")
+    assert not s3_client.list_multipart_uploads(Bucket=bucket).get("Uploads")